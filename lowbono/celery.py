@@ -7,10 +7,12 @@ from django.conf import settings
 from celery import Celery
 from celery.schedules import crontab
 
+from lowbono.redis_client import get_redis_url
+
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lowbono.settings')
 
-BASE_REDIS_URL = os.environ.get('REDIS_URL', settings.REDIS_CONNECTION_URL)
+BASE_REDIS_URL = get_redis_url()
 
 app = Celery('lowbono')
 
@@ -18,6 +20,10 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 app.autodiscover_tasks()
 
+if settings.PROFILING_ENABLED:
+    from lowbono.profiling import connect_celery_signals
+    connect_celery_signals()
+
 # HACK: we use a custom transport here because the worker polling (using redis BRPOP)
 #   has a timeout of 1 that cannot be configured. I was also unable to get a qualified
 #   classname to be parsed so we're also hacking the transport aliases in kombu to
@@ -55,4 +61,16 @@ app.conf.beat_schedule = {
         'task': 'initiate_missing_workflows',
         'schedule': crontab(hour='*/1', minute=0,),
     },
+    'archive-cold-data-nightly-crontab': {
+        'task': 'archive_cold_data',
+        'schedule': crontab(hour='3', minute=30,),
+    },
+    'roll-over-availability-nightly-crontab': {
+        'task': 'roll_over_availability',
+        'schedule': crontab(hour='0', minute=5,),
+    },
+    'snapshot-eligibility-nightly-crontab': {
+        'task': 'snapshot_eligibility',
+        'schedule': crontab(hour='0', minute=30,),
+    },
 }
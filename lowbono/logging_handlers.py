@@ -0,0 +1,262 @@
+"""
+    Non-blocking alert logging.
+
+    `QueuedAlertHandler` puts records on a bounded queue and returns immediately; a full queue
+    drops the record (and counts it) instead of blocking the request or celery task that logged.
+    An `AlertQueueListener` thread delivers the queue in batches through an `AlertDeliveryHandler`
+    (Slack or email), collapsing messages repeated within a window and rate limiting deliveries,
+    so a slow or unavailable alert channel never stalls workers.
+
+    Configure with the `()` factory key (a `class` key makes dictConfig treat it as a plain QueueHandler):
+
+        'slack_admin': {
+            'level': 'WARNING',
+            '()': 'lowbono.logging_handlers.QueuedAlertHandler',
+            'handler': 'lowbono.logging_handlers.SlackAlertHandler',
+        },
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+
+from django.utils.module_loading import import_string
+
+
+class AlertDeliveryHandler(logging.Handler):
+    """ delivers a batch of records as a single message, see `emit_batch` """
+
+    def format_batch(self, records, dropped=0):
+        lines = []
+        for record in records:
+            repeated = getattr(record, 'repeated', 0)
+            lines.append(self.format(record) + (f' (repeated {repeated} more times)' if repeated else ''))
+        if dropped:
+            lines.append(f'{dropped} more alerts were dropped because the alert queue was full')
+        return '\n\n'.join(lines)
+
+    def emit(self, record):
+        self.emit_batch([record])
+
+    def emit_batch(self, records, dropped=0):
+        raise NotImplementedError
+
+
+class SlackAlertHandler(AlertDeliveryHandler):
+    """ posts a batch to a Slack channel, settings.SLACK_CHANNEL_NAME by default """
+
+    def __init__(self, channel=None, level=logging.NOTSET):
+        super().__init__(level)
+        self.channel = channel
+
+    def emit_batch(self, records, dropped=0):
+        from django.conf import settings
+        from lowbono.slack import send_slack_alert
+
+        send_slack_alert(self.channel or settings.SLACK_CHANNEL_NAME, self.format_batch(records, dropped))
+
+
+class EmailAlertHandler(AlertDeliveryHandler):
+    """ emails a batch through the Mailjet backend """
+
+    def __init__(self, to_email='a1@lowbono.org', subject='Warning log captured on lowbono-production', level=logging.NOTSET):
+        super().__init__(level)
+        self.to_email = to_email
+        self.subject = subject
+
+    def emit_batch(self, records, dropped=0):
+        from django.conf import settings
+        from django.core.mail import EmailMultiAlternatives, get_connection
+
+        body = self.format_batch(records, dropped)
+        subject = self.subject if len(records) == 1 else f'{self.subject} ({len(records)} messages)'
+
+        msg = EmailMultiAlternatives(to=[self.to_email], subject=subject, body=body,
+                                     from_email=settings.EMAIL_ALIAS, reply_to=[settings.EMAIL_ALIAS])
+        msg.attach_alternative(body.replace('\n', '<br>'), "text/html")
+        msg.connection = get_connection('anymail.backends.mailjet.EmailBackend')
+        msg.send()
+
+
+class AlertQueueListener(QueueListener):
+    """
+        Background thread delivering queued records to one AlertDeliveryHandler:
+            - batches: waits up to `flush_interval` seconds for up to `batch_size` records
+            - deduplicates: a message repeated within `dedup_window` seconds is only counted,
+              the count is reported once the window ended (checked at least every `flush_interval`
+              seconds, even when nothing is logged) and when the listener stops
+            - rate limits: at most `rate_limit` deliveries per `rate_period` seconds, meanwhile
+              records keep accumulating on the (bounded) queue
+    """
+
+    def __init__(self, queue, handler, batch_size=20, flush_interval=5.0, dedup_window=300.0, rate_limit=6, rate_period=60.0, clock=time.monotonic):
+        super().__init__(queue, handler, respect_handler_level=True)
+        self.handler = handler
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dedup_window = dedup_window
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        self.clock = clock
+
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._seen = {}
+        self._deliveries = deque()
+        self._stopping = False
+
+    def record_dropped(self):
+        with self._dropped_lock:
+            self.dropped += 1
+
+    def _take_dropped(self):
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
+    def collect(self):
+        """
+            waits up to `flush_interval` seconds for a first record (empty batch when none came), then gathers
+            more until the batch is full or the flush interval passed
+        """
+
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = self.clock() + self.flush_interval
+        while batch[-1] is not self._sentinel and len(batch) < self.batch_size:
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _summaries(self, expired):
+        """ forgets the `expired` messages, returns a summary record for each one that was repeated """
+
+        summaries = []
+        for key in list(self._seen):
+            first_seen, repeated = self._seen[key]
+            if expired(first_seen):
+                del self._seen[key]
+                if repeated:
+                    name, levelno, message = key
+                    summaries.append(logging.makeLogRecord({'name': name, 'levelno': levelno, 'levelname': logging.getLevelName(levelno),
+                                                            'msg': message, 'repeated': repeated}))
+        return summaries
+
+    def deduplicate(self, records, flush=False):
+        """
+            drops messages already delivered within the dedup window; once a window ends, a message that
+            was repeated in it comes back as a single summary record carrying its repeat count.
+            `flush` summarizes every pending repeat right away, windows ended or not
+        """
+
+        now = self.clock()
+        unique = self._summaries(lambda first_seen: now - first_seen >= self.dedup_window)
+
+        for record in records:
+            key = (record.name, record.levelno, record.getMessage())
+            if key in self._seen:
+                first_seen, repeated = self._seen[key]
+                self._seen[key] = (first_seen, repeated + 1)
+                continue
+            self._seen[key] = (now, 0)
+            unique.append(record)
+
+        if flush:
+            unique += self._summaries(lambda first_seen: True)
+        return unique
+
+    def wait_for_rate_limit(self):
+        while len(self._deliveries) >= self.rate_limit and not self._stopping:
+            wait = self.rate_period - (self.clock() - self._deliveries[0])
+            if wait <= 0:
+                self._deliveries.popleft()
+            else:
+                time.sleep(min(wait, self.flush_interval))
+        self._deliveries.append(self.clock())
+        if len(self._deliveries) > self.rate_limit:
+            self._deliveries.popleft()
+
+    def deliver(self, records, flush=False):
+        records = self.deduplicate([record for record in records if record.levelno >= self.handler.level], flush)
+        dropped = self._take_dropped()
+        if not records and not dropped:
+            return
+
+        self.wait_for_rate_limit()
+        try:
+            self.handler.emit_batch(records, dropped)
+        except Exception:
+            self.handler.handleError(records[0] if records else logging.makeLogRecord({'msg': 'dropped alerts'}))
+
+    def _monitor(self):
+        while True:
+            batch = self.collect()
+            stop = bool(batch) and batch[-1] is self._sentinel
+            if stop:
+                batch.pop()
+                self._stopping = True
+            # an empty batch still delivers the repeat counts of dedup windows that ended meanwhile
+            self.deliver(batch, flush=stop)
+            if stop:
+                return
+
+    def enqueue_sentinel(self):
+        self._stopping = True
+        try:
+            self.queue.put(self._sentinel, timeout=self.flush_interval)
+        except queue.Full:
+            pass
+
+
+class QueuedAlertHandler(QueueHandler):
+    """
+        Logging handler that never blocks: records go on a bounded queue (`maxsize`), delivered by an
+        AlertQueueListener to `handler` (an AlertDeliveryHandler instance or dotted path, built with `handler_kwargs`).
+        The listener thread starts on first use in each process, so forked web/celery workers get their own.
+    """
+
+    def __init__(self, handler, handler_kwargs=None, maxsize=1000, batch_size=20, flush_interval=5.0,
+                 dedup_window=300.0, rate_limit=6, rate_period=60.0):
+        super().__init__(queue.Queue(maxsize))
+        if isinstance(handler, str):
+            handler = import_string(handler)(**(handler_kwargs or {}))
+        self.delivery_handler = handler
+        self.listener_kwargs = {'batch_size': batch_size, 'flush_interval': flush_interval, 'dedup_window': dedup_window,
+                                'rate_limit': rate_limit, 'rate_period': rate_period}
+        self.listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # a listener inherited through fork has no thread in this process, start a fresh one
+                self.queue = queue.Queue(self.queue.maxsize)
+                self.listener = AlertQueueListener(self.queue, self.delivery_handler, **self.listener_kwargs)
+                self.listener.start()
+                self._pid = os.getpid()
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.listener.record_dropped()
+
+    def close(self):
+        if self.listener and self._pid == os.getpid():
+            self.listener.stop()
+            self._pid = None
+        super().close()
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+from lowbono import page_cache
+
+
+class AnonymousPageCacheMiddleware(object):
+    """
+        Answers anonymous GET/HEAD requests of the public CMS and news pages from the full-page
+        cache (see lowbono.page_cache), before the CMS middleware and views run.
+        Only loaded with settings.PAGE_CACHE_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PAGE_CACHE_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def is_cacheable_request(self, request):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return False
+        if any(parameter in request.GET for parameter in page_cache.TOOLBAR_PARAMETERS):
+            return False
+        # a pending message (e.g. from the news redirect) is rendered into the page
+        if getattr(request, '_messages', None) is not None and len(request._messages):
+            return False
+
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match._func_path in page_cache.PAGE_CACHE_VIEWS
+
+    def __call__(self, request):
+        if not self.is_cacheable_request(request):
+            return self.get_response(request)
+
+        response = page_cache.fetch(request)
+        if response is not None:
+            page_cache.count('hit')
+            response['X-Page-Cache'] = 'HIT'
+            language = request.LANGUAGE_CODE
+            if response.status_code == 200 and request.COOKIES.get(settings.LANGUAGE_COOKIE_NAME) != language:
+                response.set_cookie(settings.LANGUAGE_COOKIE_NAME, language, max_age=settings.LANGUAGE_COOKIE_AGE or 365 * 24 * 60 * 60,
+                                    path=settings.LANGUAGE_COOKIE_PATH, samesite=settings.LANGUAGE_COOKIE_SAMESITE)
+            return response
+
+        page_cache.count('miss')
+        response = self.get_response(request)
+        if page_cache.is_cacheable_response(request, response):
+            page_cache.store(request, response, settings.PAGE_CACHE_TIMEOUT)
+            response['X-Page-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from lowbono import profiling
+
+
+class QueryProfilingMiddleware(object):
+    """
+        Records query count, duplicated queries, DB time and total time of each request,
+        aggregated per URL name (see lowbono.profiling). Only loaded with settings.PROFILING_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+
+        recorder = profiling.QueryRecorder().start()
+        try:
+            response = self.get_response(request)
+        finally:
+            recorder.stop()
+
+        match = getattr(request, 'resolver_match', None)
+        if match:
+            profiling.record(profiling.KIND_REQUEST, match.view_name or match._func_path, recorder)
+        return response
@@ -0,0 +1,115 @@
+"""
+    Full-page cache for anonymous visitors.
+
+    GET/HEAD responses of the public CMS and news views (PAGE_CACHE_VIEWS) are stored for
+    anonymous visitors, keyed by host, full path, language and the lowbono_cms content version,
+    so publishing a page, editing a plugin or saving a news article purges every cached page
+    (see lowbono_cms.cache). Stored pages carry an ETag and Last-Modified and answer conditional
+    requests with 304. Hits and misses are counted for the metrics endpoint.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+PAGE_CACHE_KEY = 'lowbono:page:{}:{}:{}'
+PAGE_CACHE_COUNTER_KEY = 'lowbono:page:counter:{}'
+
+PAGE_CACHE_VIEWS = ('cms.views.details', 'lowbono_cms.views.news_article_page')
+# query parameters switching the CMS toolbar or edit mode on, those requests are never cached
+TOOLBAR_PARAMETERS = ('edit', 'structure', 'preview', 'toolbar_on', 'toolbar_off', 'persist')
+
+
+def get_key(request):
+    from django.utils import translation
+    from lowbono_cms.cache import get_content_version
+
+    path = hashlib.sha1(f'{request.get_host()}{request.get_full_path()}'.encode()).hexdigest()
+    return PAGE_CACHE_KEY.format(path, translation.get_language(), get_content_version())
+
+
+def count(outcome):
+    key = PAGE_CACHE_COUNTER_KEY.format(outcome)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+def get_stats():
+    counts = cache.get_many([PAGE_CACHE_COUNTER_KEY.format(outcome) for outcome in ('hit', 'miss')])
+    hits = counts.get(PAGE_CACHE_COUNTER_KEY.format('hit'), 0)
+    misses = counts.get(PAGE_CACHE_COUNTER_KEY.format('miss'), 0)
+    return {'hits': hits, 'misses': misses, 'hit_ratio': hits / (hits + misses) if hits + misses else 0.0}
+
+
+def reset_stats():
+    cache.delete_many([PAGE_CACHE_COUNTER_KEY.format(outcome) for outcome in ('hit', 'miss')])
+
+
+def format_metrics(stats=None):
+    """ hit/miss counters in the Prometheus text exposition format """
+
+    stats = get_stats() if stats is None else stats
+    return '\n'.join([
+        '# HELP lowbono_page_cache_requests_total Anonymous page requests answered from / stored into the page cache',
+        '# TYPE lowbono_page_cache_requests_total counter',
+        f'lowbono_page_cache_requests_total{{outcome="hit"}} {stats["hits"]}',
+        f'lowbono_page_cache_requests_total{{outcome="miss"}} {stats["misses"]}',
+        '# HELP lowbono_page_cache_hit_ratio Share of cacheable requests answered from the page cache',
+        '# TYPE lowbono_page_cache_hit_ratio gauge',
+        f'lowbono_page_cache_hit_ratio {round(stats["hit_ratio"], 6)}',
+    ]) + '\n'
+
+
+def is_cacheable_response(request, response):
+    """ only complete 200 responses that set no per-visitor state (session, csrf token, messages) """
+
+    if response.status_code != 200 or response.streaming:
+        return False
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE') or getattr(request, '_messages', None) and request._messages.used:
+        return False
+    if set(response.cookies) - {settings.LANGUAGE_COOKIE_NAME}:
+        return False
+    cache_control = response.get('Cache-Control', '')
+    return not any(directive in cache_control for directive in ('private', 'no-store', 'no-cache'))
+
+
+def store(request, response, timeout):
+    """ caches `response` and adds its validators """
+
+    etag = quote_etag(hashlib.md5(response.content, usedforsecurity=False).hexdigest())
+    last_modified = time.time()
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Cookie', 'Accept-Language'))
+
+    headers = {name: value for name, value in response.items() if name.lower() != 'set-cookie'}
+    cache.set(get_key(request), {'content': response.content, 'headers': headers, 'etag': etag,
+                                 'last_modified': last_modified}, timeout)
+
+
+def fetch(request):
+    """ the cached response for `request` (304 when the client's copy is current), None on a miss """
+
+    page = cache.get(get_key(request))
+    if page is None:
+        return None
+
+    conditional = get_conditional_response(request, etag=page['etag'], last_modified=int(page['last_modified']))
+    if conditional is not None:
+        for name in ('ETag', 'Last-Modified', 'Vary', 'Cache-Control', 'Expires'):
+            if name in page['headers']:
+                conditional[name] = page['headers'][name]
+        return conditional
+
+    response = HttpResponse(page['content'])
+    for name, value in page['headers'].items():
+        response[name] = value
+    return response
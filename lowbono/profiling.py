@@ -0,0 +1,264 @@
+"""
+    Opt-in query count and latency profiling.
+
+    With `settings.PROFILING_ENABLED`, every request (lowbono.middleware.profiling_middleware)
+    and every celery task (see `connect_celery_signals`) is measured: number of queries,
+    duplicated queries (same SQL and parameters), DB time and total time. Measurements are
+    aggregated in the cache per URL name / task name, shown to staff on the profiling page and
+    exported as text metrics. Runs exceeding their budget (`settings.PROFILING_BUDGETS`, falling
+    back to `settings.PROFILING_DEFAULT_BUDGET`) are logged as warnings on `joeflow_log`.
+"""
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+
+logger_joeflow = logging.getLogger('joeflow_log')
+
+PROFILING_CACHE_KEY = 'lowbono:profiling:{}:{}'
+PROFILING_INDEX_CACHE_KEY = 'lowbono:profiling:index'
+PROFILING_TOP_FINGERPRINTS = 5
+PROFILING_FIELDS = ('count', 'queries', 'max_queries', 'duplicates', 'db_time', 'total_time', 'max_time', 'over_budget')
+PROFILING_TIME_FIELDS = ('db_time', 'total_time', 'max_time')
+MICROSECONDS = 1000000
+
+KIND_REQUEST = 'request'
+KIND_TASK = 'task'
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """ SQL with whitespace and `IN (...)` lists collapsed, so N+1 queries over different ids share one fingerprint """
+
+    return _WHITESPACE.sub(' ', _IN_LIST.sub('IN (...)', sql)).strip()
+
+
+class QueryRecorder:
+    """
+        Database execute wrapper counting queries, their time and repeats.
+        `start()`/`stop()` install and remove it on every configured database connection of the thread.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.started_at = None
+        self.total_time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.statements[(sql, repr(params))] += 1
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        for connection in connections.all():
+            connection.execute_wrappers.append(self)
+        return self
+
+    def stop(self):
+        self.total_time = time.perf_counter() - self.started_at
+        for connection in connections.all():
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+        return self
+
+    @property
+    def duplicates(self):
+        """ queries re-run with the exact same SQL and parameters """
+        return sum(count - 1 for count in self.statements.values())
+
+    def repeated_fingerprints(self):
+        """ {fingerprint: count} of statements run more than once, identical or only differing in parameters """
+
+        fingerprints = Counter()
+        for (sql, params), count in self.statements.items():
+            fingerprints[fingerprint(sql)] += count
+        return {sql: count for sql, count in fingerprints.items() if count > 1}
+
+
+def get_budget(name):
+    return {**settings.PROFILING_DEFAULT_BUDGET, **settings.PROFILING_BUDGETS.get(name, {})}
+
+
+def check_budget(kind, name, recorder):
+    """ logs a joeflow_log warning listing every budget `recorder` exceeded, returns the exceeded limits """
+
+    budget = get_budget(name)
+    measured = {'queries': recorder.queries, 'duplicates': recorder.duplicates, 'seconds': recorder.total_time}
+    exceeded = {limit: measured[limit] for limit in measured if limit in budget and measured[limit] > budget[limit]}
+
+    if exceeded:
+        logger_joeflow.warning("Profiling budget exceeded by %s %s: %s" % (kind, name, ', '.join(
+            '%s %s > %s' % (limit, round(value, 3), budget[limit]) for limit, value in exceeded.items())))
+    return exceeded
+
+
+def _incr(key, delta):
+    """ atomically adds `delta` to the counter `key`, creating it if needed """
+
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:  # evicted in between
+        cache.add(key, delta, None)
+        return delta
+
+
+def _raise_max(key, value):
+    """ keeps the largest value seen in `key`, best effort: concurrent runs may lose a maximum """
+
+    if value > (cache.get(key) or 0):
+        cache.set(key, value, None)
+
+
+def _add_to_index(index_key, member_id, member):
+    """
+        adds `member` to the index `index_key` once: `cache.add` claims `member_id` atomically, the
+        claiming run appends `member` to the next slot of the index
+    """
+
+    if cache.add(f'{index_key}:member:{member_id}', True, None):
+        cache.set(f'{index_key}:{_incr(f"{index_key}:size", 1)}', member, None)
+
+
+def _get_index(index_key):
+    """ members of the index `index_key`, in insertion order """
+
+    size = cache.get(f'{index_key}:size') or 0
+    slots = [f'{index_key}:{slot}' for slot in range(1, size + 1)]
+    members = cache.get_many(slots)
+    return [members[slot] for slot in slots if slot in members]
+
+
+def _fingerprint_id(sql):
+    return hashlib.md5(sql.encode()).hexdigest()
+
+
+def record(kind, name, recorder):
+    """
+        adds a finished `recorder` run to the aggregates of `name` and checks it against the budget.
+        Every aggregate is its own cache counter updated with `cache.incr`, so concurrent requests and
+        workers don't overwrite each other's runs; times are counted in microseconds.
+    """
+
+    key = PROFILING_CACHE_KEY.format(kind, name)
+    _add_to_index(PROFILING_INDEX_CACHE_KEY, key, (kind, name))
+
+    _incr(f'{key}:count', 1)
+    _incr(f'{key}:queries', recorder.queries)
+    _incr(f'{key}:duplicates', recorder.duplicates)
+    _incr(f'{key}:db_time', round(recorder.db_time * MICROSECONDS))
+    _incr(f'{key}:total_time', round(recorder.total_time * MICROSECONDS))
+    _raise_max(f'{key}:max_queries', recorder.queries)
+    _raise_max(f'{key}:max_time', round(recorder.total_time * MICROSECONDS))
+
+    for sql, count in recorder.repeated_fingerprints().items():
+        fingerprint_id = _fingerprint_id(sql)
+        _add_to_index(f'{key}:fingerprints', fingerprint_id, sql)
+        _incr(f'{key}:fingerprint:{fingerprint_id}', count)
+
+    if check_budget(kind, name, recorder):
+        _incr(f'{key}:over_budget', 1)
+
+
+def _get_entry(kind, name):
+    key = PROFILING_CACHE_KEY.format(kind, name)
+    values = cache.get_many([f'{key}:{field}' for field in PROFILING_FIELDS])
+    entry = {'kind': kind, 'name': name, **{field: values.get(f'{key}:{field}', 0) for field in PROFILING_FIELDS}}
+    for field in PROFILING_TIME_FIELDS:
+        entry[field] /= MICROSECONDS
+
+    fingerprints = _get_index(f'{key}:fingerprints')
+    counts = cache.get_many([f'{key}:fingerprint:{_fingerprint_id(sql)}' for sql in fingerprints])
+    fingerprints = Counter({sql: counts.get(f'{key}:fingerprint:{_fingerprint_id(sql)}', 0) for sql in fingerprints})
+    entry['fingerprints'] = dict(fingerprints.most_common(PROFILING_TOP_FINGERPRINTS))
+    return entry
+
+
+def get_stats():
+    """ aggregates of every profiled URL name and task name, heaviest average query count first """
+
+    stats = [_get_entry(kind, name) for kind, name in _get_index(PROFILING_INDEX_CACHE_KEY)]
+    stats = [entry for entry in stats if entry['count']]
+    for entry in stats:
+        entry['avg_queries'] = entry['queries'] / entry['count']
+        entry['avg_db_time'] = entry['db_time'] / entry['count']
+        entry['avg_time'] = entry['total_time'] / entry['count']
+    return sorted(stats, key=lambda entry: entry['avg_queries'], reverse=True)
+
+
+def _index_keys(index_key, member_ids):
+    size = cache.get(f'{index_key}:size') or 0
+    return ([f'{index_key}:size'] + [f'{index_key}:{slot}' for slot in range(1, size + 1)]
+            + [f'{index_key}:member:{member_id}' for member_id in member_ids])
+
+
+def reset_stats():
+    stats_keys = [PROFILING_CACHE_KEY.format(kind, name) for kind, name in _get_index(PROFILING_INDEX_CACHE_KEY)]
+    keys = _index_keys(PROFILING_INDEX_CACHE_KEY, stats_keys)
+    for key in stats_keys:
+        fingerprint_ids = [_fingerprint_id(sql) for sql in _get_index(f'{key}:fingerprints')]
+        keys += [f'{key}:{field}' for field in PROFILING_FIELDS]
+        keys += [f'{key}:fingerprint:{fingerprint_id}' for fingerprint_id in fingerprint_ids]
+        keys += _index_keys(f'{key}:fingerprints', fingerprint_ids)
+    cache.delete_many(keys)
+
+
+def format_metrics(stats=None):
+    """ aggregates in the Prometheus text exposition format """
+
+    metrics = [
+        ('lowbono_profiled_runs_total', 'count', 'Profiled requests/tasks'),
+        ('lowbono_profiled_queries_total', 'queries', 'Database queries'),
+        ('lowbono_profiled_queries_max', 'max_queries', 'Most database queries in a single run'),
+        ('lowbono_profiled_duplicate_queries_total', 'duplicates', 'Queries repeated with identical SQL and parameters'),
+        ('lowbono_profiled_db_seconds_total', 'db_time', 'Time spent in the database'),
+        ('lowbono_profiled_seconds_total', 'total_time', 'Total time'),
+        ('lowbono_profiled_seconds_max', 'max_time', 'Slowest single run'),
+        ('lowbono_profiled_over_budget_total', 'over_budget', 'Runs exceeding their budget'),
+    ]
+    stats = get_stats() if stats is None else stats
+
+    lines = []
+    for metric, field, help_text in metrics:
+        lines.append('# HELP %s %s' % (metric, help_text))
+        lines.append('# TYPE %s %s' % (metric, 'gauge' if field.startswith('max_') else 'counter'))
+        for entry in stats:
+            name = entry['name'].replace('\\', '\\\\').replace('"', '\\"')
+            lines.append('%s{kind="%s",name="%s"} %s' % (metric, entry['kind'], name, round(entry[field], 6)))
+    return '\n'.join(lines) + '\n'
+
+
+_task_recorders = {}
+
+
+def _task_prerun(task_id=None, task=None, **kwargs):
+    _task_recorders[task_id] = QueryRecorder().start()
+
+
+def _task_postrun(task_id=None, task=None, **kwargs):
+    recorder = _task_recorders.pop(task_id, None)
+    if recorder:
+        record(KIND_TASK, task.name, recorder.stop())
+
+
+def connect_celery_signals():
+    """ profiles every celery task run by this worker (lowbono.celery connects it when profiling is enabled) """
+    from celery.signals import task_prerun, task_postrun
+
+    task_prerun.connect(_task_prerun, weak=False, dispatch_uid='lowbono_profiling_prerun')
+    task_postrun.connect(_task_postrun, weak=False, dispatch_uid='lowbono_profiling_postrun')
@@ -0,0 +1,217 @@
+"""
+    Shared Redis access.
+
+    One connection pool per process (re-created after fork) for everything talking to Redis
+    outside of Django's cache backend and the celery broker connection, a circuit breaker so
+    callers fall back to a default instead of waiting on an unavailable server, ping latency
+    histograms for health checks, and broker queue depths for sizing celery workers.
+"""
+import os
+import threading
+import time
+
+import redis
+
+from django.conf import settings
+
+
+REDIS_SOCKET_TIMEOUT = 2
+REDIS_MAX_CONNECTIONS = 50
+
+# celery's redis transport keeps prioritized messages in extra lists named "<queue>\x06\x16<priority>"
+BROKER_PRIORITY_SEPARATOR = '\x06\x16'
+BROKER_PRIORITY_STEPS = (0, 3, 6, 9)
+BROKER_QUEUES = ('celery', 'llm_queue')
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, float('inf'))
+
+
+def get_redis_url():
+    """ REDIS_URL from the environment (set by dokku for the broker) or settings.REDIS_CONNECTION_URL """
+    return os.environ.get('REDIS_URL', settings.REDIS_CONNECTION_URL)
+
+
+class CircuitOpenError(redis.ConnectionError):
+    """ raised instead of calling Redis while the circuit breaker is open """
+
+
+class CircuitBreaker:
+    """
+        Opens after `failure_threshold` consecutive connection failures; while open, calls fail
+        immediately for `reset_timeout` seconds, then a single trial call decides whether it closes again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=3, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def call(self, func, *args, **kwargs):
+        with self._lock:
+            state = self.state
+            if state == self.OPEN:
+                raise CircuitOpenError('Redis circuit breaker is open')
+            if state == self.HALF_OPEN:
+                self.opened_at = self.clock()  # one trial call at a time, the others keep failing fast
+
+        try:
+            result = func(*args, **kwargs)
+        except (redis.ConnectionError, redis.TimeoutError):
+            with self._lock:
+                self.failures += 1
+                if self.failures >= self.failure_threshold or state == self.HALF_OPEN:
+                    self.opened_at = self.clock()
+            raise
+
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+        return result
+
+
+class LatencyHistogram:
+    """ cumulative histogram of latencies in milliseconds, bucketed by LATENCY_BUCKETS_MS """
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, latency_ms):
+        with self._lock:
+            self.count += 1
+            self.total += latency_ms
+            for i, bound in enumerate(self.buckets):
+                if latency_ms <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def snapshot(self):
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets, self.counts):
+                cumulative += count
+                buckets['+Inf' if bound == float('inf') else str(bound)] = cumulative
+            return {'buckets': buckets, 'count': self.count, 'sum_ms': round(self.total, 3)}
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+breaker = CircuitBreaker()
+ping_latency = LatencyHistogram()
+
+
+def get_pool():
+    """ process-wide connection pool, a forked process gets its own """
+    global _pool, _pool_pid
+
+    if _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                _pool = redis.ConnectionPool.from_url(get_redis_url(), max_connections=REDIS_MAX_CONNECTIONS,
+                                                      socket_timeout=REDIS_SOCKET_TIMEOUT, socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+                                                      health_check_interval=30)
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def get_client():
+    return redis.Redis(connection_pool=get_pool())
+
+
+def execute(func, default=None):
+    """
+        Runs `func(client)` through the circuit breaker.
+        Returns `default` instead of raising when Redis is unavailable or the breaker is open.
+    """
+
+    try:
+        return breaker.call(func, get_client())
+    except (redis.ConnectionError, redis.TimeoutError):
+        return default
+
+
+def ping():
+    """ pings Redis, recording the latency; returns the latency in milliseconds or None when unavailable """
+
+    def timed_ping(client):
+        start = time.perf_counter()
+        client.ping()
+        latency_ms = (time.perf_counter() - start) * 1000
+        ping_latency.observe(latency_ms)
+        return latency_ms
+
+    return execute(timed_ping)
+
+
+def queue_depths(queues=BROKER_QUEUES):
+    """ {queue name: messages waiting} in the celery broker (all priority lists), None values when unavailable """
+
+    def llen(client):
+        pipe = client.pipeline(transaction=False)
+        for name in queues:
+            for priority in BROKER_PRIORITY_STEPS:
+                pipe.llen(name if not priority else f'{name}{BROKER_PRIORITY_SEPARATOR}{priority}')
+        lengths = pipe.execute()
+        steps = len(BROKER_PRIORITY_STEPS)
+        return {name: sum(lengths[i * steps:(i + 1) * steps]) for i, name in enumerate(queues)}
+
+    return execute(llen, default={name: None for name in queues})
+
+
+def health():
+    """ ping latency, breaker state, latency histogram, pool usage and broker queue depths """
+
+    latency_ms = ping()
+    pool = get_pool()
+    return {
+        'available': latency_ms is not None,
+        'latency_ms': None if latency_ms is None else round(latency_ms, 3),
+        'circuit': breaker.state,
+        'latency_histogram': ping_latency.snapshot(),
+        'pool': {'created_connections': pool._created_connections, 'in_use_connections': len(pool._in_use_connections),
+                 'max_connections': pool.max_connections},
+        'queue_depths': queue_depths(),
+    }
+
+
+def format_metrics(status=None):
+    """ `health()` in the Prometheus text exposition format """
+
+    status = health() if status is None else status
+    lines = [
+        '# HELP lowbono_redis_up Whether Redis answered a ping',
+        '# TYPE lowbono_redis_up gauge',
+        f'lowbono_redis_up {int(status["available"])}',
+        '# HELP lowbono_redis_circuit_open Whether the Redis circuit breaker is open',
+        '# TYPE lowbono_redis_circuit_open gauge',
+        f'lowbono_redis_circuit_open {int(status["circuit"] != CircuitBreaker.CLOSED)}',
+        '# HELP lowbono_redis_ping_ms Redis ping latency',
+        '# TYPE lowbono_redis_ping_ms histogram',
+    ]
+    histogram = status['latency_histogram']
+    lines += [f'lowbono_redis_ping_ms_bucket{{le="{bound}"}} {count}' for bound, count in histogram['buckets'].items()]
+    lines += [f'lowbono_redis_ping_ms_sum {histogram["sum_ms"]}', f'lowbono_redis_ping_ms_count {histogram["count"]}']
+    lines += ['# HELP lowbono_redis_pool_connections Connections of this process pool', '# TYPE lowbono_redis_pool_connections gauge',
+              f'lowbono_redis_pool_connections{{state="created"}} {status["pool"]["created_connections"]}',
+              f'lowbono_redis_pool_connections{{state="in_use"}} {status["pool"]["in_use_connections"]}']
+    lines += ['# HELP lowbono_celery_queue_depth Messages waiting in the celery broker queue', '# TYPE lowbono_celery_queue_depth gauge']
+    lines += [f'lowbono_celery_queue_depth{{queue="{name}"}} {depth}' for name, depth in status['queue_depths'].items() if depth is not None]
+    return '\n'.join(lines) + '\n'
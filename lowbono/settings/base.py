@@ -102,6 +102,7 @@ CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 MIDDLEWARE = [
+    'lowbono.middleware.profiling_middleware.QueryProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -111,6 +112,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'lowbono.middleware.page_cache_middleware.AnonymousPageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'cms.middleware.user.CurrentUserMiddleware',
     'cms.middleware.page.CurrentPageMiddleware',
@@ -248,9 +250,34 @@ CELERY_TASK_ROUTES = {
 
 BETTER_UPTIME_CELERY_HEARTBEAT_URL = os.getenv('BETTER_UPTIME_CELERY_HEARTBEAT_URL')
 
+# workflow history/notifications of referrals closed longer than this (and older logs) move to the archive table
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 365))
+
+# vacation days are materialized per professional from this many days ago up to this many days ahead (lowbono_app.availability)
+AVAILABILITY_RETENTION_DAYS = 30
+AVAILABILITY_HORIZON_DAYS = 365
+
+# opt-in query/latency profiling of requests and celery tasks (lowbono.profiling)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+# bearer token letting a metrics scraper read /professionals/profiling/metrics without a staff login
+PROFILING_METRICS_TOKEN = os.getenv('PROFILING_METRICS_TOKEN')
+# budgets per URL name / celery task name, exceeding one logs a warning on joeflow_log
+PROFILING_DEFAULT_BUDGET = {'queries': 100, 'duplicates': 20, 'seconds': 2.0}
+PROFILING_BUDGETS = {
+    'user-matters': {'queries': 40},
+    'admin:lowbono_app_referral_changelist': {'queries': 60},
+}
+
+# full-page cache of public CMS and news pages for anonymous visitors (lowbono.page_cache)
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'False') == 'True'
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+# translator used by the translate-models command (lowbono_app.translators)
+MODEL_TRANSLATOR = os.getenv('MODEL_TRANSLATOR', 'lowbono_app.translators.GoogleWebTranslator')
 
 LOGIN_REQUIRED_URLS = (r'/professionals/(.*)$', r'/referral_workflow/(.*)$',)
-LOGIN_REQUIRED_URLS_EXCEPTIONS = (r'/professionals/signup/(.*)$', r'/professionals/login', r'/professionals/logout', r'/professionals/reset_password')
+LOGIN_REQUIRED_URLS_EXCEPTIONS = (r'/professionals/signup/(.*)$', r'/professionals/login', r'/professionals/logout', r'/professionals/reset_password',
+                                  r'/professionals/profiling/metrics')
 
 STAFF_LEVEL_ACCESS_REQUIRED_URLS = (r'/1referral_workflow/(.*)$',)
 
@@ -5,8 +5,6 @@ It is commonly used for both production and staging server
 
 import os
 
-import logging
-from django.core.mail import send_mail, EmailMultiAlternatives, get_connection
 from django.conf import settings
 
 SECRET_KEY = os.getenv('DJANGO_SECRET')
@@ -22,6 +20,15 @@ DATABASES = {
 
 REDIS_CONNECTION_URL = os.getenv('REDIS_URL')
 
+# shared between web workers so directory cache invalidation reaches every process
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_CONNECTION_URL,
+        'KEY_PREFIX': 'lowbono',
+    }
+}
+
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
 
 HOST = 'https://lowbono.org'
@@ -36,24 +43,6 @@ ANYMAIL = {
 
 SLACK_CHANNEL_NAME = "#fire"
 
-class WarningEmailLogger(logging.Handler):
-    def emit(self, record):
-        to_email = "a1@lowbono.org"
-        subject = f"Warning log captured on lowbono-production"
-
-        msg = EmailMultiAlternatives(to=[to_email], subject=subject, body=self.format(record),
-                                     from_email=settings.EMAIL_ALIAS, reply_to=[settings.EMAIL_ALIAS])
-        msg.attach_alternative(self.format(record), "text/html")
-        msg.connection = get_connection('anymail.backends.mailjet.EmailBackend')
-        msg.send()
-
-
-class WarningSlackLogger(logging.Handler):
-    def emit(self, record):
-        from lowbono.slack import send_slack_alert
-        send_slack_alert(SLACK_CHANNEL_NAME, self.format(record))
-
-
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -63,13 +52,17 @@ LOGGING = {
             'class': 'logging.FileHandler',
             'filename': 'django_warning.log',
         },
+        # alerts are queued and delivered in batches from a background thread, see lowbono.logging_handlers
         'mail_admin': {
             'level': 'WARNING',
-            'class': 'lowbono.settings.dokku.WarningEmailLogger',
+            '()': 'lowbono.logging_handlers.QueuedAlertHandler',
+            'handler': 'lowbono.logging_handlers.EmailAlertHandler',
         },
         'slack_admin': {
             'level': 'WARNING',
-            'class': 'lowbono.settings.dokku.WarningSlackLogger',
+            '()': 'lowbono.logging_handlers.QueuedAlertHandler',
+            'handler': 'lowbono.logging_handlers.SlackAlertHandler',
+            'dedup_window': 600,
         },
         'file_llm': {
             'level': 'WARNING',
@@ -99,9 +92,13 @@ LOGGING = {
 DEFAULT_FROM_EMAIL = 'support@lowbono.org'
 SERVER_EMAIL = 'support@lowbono.org'
 
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'True') == 'True'
+
 # supabase
 SUPABASE_INSTANCE_URL = os.getenv('SUPABASE_INSTANCE_URL')
 SUPABASE_STORAGE_KEY = os.getenv('SUPABASE_STORAGE_KEY')
+SUPABASE_STORAGE_CACHE_TTL = 300  # seconds file existence/size lookups are cached
+SUPABASE_STORAGE_LOCAL_ROOT = os.getenv('SUPABASE_STORAGE_LOCAL_ROOT')  # filesystem stand-in for offline runs
 
 DEFAULT_FILE_STORAGE = 'lowbono.storage.supabase.SupabaseCustomStorage'
 
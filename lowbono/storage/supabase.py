@@ -1,30 +1,246 @@
-from django.core.files.storage import Storage
-from django.core.files import File
-from django.conf import settings
+"""
+    Supabase Storage backend.
+
+    Talks to the Supabase Storage REST API through one pooled HTTP session per process instead of
+    the supabase client: public URLs are built locally (memoized, no request), uploads are streamed
+    in chunks, downloads are spooled to a temporary file, and HEAD metadata (size, modification
+    time) of existing objects is cached in Django's cache for `SUPABASE_STORAGE_CACHE_TTL` seconds.
+    Missing objects are not cached, an object uploaded by another process is seen right away.
+
+    With `SUPABASE_STORAGE_LOCAL_ROOT` set, a filesystem transport stands in for the API, so the
+    same storage code can be tested and benchmarked offline.
+"""
+import datetime
+import hashlib
+import mimetypes
+import os
+import tempfile
+import threading
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import quote
 
-import supabase
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+
+STORAGE_TIMEOUT = (5, 60)
+STORAGE_POOL_SIZE = 20
+STORAGE_CHUNK_SIZE = 256 * 1024
+STORAGE_CACHE_KEY = 'lowbono:storage:{}:{}'
+STORAGE_CACHE_TTL = 300
+# objects under these prefixes have content-hashed names (lowbono_app.renditions) and never change
+IMMUTABLE_PREFIXES = ('renditions/',)
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """ process-wide pooled HTTP session, a forked process gets its own """
+    global _session, _session_pid
+
+    if _session_pid != os.getpid():
+        with _session_lock:
+            if _session_pid != os.getpid():
+                session = requests.Session()
+                retries = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods=('HEAD', 'GET'))
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=STORAGE_POOL_SIZE, max_retries=retries)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session, _session_pid = session, os.getpid()
+    return _session
+
+
+@lru_cache(maxsize=4096)
+def public_url(base_url, bucket_name, name):
+    """ public object URL, the same as the supabase client's `get_public_url` without building a client """
+    return f'{base_url.rstrip("/")}/storage/v1/object/public/{quote(bucket_name)}/{quote(name.lstrip("/"))}'
+
+
+class SupabaseTransport:
+    """ Storage REST API calls; missing objects raise FileNotFoundError, name conflicts FileExistsError """
+
+    def __init__(self, base_url, key, bucket_name):
+        self.base_url = base_url.rstrip('/')
+        self.bucket_name = bucket_name
+        self.headers = {'apikey': key, 'Authorization': f'Bearer {key}'}
+
+    def object_url(self, name):
+        return f'{self.base_url}/storage/v1/object/{quote(self.bucket_name)}/{quote(name.lstrip("/"))}'
+
+    def _check(self, response, name):
+        if response.status_code == 404 or (response.status_code == 400 and 'not_found' in response.text):
+            raise FileNotFoundError(name)
+        if response.status_code == 409:
+            raise FileExistsError(name)
+        response.raise_for_status()
+
+    def upload(self, name, chunks, content_type=None, max_age=None):
+        headers = {**self.headers, 'x-upsert': 'false', 'Content-Type': content_type or 'application/octet-stream'}
+        if max_age:
+            headers['Cache-Control'] = f'max-age={max_age}'
+        # a generator body is sent with chunked transfer encoding, the file is never fully in memory
+        response = get_session().post(self.object_url(name), data=chunks, headers=headers, timeout=STORAGE_TIMEOUT)
+        self._check(response, name)
+
+    def download(self, name, chunk_size):
+        response = get_session().get(self.object_url(name), headers=self.headers, stream=True, timeout=STORAGE_TIMEOUT)
+        self._check(response, name)
+        with response:
+            yield from response.iter_content(chunk_size)
+
+    def head(self, name):
+        """ {'size', 'modified', 'content_type'} or None when the object doesn't exist """
 
+        response = get_session().head(public_url(self.base_url, self.bucket_name, name), timeout=STORAGE_TIMEOUT)
+        if response.status_code in (400, 404):
+            return None
+        response.raise_for_status()
+        modified = response.headers.get('Last-Modified')
+        return {
+            'size': int(response.headers.get('Content-Length', 0)),
+            'modified': parsedate_to_datetime(modified).timestamp() if modified else None,
+            'content_type': response.headers.get('Content-Type'),
+        }
+
+    def delete(self, name):
+        response = get_session().delete(f'{self.base_url}/storage/v1/object/{quote(self.bucket_name)}',
+                                        json={'prefixes': [name]}, headers=self.headers, timeout=STORAGE_TIMEOUT)
+        response.raise_for_status()
+
+
+class LocalSupabaseTransport:
+    """ filesystem stand-in for SupabaseTransport, objects are stored under `<root>/<bucket>/` """
+
+    def __init__(self, root, bucket_name):
+        self.bucket_name = bucket_name
+        self.root = Path(root) / bucket_name
+
+    def path(self, name):
+        path = (self.root / name.lstrip('/')).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            raise ValueError(f'{name} is outside of the storage root')
+        return path
+
+    def upload(self, name, chunks, content_type=None, max_age=None):
+        path = self.path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'xb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+    def download(self, name, chunk_size):
+        with open(self.path(name), 'rb') as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def head(self, name):
+        try:
+            stat = self.path(name).stat()
+        except FileNotFoundError:
+            return None
+        return {'size': stat.st_size, 'modified': stat.st_mtime, 'content_type': None}
+
+    def delete(self, name):
+        self.path(name).unlink(missing_ok=True)
+
+
+@deconstructible
 class SupabaseCustomStorage(Storage):
-    def __init__(self):
-        self.client = supabase.create_client(settings.SUPABASE_INSTANCE_URL, settings.SUPABASE_STORAGE_KEY)
-        self.bucket_name = settings.SUPABASE_STORAGE_BUCKET
+    """
+        Default file storage on dokku. Arguments default to the SUPABASE_* settings;
+        `local_root` (or SUPABASE_STORAGE_LOCAL_ROOT) swaps the API for LocalSupabaseTransport.
+    """
+
+    def __init__(self, base_url=None, key=None, bucket_name=None, local_root=None, cache_ttl=None):
+        self.base_url = base_url or getattr(settings, 'SUPABASE_INSTANCE_URL', None) or ''
+        self.bucket_name = bucket_name or settings.SUPABASE_STORAGE_BUCKET
+        self.cache_ttl = cache_ttl if cache_ttl is not None else getattr(settings, 'SUPABASE_STORAGE_CACHE_TTL', STORAGE_CACHE_TTL)
+
+        local_root = local_root or getattr(settings, 'SUPABASE_STORAGE_LOCAL_ROOT', None)
+        if local_root:
+            self.transport = LocalSupabaseTransport(local_root, self.bucket_name)
+        else:
+            self.transport = SupabaseTransport(self.base_url, key or settings.SUPABASE_STORAGE_KEY, self.bucket_name)
+
+    def _cache_key(self, name):
+        return STORAGE_CACHE_KEY.format(self.bucket_name, hashlib.sha1(name.encode()).hexdigest())
+
+    def metadata(self, name):
+        """ cached HEAD metadata of `name`, None when it doesn't exist """
+
+        key = self._cache_key(name)
+        metadata = cache.get(key)
+        if metadata is None:
+            metadata = self.transport.head(name)
+            if metadata is not None:
+                cache.set(key, metadata, self.cache_ttl)
+        return metadata
 
     def _open(self, name, mode='rb'):
-        raise NotImplementedError("This method is not implemented.")
+        if any(flag in mode for flag in 'wax+'):
+            raise ValueError('SupabaseCustomStorage only opens files for reading')
+
+        spooled = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, mode='w+b')
+        try:
+            for chunk in self.transport.download(name, STORAGE_CHUNK_SIZE):
+                spooled.write(chunk)
+        except Exception:
+            spooled.close()
+            raise
+        spooled.seek(0)
+        return File(spooled, name)
 
     def _save(self, name, content):
-        content.seek(0)
-        response = self.client.storage.from_(self.bucket_name).upload(name, content.read())
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        size = 0
+
+        def chunks():
+            nonlocal size
+            for chunk in content.chunks(STORAGE_CHUNK_SIZE):
+                chunk = chunk.encode() if isinstance(chunk, str) else chunk
+                size += len(chunk)
+                yield chunk
+
+        content_type = getattr(content, 'content_type', None) or mimetypes.guess_type(name)[0]
+        max_age = IMMUTABLE_MAX_AGE if name.startswith(IMMUTABLE_PREFIXES) else None
+        self.transport.upload(name, chunks(), content_type, max_age)
+        cache.set(self._cache_key(name), {'size': size, 'modified': timezone.now().timestamp(),
+                                          'content_type': content_type}, self.cache_ttl)
         return name
 
     def delete(self, name):
-        response = self.client.storage.from_(self.bucket_name).remove(name)
-        return name
+        self.transport.delete(name)
+        cache.delete(self._cache_key(name))
 
     def exists(self, name):
-        response = requests.head(self.url(name))
-        return response.status_code == 200
+        return self.metadata(name) is not None
+
+    def size(self, name):
+        metadata = self.metadata(name)
+        if metadata is None:
+            raise FileNotFoundError(name)
+        return metadata['size']
+
+    def get_modified_time(self, name):
+        metadata = self.metadata(name)
+        if metadata is None or metadata['modified'] is None:
+            raise FileNotFoundError(name)
+        modified = datetime.datetime.fromtimestamp(metadata['modified'], tz=datetime.timezone.utc)
+        return modified if settings.USE_TZ else timezone.make_naive(modified)
 
     def url(self, name):
-        return self.client.storage.from_(self.bucket_name).get_public_url(name)
+        return public_url(self.base_url, self.bucket_name, name)
@@ -1,28 +1,163 @@
 import datetime
 import nested_admin
 from django import forms
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.views.main import SEARCH_VAR
+from nested_admin.formsets import NestedInlineFormSet
 from django.utils.html import format_html
+from django.utils.text import capfirst
 from django.contrib.auth.admin import UserAdmin as UserAdminBase
 from django.utils.translation import gettext, gettext_lazy as _
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 from django.db.models import Case, When
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db.models import Q, Prefetch
+from django.db import transaction
+from django.template.response import TemplateResponse
+from django.urls import NoReverseMatch, reverse
 
-from lowbono_app.models import User, BarAdmission, Language, Referral, ReferralSource, ProfileNote, SystemEmailTemplates, EmailTemplates, EmailAPILogs, CeleryETATasks, ReferralNotifications, PracticeAreaCategory, PracticeArea, ReferralNote, PovertyLineRate, EmailEventInactiveFor, EmailEventEnterState, EmailEventDeadline, SystemEmailEvents, NewsArticles
+from lowbono_app.models import User, BarAdmission, Language, Referral, ReferralSource, ProfileNote, SystemEmailTemplates, EmailTemplates, EmailAPILogs, CeleryETATasks, ReferralNotifications, PracticeAreaCategory, PracticeArea, ReferralNote, PovertyLineRate, EmailEventInactiveFor, EmailEventEnterState, EmailEventDeadline, SystemEmailEvents, NewsArticles, EligibilitySnapshot
 from lowbono_lawyer.models import Lawyer, LawyerPracticeAreas, LawyerReferral, LawyerLLMLogs
 from lowbono_mediator.models import Mediator, MediatorPracticeAreas, MediatorReferral
 from lowbono_lawyer.workflows import ReferralLawyerWorkflowState, HistoricalReferralLawyerWorkflowState
 from lowbono_mediator.workflows import ReferralMediatorWorkflowState, HistoricalReferralMediatorWorkflowState
+from lowbono_app import search, exports, availability
+from lowbono_app.constants import ATTORNEY_PROVIDED_RATES_BEAUTIFY
+from lowbono_app.profile_completeness import defer_profile_completeness, refresh_profile_completeness, schedule_profile_completeness
 
 
-class ReferralInline(nested_admin.NestedTabularInline):
+class FullTextSearchAdminMixin:
+    """
+        Answers the changelist search box from the full-text index, ranked by relevance.
+        Falls back to the regular `search_fields` lookups when the index is unavailable.
+    """
+    search_kind = None
+
+    def _get_search_ids(self, request):
+        if not hasattr(request, '_search_ids'):
+            search_term = request.GET.get(SEARCH_VAR, '').strip()
+            request._search_ids = search.search_ids(self.search_kind, search_term, limit=search.RANK_LIMIT) if search_term else None
+        return request._search_ids
+
+    def get_search_results(self, request, queryset, search_term):
+        # every match is listed, the ranked ids only order the best ones first
+        matches = search.match_subquery(self.search_kind, search_term.strip()) if search_term.strip() else None
+        if matches is not None:
+            return queryset.filter(pk__in=matches), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def get_ordering(self, request):
+        ids = self._get_search_ids(request)
+        if ids:
+            return (search.rank_ordering(ids),)
+        return super().get_ordering(request)
+
+
+def get_request_choices(request, build):
+    """ `build()`, once per request, for every form asking for the same choices """
+    shared = request.__dict__.setdefault('_shared_choices', {})
+    if build not in shared:
+        shared[build] = list(build())
+    return shared[build]
+
+
+def practice_area_choices(professional_model):
+    """ practice areas of `professional_model` grouped by category, in id order """
+    children = PracticeArea.objects.extra(select={'cid': 'CAST(id AS INTEGER)'}).order_by('cid')
+    categories = (PracticeAreaCategory.objects.filter(practicearea_category_type=ContentType.objects.get_for_model(professional_model))
+                  .extra(select={'pid': 'CAST(id AS INTEGER)'}).order_by('pid')
+                  .prefetch_related(Prefetch('children', queryset=children)))
+    return [(pa.title, tuple((ch.id, ch.title) for ch in pa.children.all())) for pa in categories]
+
+
+def lawyer_practice_area_choices():
+    return practice_area_choices(Lawyer)
+
+
+def mediator_practice_area_choices():
+    return practice_area_choices(Mediator)
+
+
+def staff_choices():
+    return [('', '---------'), *((user.pk, str(user)) for user in User.objects.filter(is_staff=True))]
+
+
+class SharedChoicesForm(forms.ModelForm):
+    """
+        `choice_builders` maps field names to functions building their choices. Admin inlines
+        using SharedChoicesAdminMixin build them once per request for all their rows.
+    """
+    choice_builders = {}
+    shared_choices = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, build in self.choice_builders.items():
+            # readonly fields are removed from the form
+            if name in self.fields:
+                self.fields[name].choices = self.shared_choices[name] if name in self.shared_choices else build()
+
+
+def with_shared_choices(request, form):
+    if not getattr(form, 'choice_builders', None):
+        return form
+    shared_choices = {name: get_request_choices(request, build) for name, build in form.choice_builders.items()}
+    return type(form.__name__, (form,), {'shared_choices': shared_choices})
+
+
+class SharedChoicesAdminMixin:
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.form = with_shared_choices(request, formset.form)
+        return formset
+
+
+class LimitedInlineFormSet(NestedInlineFormSet):
+    """ renders only the first `limit` rows, submitted forms are matched by pk as usual """
+    limit = None
+
+    def get_queryset(self):
+        if self.data or self.limit is None:
+            return super().get_queryset()
+        if not hasattr(self, '_limited_queryset'):
+            self._limited_queryset = super().get_queryset()[:self.limit]
+        return self._limited_queryset
+
+
+class LimitedInlineMixin:
+    """
+        Shows the `limit` first rows (see `ordering`) of an inline that can grow long, the title
+        links to all of them in the model's changelist
+    """
+    limit = 20
+    formset = LimitedInlineFormSet
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.limit = self.limit
+        if obj is not None and not hasattr(self, 'title'):
+            total = self.get_queryset(request).filter(**{formset.fk.name: obj}).count()
+            if total > self.limit:
+                self.title = self.get_limited_title(formset.fk, obj, total)
+        return formset
+
+    def get_limited_title(self, fk, obj, total):
+        title = f'{capfirst(self.verbose_name_plural)} (latest {self.limit} of {total})'
+        try:
+            url = reverse(f'admin:{self.model._meta.app_label}_{self.model._meta.model_name}_changelist')
+        except NoReverseMatch:
+            return title
+        return format_html('{} <a href="{}?{}__id__exact={}">View all</a>', title, url, fk.name, obj.pk)
+
+
+class ReferralInline(LimitedInlineMixin, nested_admin.NestedTabularInline):
     model = Referral
     extra = 0
     max_num = 0
     show_change_link = True
+    ordering = ('-created_at', '-id')
 
     readonly_fields = (
         'first_name',
@@ -38,6 +173,10 @@ class ReferralInline(nested_admin.NestedTabularInline):
 
     list_filter = ('first_name', 'last_name', 'referral_type')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'professional', 'practice_area', 'referrallawyerworkflowstate__current_task', 'referralmediatorworkflowstate__current_task')
+
     def referral_type(self, obj):
         if hasattr(obj, 'referrallawyerworkflowstate'):
             return "LAWYER"
@@ -84,31 +223,23 @@ class BarAdmissionInline(nested_admin.NestedTabularInline):
     extra = 0
 
 
-class LawyerPracticeAreasCustomForm(forms.ModelForm):
+class LawyerPracticeAreasCustomForm(SharedChoicesForm):
+    practicearea = forms.ModelChoiceField(queryset=PracticeArea.objects.all())
+    choice_builders = {'practicearea': lawyer_practice_area_choices}
+
     class Meta:
         model = LawyerPracticeAreas
         fields = ('practicearea', 'approved')
 
-    def __init__(self, *args, **kwargs):
-        super(LawyerPracticeAreasCustomForm, self).__init__(*args, **kwargs)
-
-        self.fields['practicearea'] = forms.ModelChoiceField(queryset=PracticeArea.objects.all())
-
-        pa_choices = []
-        for pa in PracticeAreaCategory.objects.filter(practicearea_category_type=ContentType.objects.get_for_model(Lawyer)).extra(select={'pid': 'CAST(id AS INTEGER)'}).order_by('pid'):
-            items = []
-            for ch in pa.children.all().extra(select={'cid': 'CAST(id AS INTEGER)'}).order_by('cid'):
-                items.append((ch.id, ch.title))
-            pa_choices.append((pa.title, tuple(items)))
-
-        self.fields['practicearea'].choices = pa_choices
-
 
-class LawyerPracticeAreasInline(nested_admin.NestedTabularInline):
+class LawyerPracticeAreasInline(SharedChoicesAdminMixin, nested_admin.NestedTabularInline):
     model = LawyerPracticeAreas
     extra = 0
     form = LawyerPracticeAreasCustomForm
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('lawyer__user')
+
 
 class LawyerInline(nested_admin.NestedStackedInline):
     model = Lawyer
@@ -118,32 +249,27 @@ class LawyerInline(nested_admin.NestedStackedInline):
     max_num = 0
     readonly_fields = ('is_profile_complete',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
+
+
+class MediatorPracticeAreasCustomForm(SharedChoicesForm):
+    practicearea = forms.ModelChoiceField(queryset=PracticeArea.objects.all())
+    choice_builders = {'practicearea': mediator_practice_area_choices}
 
-class MediatorPracticeAreasCustomForm(forms.ModelForm):
     class Meta:
         model = MediatorPracticeAreas
         fields = ('practicearea', 'approved')
 
-    def __init__(self, *args, **kwargs):
-        super(MediatorPracticeAreasCustomForm, self).__init__(*args, **kwargs)
-
-        self.fields['practicearea'] = forms.ModelChoiceField(queryset=PracticeArea.objects.all())
-
-        pa_choices = []
-        for pa in PracticeAreaCategory.objects.filter(practicearea_category_type=ContentType.objects.get_for_model(Mediator)).extra(select={'pid': 'CAST(id AS INTEGER)'}).order_by('pid'):
-            items = []
-            for ch in pa.children.all().extra(select={'cid': 'CAST(id AS INTEGER)'}).order_by('cid'):
-                items.append((ch.id, ch.title))
-            pa_choices.append((pa.title, tuple(items)))
-
-        self.fields['practicearea'].choices = pa_choices
-
 
-class MediatorPracticeAreasInline(nested_admin.NestedTabularInline):
+class MediatorPracticeAreasInline(SharedChoicesAdminMixin, nested_admin.NestedTabularInline):
     model = MediatorPracticeAreas
     extra = 0
     form = MediatorPracticeAreasCustomForm
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('mediator__user')
+
 
 class MediatorInline(nested_admin.NestedStackedInline):
     model = Mediator
@@ -153,34 +279,41 @@ class MediatorInline(nested_admin.NestedStackedInline):
     max_num = 0
     readonly_fields = ('is_profile_complete',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
+
 
 class LanguageInline(nested_admin.NestedTabularInline):
     model = Language
     extra = 0
 
 
-class ProfileNoteInlineAdminForm(forms.ModelForm):
+class ProfileNoteInlineAdminForm(SharedChoicesForm):
+    admin = forms.ModelChoiceField(queryset=User.objects.filter(is_staff=True))
+    choice_builders = {'admin': staff_choices}
+
     class Meta:
         model = ProfileNote
         fields = ('note', 'admin')
 
-    def __init__(self, *args, **kwargs):
-        super(ProfileNoteInlineAdminForm, self).__init__(*args, **kwargs)
-        self.fields['admin'] = forms.ModelChoiceField(queryset=User.objects.filter(is_staff=True).all())
-
 
-class ProfileNoteInlineList(nested_admin.NestedTabularInline):
+class ProfileNoteInlineList(LimitedInlineMixin, nested_admin.NestedTabularInline):
     model = ProfileNote
     show_change_link = True
     fk_name = "professional"
     readonly_fields = ("note", "admin",)
     # list_display = ("note", "admin", "created_at", )
     extra = 0
+    ordering = ('-created_at', '-id')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('admin', 'professional')
+
     def has_add_permission(self, request, obj=None):
         return False
 
 
-class ProfileNoteInlineAdd(nested_admin.NestedTabularInline):
+class ProfileNoteInlineAdd(SharedChoicesAdminMixin, nested_admin.NestedTabularInline):
     model = ProfileNote
     form = ProfileNoteInlineAdminForm
     fk_name = "professional"
@@ -204,12 +337,13 @@ class UserAdminForm(forms.ModelForm):
 
 
 @admin.register(User)
-class UserAdmin(nested_admin.NestedModelAdmin):
+class UserAdmin(FullTextSearchAdminMixin, nested_admin.NestedModelAdmin):
     list_display = ('email', 'first_name', 'last_name', 'correspondence', 'firm_name', 'is_on_vacation', 'lawyer_profile_complete', 'mediator_profile_complete')
 
     list_filter = ('first_name', 'last_name', 'firm_name', 'is_profile_complete')
 
     search_fields = ('first_name', 'last_name',)
+    search_kind = 'user'
 
     inlines = (LanguageInline, LawyerInline, MediatorInline, BarAdmissionInline, ReferralInline, ProfileNoteInlineList, ProfileNoteInlineAdd)
     fieldsets = (
@@ -242,6 +376,29 @@ class UserAdmin(nested_admin.NestedModelAdmin):
 
     form = UserAdminForm
 
+    actions = ('refresh_profile_completeness',)
+
+    def formfield_for_manytomany(self, db_field, request=None, **kwargs):
+        if db_field.name == 'user_permissions':
+            # str(permission) includes its content type, as in django.contrib.auth's UserAdmin
+            kwargs['queryset'] = db_field.remote_field.model.objects.select_related('content_type')
+        return super().formfield_for_manytomany(db_field, request=request, **kwargs)
+
+    def save_related(self, request, form, formsets, change):
+        """
+            practice area and bar admission inlines each change profile completeness,
+            refresh it once for the whole form
+        """
+        with defer_profile_completeness():
+            super().save_related(request, form, formsets, change)
+            # the professional inlines save their stale flag too
+            schedule_profile_completeness([form.instance])
+
+    @admin.action(description='Recompute profile completeness of selected users')
+    def refresh_profile_completeness(self, request, queryset):
+        changed = refresh_profile_completeness(queryset.values_list('pk', flat=True))
+        self.message_user(request, f'{sum(len(rows) for rows in changed.values())} profile flags updated.', messages.SUCCESS)
+
     def correspondence(self, object):
         return format_html(f"<a href='https://groups.google.com/a/lowbono.org/g/support/search?q={object.email}'>View</a>")
 
@@ -252,6 +409,9 @@ class UserAdmin(nested_admin.NestedModelAdmin):
         else:
             return None
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(on_vacation=availability.unavailable_q(datetime.date.today(), user_field='pk'))
+
     def is_on_vacation(self, object):
         return "Yes" if object.is_on_vacation() else "No"
 
@@ -266,14 +426,33 @@ class UserAdmin(nested_admin.NestedModelAdmin):
     mediator_profile_complete.admin_order_field = 'mediator__is_profile_complete'
 
 
-class ReferralNoteAdminForm(forms.ModelForm):
+class ReferralNoteAdminForm(SharedChoicesForm):
+    staff = forms.ModelChoiceField(queryset=User.objects.filter(is_staff=True))
+    choice_builders = {'staff': staff_choices}
+
     class Meta:
         model = ReferralNote
         fields = ('note', 'referral', 'staff')
 
-    def __init__(self, *args, **kwargs):
-        super(ReferralNoteAdminForm, self).__init__(*args, **kwargs)
-        self.fields['staff'] = forms.ModelChoiceField(queryset=User.objects.filter(is_staff=True).all())
+
+class BulkStatusUpdateForm(forms.Form):
+    hours_worked = forms.DecimalField(min_value=0, max_digits=6, decimal_places=2, required=False, initial=0)
+    notes = forms.CharField(widget=forms.Textarea(attrs={'rows': 3}), required=False)
+    is_income_eligible = forms.TypedChoiceField(label='Rates', required=False, empty_value=None,
+                                                coerce=lambda value: value == 'True',
+                                                choices=[('', 'Keep current answer'), *ATTORNEY_PROVIDED_RATES_BEAUTIFY.items()])
+    ineligible_reason = forms.CharField(widget=forms.Textarea(attrs={'rows': 3}), required=False)
+
+    def __init__(self, *args, workflow_models=(ReferralLawyerWorkflowState, ReferralMediatorWorkflowState), **kwargs):
+        super().__init__(*args, **kwargs)
+        # node names overlap between workflow types, every type gets its own status choices
+        for workflow_model in reversed(workflow_models):
+            self.fields = {self.get_next_node_field_name(workflow_model): forms.ChoiceField(
+                label=f'New status ({workflow_model._meta.verbose_name})', choices=list(workflow_model.pretty_nodes.items())), **self.fields}
+
+    @staticmethod
+    def get_next_node_field_name(workflow_model):
+        return f'next_node_{workflow_model._meta.model_name}'
 
 
 @admin.register(ReferralNote)
@@ -349,19 +528,23 @@ class ReferralNotificationsInline(nested_admin.NestedTabularInline):
         return False
 
 
-class ReferralNoteInlineList(nested_admin.NestedTabularInline):
+class ReferralNoteInlineList(LimitedInlineMixin, nested_admin.NestedTabularInline):
     model = ReferralNote
     show_change_link = True
     readonly_fields = ("note", "staff", )
     extra = 0
     verbose_name = "Note on Referral"
     verbose_name_plural = "All Notes on Referral"
+    ordering = ('-created_at', '-id')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('staff')
 
     def has_add_permission(self, request, obj=None):
         return False
 
 
-class ReferralNoteInlineAdd(nested_admin.NestedTabularInline):
+class ReferralNoteInlineAdd(SharedChoicesAdminMixin, nested_admin.NestedTabularInline):
     model = ReferralNote
     form = ReferralNoteAdminForm
     show_change_link = True
@@ -425,9 +608,12 @@ class MediatorReferralStatusFilter(admin.SimpleListFilter):
 
 
 @admin.register(Referral)
-class ReferralAdmin(nested_admin.NestedModelAdmin):
+class ReferralAdmin(FullTextSearchAdminMixin, nested_admin.NestedModelAdmin):
     model = Referral
 
+    search_fields = ('first_name', 'last_name', 'email',)
+    search_kind = 'referral'
+
     list_filter = (IsOverDueFilter, LawyerReferralStatusFilter, MediatorReferralStatusFilter, 'professional',)
 
     list_display = ('get_date_formatted', 'professional_link', 'referral_type', 'client_name', 'pretty_view', 'update_status', 'is_overdue', 'referral_status', 'email', 'practice_area')
@@ -441,6 +627,62 @@ class ReferralAdmin(nested_admin.NestedModelAdmin):
 
     inlines = (ReferralNoteInlineList, ReferralNoteInlineAdd, LawyerReferralEngagementReportsInline, MediatorReferralEngagementReportsInline, ReferralNotificationsInline)
 
+    actions = ('bulk_update_status', 'export_referrals_csv', 'export_referrals_jsonl', 'export_engagement_reports_csv', 'export_notifications_csv')
+
+    @admin.action(description='Update status of selected referrals')
+    def bulk_update_status(self, request, queryset):
+        workflow_ids = {}
+        for workflow_model in (ReferralLawyerWorkflowState, ReferralMediatorWorkflowState):
+            accessor = workflow_model._meta.get_field('referral').remote_field.get_accessor_name()
+            ids = list(queryset.filter(**{f'{accessor}__isnull': False}).values_list(f'{accessor}__pk', flat=True))
+            if ids:
+                workflow_ids[workflow_model] = ids
+        form = BulkStatusUpdateForm(request.POST if 'apply' in request.POST else None, workflow_models=tuple(workflow_ids))
+
+        if form.is_bound and form.is_valid():
+            updated = 0
+            data = form.cleaned_data
+            try:
+                with transaction.atomic():
+                    for workflow_model, ids in workflow_ids.items():
+                        next_node = data[form.get_next_node_field_name(workflow_model)]
+                        updates = [(workflow_id, next_node, data['hours_worked'], data['notes'], data['is_income_eligible'], data['ineligible_reason'] or None)
+                                   for workflow_id in ids]
+                        updated += len(workflow_model.objects.bulk_transition(updates, request.user))
+            except ValidationError as e:
+                for workflow_id, errors in e.message_dict.items():
+                    self.message_user(request, f'Workflow #{workflow_id}: {errors[0]} No referral was updated.', messages.ERROR)
+                return None
+
+            self.message_user(request, f'{updated} referrals updated.', messages.SUCCESS)
+            return None
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Update status of selected referrals',
+            'opts': self.model._meta,
+            'queryset': queryset,
+            'form': form,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/lowbono_app/referral/bulk_update_status.html', context)
+
+    @admin.action(description='Export selected referrals (CSV)')
+    def export_referrals_csv(self, request, queryset):
+        return exports.streaming_export_response('referrals', 'csv', queryset)
+
+    @admin.action(description='Export selected referrals (JSON lines)')
+    def export_referrals_jsonl(self, request, queryset):
+        return exports.streaming_export_response('referrals', 'jsonl', queryset)
+
+    @admin.action(description='Export engagement reports of selected referrals (CSV)')
+    def export_engagement_reports_csv(self, request, queryset):
+        return exports.streaming_export_response('engagement_reports', 'csv', queryset)
+
+    @admin.action(description='Export notifications of selected referrals (CSV)')
+    def export_notifications_csv(self, request, queryset):
+        return exports.streaming_export_response('notifications', 'csv', queryset)
+
     def client_name(self, obj):
         return obj.first_name + " " + obj.last_name
 
@@ -873,6 +1115,24 @@ class LLMLogsAdmin(admin.ModelAdmin):
         return []
 
 
+@admin.register(EligibilitySnapshot)
+class EligibilitySnapshotAdmin(admin.ModelAdmin):
+    """ daily snapshots taken by lowbono_app.eligibility, filter on "change" for the day-over-day diff """
+
+    list_display = ('date', 'professional', 'professional_type', 'practice_area', 'is_eligible', 'reasons', 'previous_reasons', 'change')
+    list_filter = ('change', 'is_eligible', 'professional_type', 'practice_area')
+    list_select_related = ('professional', 'professional_type', 'practice_area')
+    search_fields = ('professional__email', 'professional__first_name', 'professional__last_name')
+    date_hierarchy = 'date'
+    ordering = ('-date', 'professional_id')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(NewsArticles)
 class NewsArticlesAdmin(admin.ModelAdmin):
     list_display = ('title', 'status', 'created_at')
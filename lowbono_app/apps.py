@@ -8,3 +8,21 @@ class LowbonoAppConfig(AppConfig):
     def ready(self):
         from .pluggable_app import PluggableApp
         PluggableApp.autodiscover()
+
+        from .directory_cache import connect_directory_signals
+        connect_directory_signals()
+
+        from .search import connect_search_signals
+        connect_search_signals()
+
+        from .renditions import connect_rendition_signals
+        connect_rendition_signals()
+
+        from .profile_completeness import connect_profile_completeness_signals
+        connect_profile_completeness_signals()
+
+        from .availability import connect_availability_signals
+        connect_availability_signals()
+
+        from .reporting import connect_reporting_signals
+        connect_reporting_signals()
@@ -0,0 +1,149 @@
+"""
+    Tiered archival of cold rows.
+
+    Workflow history and notifications of referrals closed for longer than
+    `settings.ARCHIVE_AFTER_DAYS`, together with older email API logs and celery task
+    results, are moved in batches into `ArchivedRecord` as zlib-compressed JSON, keeping
+    the hot tables (and their indexes) small. Workflow read paths (timeline, reported
+    hours, engagement reports) read archived rows back through `restore()`.
+"""
+import datetime
+import json
+import zlib
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+KIND_WORKFLOW_HISTORY = 'workflow_history'
+KIND_NOTIFICATION = 'notification'
+KIND_EMAIL_API_LOG = 'email_api_log'
+KIND_CELERY_RESULT = 'celery_result'
+
+ARCHIVE_BATCH_SIZE = 500
+
+
+class ArchiveJSONEncoder(DjangoJSONEncoder):
+    """ keeps full microsecond precision, so restored timestamps still order and compare like the originals """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def pack(row):
+    return zlib.compress(json.dumps(row, cls=ArchiveJSONEncoder).encode())
+
+
+def unpack(payload):
+    return json.loads(zlib.decompress(bytes(payload)))
+
+
+def restore(model, row):
+    """ unsaved `model` instance rebuilt from an archived row (extra archived keys are kept as attributes) """
+
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    instance = model(**{name: fields[name].to_python(value) for name, value in row.items() if name in fields})
+    for name, value in row.items():
+        if name not in fields:
+            setattr(instance, name, value)
+    return instance
+
+
+def archived_rows(kind, **filters):
+    """ unpacked rows of `kind` matching `filters` (ArchivedRecord fields), newest first """
+    from .models import ArchivedRecord
+
+    records = ArchivedRecord.objects.filter(kind=kind, **filters).order_by('-timestamp').values_list('payload', flat=True)
+    return [unpack(payload) for payload in records]
+
+
+def _move(rows, pk_field, to_record, batch_size, before_delete=None):
+    """
+        Moves `rows` (a values() queryset) into ArchivedRecord in batches, each batch in its own transaction:
+        archive rows are inserted, `before_delete(ids)` runs, then the source rows are deleted.
+    """
+    from .models import ArchivedRecord
+
+    moved = 0
+    while True:
+        batch = list(rows.order_by(pk_field)[:batch_size])
+        if not batch:
+            return moved
+
+        ids = [row[pk_field] for row in batch]
+        with transaction.atomic():
+            ArchivedRecord.objects.bulk_create([to_record(row) for row in batch])
+            if before_delete:
+                before_delete(ids)
+            rows.model.objects.filter(**{f'{pk_field}__in': ids}).delete()
+        moved += len(batch)
+
+
+def _workflow_models():
+    from .pluggable_app import PluggableApp
+
+    return [app._models.ReferralWorkflowState for app in PluggableApp.get_apps()]
+
+
+def archive_closed_referrals(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """ archives workflow history and notifications of referrals whose workflow closed before `cutoff` """
+    from .models import ArchivedRecord, ReferralNotifications
+
+    counts = {KIND_WORKFLOW_HISTORY: 0, KIND_NOTIFICATION: 0}
+    workflow_models = _workflow_models()
+
+    def detach_notifications(ids):
+        # workflows cascade on their notification, point them away before the notification rows go
+        for workflow_model in workflow_models:
+            workflow_model.objects.filter(notification_id__in=ids).update(notification=None)
+
+    for workflow_model in workflow_models:
+        workflow_type = ContentType.objects.get_for_model(workflow_model)
+        closed = workflow_model.objects.filter(workflow_model.objects._matter_bucket_filters()['closed'],
+                                               current_task__created__lt=cutoff)
+
+        history = workflow_model.history.field.model.objects.filter(id__in=closed.values('pk')) \
+                                                            .values() \
+                                                            .annotate(archive_task_name=F('current_task__name'))
+        counts[KIND_WORKFLOW_HISTORY] += _move(history, 'history_id', lambda row: ArchivedRecord(
+            kind=KIND_WORKFLOW_HISTORY, workflow_type=workflow_type, referral_id=row['referral_id'],
+            source_id=row['history_id'], timestamp=row['updated_at'], hours_worked=row['hours_worked'], payload=pack(row)), batch_size)
+
+        notifications = ReferralNotifications.objects.filter(referral_id__in=closed.values('referral_id')) \
+                                                     .values() \
+                                                     .annotate(archive_template_description=F('template__description'),
+                                                               archive_template_recipient=F('template__recipient'))
+        counts[KIND_NOTIFICATION] += _move(notifications, 'id', lambda row: ArchivedRecord(
+            kind=KIND_NOTIFICATION, workflow_type=workflow_type, referral_id=row['referral_id'],
+            source_id=row['id'], timestamp=row['created_at'], payload=pack(row)), batch_size, before_delete=detach_notifications)
+
+    return counts
+
+
+def archive_logs(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """ archives email API logs and celery task results older than `cutoff` """
+    from django_celery_results.models import TaskResult
+    from .models import ArchivedRecord, EmailAPILogs
+
+    email_logs = EmailAPILogs.objects.filter(created_at__lt=cutoff).values()
+    celery_results = TaskResult.objects.filter(date_done__lt=cutoff).values()
+
+    return {
+        KIND_EMAIL_API_LOG: _move(email_logs, 'id', lambda row: ArchivedRecord(
+            kind=KIND_EMAIL_API_LOG, source_id=row['id'], timestamp=row['created_at'], payload=pack(row)), batch_size),
+        KIND_CELERY_RESULT: _move(celery_results, 'id', lambda row: ArchivedRecord(
+            kind=KIND_CELERY_RESULT, source_id=row['id'], timestamp=row['date_done'], payload=pack(row)), batch_size),
+    }
+
+
+def archive_cold_data(days=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """ runs every archival tier for rows older than `days` (default settings.ARCHIVE_AFTER_DAYS), returns counts per kind """
+
+    cutoff = timezone.now() - datetime.timedelta(days=settings.ARCHIVE_AFTER_DAYS if days is None else days)
+    return {**archive_closed_referrals(cutoff, batch_size), **archive_logs(cutoff, batch_size)}
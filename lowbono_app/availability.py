@@ -0,0 +1,156 @@
+"""
+    Availability calendar of professionals.
+
+    Vacations are materialized as one UnavailableDay row per professional and day, from
+    AVAILABILITY_RETENTION_DAYS ago up to AVAILABILITY_HORIZON_DAYS ahead, so "who is available
+    on <day>" is an indexed lookup instead of range comparisons over every vacation (which also
+    duplicated rows when a professional had several). Future-dated vacations ("unavailable next
+    month") are part of the window and answer matching for any day in it.
+
+    A user's rows are rebuilt whenever one of their vacations is saved or deleted, the nightly
+    `roll_over_availability` task extends the window for open-ended and long vacations and
+    drops expired rows. Days outside the window fall back to the vacation ranges.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import post_save, post_delete
+
+
+# days of the horizon left out of lookups, so a missed nightly run never answers from unbuilt days
+ROLLOVER_GRACE_DAYS = 7
+BULK_BATCH_SIZE = 1000
+
+
+def get_window(today=None):
+    """ (first, last) day materialized as of `today` """
+    today = today or datetime.date.today()
+    return (today - datetime.timedelta(days=settings.AVAILABILITY_RETENTION_DAYS),
+            today + datetime.timedelta(days=settings.AVAILABILITY_HORIZON_DAYS))
+
+
+def is_materialized(day, today=None):
+    first, last = get_window(today)
+    return first <= day <= last - datetime.timedelta(days=ROLLOVER_GRACE_DAYS)
+
+
+def _days(first_day, last_day, window):
+    """ the days of a vacation inside `window`, open-ended vacations run to its end """
+    start = max(first_day, window[0])
+    end = min(last_day or window[1], window[1])
+    return [start + datetime.timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def _unavailable_days(vacations, window):
+    from .models import UnavailableDay
+
+    seen = set()
+    for user_id, first_day, last_day in vacations:
+        for day in _days(first_day, last_day, window):
+            if (user_id, day) not in seen:
+                seen.add((user_id, day))
+                yield UnavailableDay(user_id=user_id, day=day)
+
+
+def _overlapping(vacations, first, last):
+    return vacations.filter(first_day__lte=last).filter(Q(last_day=None) | Q(last_day__gte=first))
+
+
+def rebuild_user_availability(user_ids, today=None):
+    """ replaces the UnavailableDay rows of `user_ids` from their vacations """
+    from .models import UnavailableDay, Vacation
+
+    window = get_window(today)
+    vacations = _overlapping(Vacation.objects.filter(user_id__in=user_ids), *window).values_list('user_id', 'first_day', 'last_day')
+    with transaction.atomic():
+        UnavailableDay.objects.filter(user_id__in=user_ids).delete()
+        UnavailableDay.objects.bulk_create(_unavailable_days(vacations, window), batch_size=BULK_BATCH_SIZE)
+
+
+def rebuild_availability(today=None):
+    """ rebuilds the whole calendar, returns the number of unavailable days """
+    from .models import UnavailableDay, Vacation
+
+    window = get_window(today)
+    vacations = _overlapping(Vacation.objects.all(), *window).values_list('user_id', 'first_day', 'last_day').iterator()
+    with transaction.atomic():
+        UnavailableDay.objects.all().delete()
+        return len(UnavailableDay.objects.bulk_create(_unavailable_days(vacations, window), batch_size=BULK_BATCH_SIZE))
+
+
+def roll_over_availability(today=None):
+    """
+        nightly: drops the days that left the window and adds the days that entered it, catching
+        up on up to ROLLOVER_GRACE_DAYS missed runs; returns (removed, added)
+    """
+    from .models import UnavailableDay, Vacation
+
+    first, last = get_window(today)
+    removed, _ = UnavailableDay.objects.filter(day__lt=first).delete()
+
+    entered = (last - datetime.timedelta(days=ROLLOVER_GRACE_DAYS), last)
+    existing = set(UnavailableDay.objects.filter(day__range=entered).values_list('user_id', 'day'))
+    vacations = _overlapping(Vacation.objects.all(), *entered).values_list('user_id', 'first_day', 'last_day').iterator()
+    days = [day for day in _unavailable_days(vacations, entered) if (day.user_id, day.day) not in existing]
+    UnavailableDay.objects.bulk_create(days, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+    return removed, len(days)
+
+
+def unavailable_q(day, user_field='user_id', today=None):
+    """ condition on a queryset holding `user_field`: the user is on vacation on `day` """
+    from .models import UnavailableDay, Vacation
+
+    if is_materialized(day, today):
+        return Exists(UnavailableDay.objects.filter(user_id=OuterRef(user_field), day=day))
+    return Exists(_overlapping(Vacation.objects.filter(user_id=OuterRef(user_field)), day, day))
+
+
+def unavailable_between_q(first_day, last_day, user_field='user_id', today=None):
+    """ condition: the user is on vacation on at least one day from `first_day` to `last_day` """
+    from .models import UnavailableDay, Vacation
+
+    if is_materialized(first_day, today) and is_materialized(last_day, today):
+        return Exists(UnavailableDay.objects.filter(user_id=OuterRef(user_field), day__range=(first_day, last_day)))
+    return Exists(_overlapping(Vacation.objects.filter(user_id=OuterRef(user_field)), first_day, last_day))
+
+
+def get_availability(user_ids, days, today=None):
+    """
+        {user id: {day: available}} for every user and day, in one query
+        (plus one over the vacations when some days are outside the window)
+    """
+    from .models import UnavailableDay, Vacation
+
+    user_ids, days = list(user_ids), sorted(set(days))
+    availability = {user_id: dict.fromkeys(days, True) for user_id in user_ids}
+    if not user_ids or not days:
+        return availability
+
+    materialized = [day for day in days if is_materialized(day, today)]
+    if materialized:
+        rows = UnavailableDay.objects.filter(user_id__in=user_ids, day__in=materialized).values_list('user_id', 'day')
+        for user_id, day in rows:
+            availability[user_id][day] = False
+
+    outside = sorted(set(days) - set(materialized))
+    if outside:
+        vacations = _overlapping(Vacation.objects.filter(user_id__in=user_ids), outside[0], outside[-1]).values_list('user_id', 'first_day', 'last_day')
+        for user_id, first_day, last_day in vacations:
+            for day in outside:
+                if first_day <= day and (last_day is None or day <= last_day):
+                    availability[user_id][day] = False
+    return availability
+
+
+def _rebuild_for_vacation(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rebuild_user_availability([instance.user_id])
+
+
+def connect_availability_signals():
+    from .models import Vacation
+
+    post_save.connect(_rebuild_for_vacation, sender=Vacation, dispatch_uid='availability_vacation_save')
+    post_delete.connect(_rebuild_for_vacation, sender=Vacation, dispatch_uid='availability_vacation_delete')
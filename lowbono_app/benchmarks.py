@@ -0,0 +1,236 @@
+"""
+    Benchmark suite for the `run-benchmarks` command.
+
+    Each benchmark is run `iterations` times (after `warmup` untimed runs) against the current
+    database, usually one filled by `generate-synthetic-data`. Results record wall time and query
+    counts (lowbono.profiling.QueryRecorder) as JSON, so runs on two commits can be compared with
+    `compare_results`. Benchmarks that write (the scheduled email tasks) run inside a transaction
+    that is rolled back, with emails going to the locmem backend.
+"""
+import statistics
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse, NoReverseMatch
+from django.utils import timezone
+
+from lowbono.profiling import QueryRecorder
+
+
+BENCHMARK_ADMIN_CHANGELISTS = (
+    'admin:lowbono_app_user_changelist',
+    'admin:lowbono_app_referral_changelist',
+    'admin:lowbono_app_referralnotifications_changelist',
+    'admin:lowbono_lawyer_lawyerreferral_changelist',
+    'admin:lowbono_mediator_mediatorreferral_changelist',
+    'admin:lowbono_app_celeryetatasks_changelist',
+)
+
+INTAKE_STEP_URL_NAMES = {'lowbono_lawyer': 'lawyer_step', 'lowbono_mediator': 'mediator_step'}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _rolled_back(func):
+    """ runs `func` in a transaction that is always rolled back, emails are kept in memory """
+
+    def run():
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            try:
+                with transaction.atomic():
+                    func()
+                    raise _Rollback()
+            except _Rollback:
+                pass
+    return run
+
+
+def _storage_roundtrip(size=512 * 1024):
+    """ save, exists, open and delete of one file through SupabaseCustomStorage on its filesystem stand-in """
+    from django.core.files.base import ContentFile
+    from lowbono.storage.supabase import SupabaseCustomStorage
+
+    content = b'\0' * size
+
+    def run():
+        # a directory per run, nothing is left behind when the suite is built but never run
+        with tempfile.TemporaryDirectory() as root:
+            storage = SupabaseCustomStorage(base_url='https://storage.invalid', bucket_name='benchmark', local_root=root)
+            name = storage.save('benchmark/file.bin', ContentFile(content))
+            storage.exists(name)
+            storage.url(name)
+            with storage.open(name) as f:
+                f.read()
+            storage.delete(name)
+    return run
+
+
+def _get(client, url, host):
+    def run():
+        response = client.get(url, HTTP_HOST=host)
+        if response.status_code >= 400:
+            raise RuntimeError(f'GET {url} returned {response.status_code}')
+    return run
+
+
+class BenchmarkSuite:
+    """
+        Collects the benchmarks to run against the current data. Professional pages are measured
+        as the professional with most referrals, admin changelists as the first superuser.
+    """
+
+    def __init__(self, host='localhost'):
+        self.host = host
+
+    def _busiest_referral(self):
+        from django.db.models import Count
+        from .models import Referral
+
+        busiest = Referral.objects.values('professional_id').annotate(referral_count=Count('id')).order_by('-referral_count').first()
+        return busiest and Referral.objects.filter(professional_id=busiest['professional_id']).order_by('-id').first()
+
+    def get_benchmarks(self):
+        """ {name: callable} of every benchmark available with the current data """
+        from .models import User
+        from .pluggable_app import PluggableApp
+        from . import tasks
+
+        benchmarks = {}
+
+        for app in PluggableApp.get_apps():
+            step_url_name = INTAKE_STEP_URL_NAMES.get(app.name)
+            if not step_url_name:
+                continue
+            client = Client()
+            for step in range(1, 13):
+                try:
+                    url = reverse(step_url_name, kwargs={'step': step})
+                except NoReverseMatch:
+                    break
+                benchmarks[f'intake:{app.name}:step{step}'] = _get(client, url, self.host)
+
+        referral = self._busiest_referral()
+        if referral:
+            client = Client()
+            client.force_login(referral.professional)
+            benchmarks['user-matters'] = _get(client, reverse('user-matters', kwargs={'id': referral.professional_id}), self.host)
+            benchmarks['referral-detail'] = _get(client, reverse('referral-detail', kwargs={'id': referral.id}), self.host)
+
+        superuser = User.objects.filter(is_superuser=True).first()
+        if superuser:
+            client = Client()
+            client.force_login(superuser)
+            for url_name in BENCHMARK_ADMIN_CHANGELISTS:
+                benchmarks[url_name] = _get(client, reverse(url_name), self.host)
+
+        benchmarks['task:send_scheduled_notification_emails'] = _rolled_back(tasks.send_scheduled_notification_emails)
+        benchmarks['task:send_scheduled_eta_emails'] = _rolled_back(tasks.send_scheduled_eta_emails)
+
+        benchmarks['storage:roundtrip'] = _storage_roundtrip()
+
+        return benchmarks
+
+
+def _measure(func):
+    recorder = QueryRecorder().start()
+    try:
+        func()
+    finally:
+        recorder.stop()
+    return recorder
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _data_volume():
+    from .models import User, Referral, ReferralNotifications, CeleryETATasks
+    from .pluggable_app import PluggableApp
+
+    volume = {
+        'users': User.objects.count(),
+        'referrals': Referral.objects.count(),
+        'notifications': ReferralNotifications.objects.count(),
+        'eta_tasks': CeleryETATasks.objects.filter(status='SCHEDULED').count(),
+    }
+    for app in PluggableApp.get_apps():
+        volume[f'{app.name}_workflows'] = app._models.ReferralWorkflowState.objects.count()
+    return volume
+
+
+def run_benchmarks(names=None, iterations=5, warmup=1, host='localhost', stdout=None):
+    """
+        Runs the benchmarks whose name contains any of `names` (all by default) and returns the JSON-serializable results:
+        run metadata plus, per benchmark, wall time statistics in milliseconds and the query count.
+    """
+
+    benchmarks = BenchmarkSuite(host=host).get_benchmarks()
+    if names:
+        benchmarks = {name: func for name, func in benchmarks.items() if any(pattern in name for pattern in names)}
+
+    results = {}
+    for name, func in benchmarks.items():
+        try:
+            for _ in range(warmup):
+                func()
+            runs = [_measure(func) for _ in range(iterations)]
+        except Exception as e:
+            results[name] = {'error': str(e)}
+        else:
+            times = [run.total_time * 1000 for run in runs]
+            results[name] = {
+                'iterations': iterations,
+                'median_ms': round(statistics.median(times), 3),
+                'mean_ms': round(statistics.mean(times), 3),
+                'min_ms': round(min(times), 3),
+                'max_ms': round(max(times), 3),
+                'p95_ms': round(_percentile(times, 95), 3),
+                'db_ms': round(statistics.median(run.db_time * 1000 for run in runs), 3),
+                'queries': max(run.queries for run in runs),
+                'duplicate_queries': max(run.duplicates for run in runs),
+            }
+        if stdout:
+            stdout.write(f'{name}: {results[name]}')
+
+    return {
+        'commit': _git_commit(),
+        'timestamp': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'data': _data_volume(),
+        'benchmarks': results,
+    }
+
+
+def compare_results(base, head, threshold=0.1):
+    """
+        Compares two `run_benchmarks` results, returns rows of
+        (name, base median ms, head median ms, relative change, base queries, head queries, regressed)
+        where `regressed` flags a median slower by more than `threshold` or any added query.
+    """
+
+    rows = []
+    for name in sorted(set(base['benchmarks']) | set(head['benchmarks'])):
+        before, after = base['benchmarks'].get(name, {}), head['benchmarks'].get(name, {})
+        if 'median_ms' not in before or 'median_ms' not in after:
+            rows.append((name, before.get('median_ms'), after.get('median_ms'), None, before.get('queries'), after.get('queries'), False))
+            continue
+
+        change = (after['median_ms'] - before['median_ms']) / before['median_ms'] if before['median_ms'] else 0
+        regressed = change > threshold or after['queries'] > before['queries']
+        rows.append((name, before['median_ms'], after['median_ms'], round(change, 3), before['queries'], after['queries'], regressed))
+    return rows
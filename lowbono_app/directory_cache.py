@@ -0,0 +1,205 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.template.loader import render_to_string
+from django.utils import timezone, translation
+from django.utils.safestring import mark_safe
+
+
+DIRECTORY_VERSION_CACHE_KEY = 'lowbono:directory:version'
+DIRECTORY_CACHE_TIMEOUT = getattr(settings, 'DIRECTORY_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def get_directory_version():
+    """
+        Current version of the public professional directory.
+        The version is a nanosecond timestamp of the last change, so it doubles as the
+        Last-Modified value and survives cache eviction without reusing an old key.
+    """
+    version = cache.get(DIRECTORY_VERSION_CACHE_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(DIRECTORY_VERSION_CACHE_KEY, version, None)
+        version = cache.get(DIRECTORY_VERSION_CACHE_KEY, version)
+    return version
+
+
+def bump_directory_version(*args, **kwargs):
+    """
+        Invalidates every cached directory fragment.
+        Has a signal receiver signature so it can be connected directly.
+    """
+    cache.set(DIRECTORY_VERSION_CACHE_KEY, time.time_ns(), None)
+
+
+def _bump_directory_version_for_user(sender, instance, update_fields=None, **kwargs):
+    # logins only touch `last_login`, which is not rendered in the directory
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_directory_version()
+
+
+def get_directory_last_modified():
+    return datetime.datetime.fromtimestamp(get_directory_version() / 1e9, tz=datetime.timezone.utc)
+
+
+def get_practice_area_ids():
+    """ ids of every practice area, cached with the directory version """
+    from . import models
+
+    key = 'lowbono:directory:practiceareas:{}'.format(get_directory_version())
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(models.PracticeArea.objects.values_list('pk', flat=True))
+        cache.set(key, ids, DIRECTORY_CACHE_TIMEOUT)
+    return ids
+
+
+def clean_practicearea_id(practicearea_id):
+    """
+        The practice area filter of a request as a known practice area id, None (no filter) otherwise,
+        so arbitrary query values never reach the queries or the fragment cache keys.
+    """
+    try:
+        practicearea_id = int(practicearea_id)
+    except (TypeError, ValueError):
+        return None
+    return practicearea_id if practicearea_id in get_practice_area_ids() else None
+
+
+def _fragment_cache_key(kind, app_name, practicearea_id):
+    return 'lowbono:directory:{}:{}:{}:{}:{}'.format(
+        kind, app_name, practicearea_id or 'all', translation.get_language(), get_directory_version())
+
+
+def get_directory_professionals(app, practicearea_id=None):
+    professionals = (app._models.Professional.objects
+                     .filter(is_enabled=True)
+                     .select_related('user')
+                     .prefetch_related('user__bar_admissions', 'user__languages')
+                     .order_by('-id'))
+
+    if practicearea_id:
+        professionals = professionals.filter(practice_areas=practicearea_id)
+
+    return professionals
+
+
+def render_professionals_fragment(app, practicearea_id=None, query=None):
+    """
+        Rendered `professional_detail.html` for one app and practice area filter.
+        Free text searches are ranked by the search index and not cached.
+    """
+    from . import search
+
+    practicearea_id = clean_practicearea_id(practicearea_id)
+    if query:
+        professionals = search.filter_by_search(get_directory_professionals(app, practicearea_id), 'user', query, pk_field='user_id')
+        if professionals is not None:
+            return render_to_string('lowbono_app/professional_detail.html', {
+                'professionals': professionals,
+                'professional_type': app.name.split("_")[1].capitalize(),
+            })
+
+    key = _fragment_cache_key('professionals', app.name, practicearea_id)
+    html = cache.get(key)
+
+    if html is None:
+        html = render_to_string('lowbono_app/professional_detail.html', {
+            'professionals': get_directory_professionals(app, practicearea_id),
+            'professional_type': app.name.split("_")[1].capitalize(),
+        })
+        cache.set(key, html, DIRECTORY_CACHE_TIMEOUT)
+
+    return mark_safe(html)
+
+
+def render_directory_pane_fragment(app, practicearea_id=None):
+    """
+        Rendered practice area filter and professional list of one directory tab.
+    """
+    from . import models
+    from django.contrib.contenttypes.models import ContentType
+
+    practicearea_id = clean_practicearea_id(practicearea_id)
+    key = _fragment_cache_key('pane', app.name, practicearea_id)
+    html = cache.get(key)
+
+    if html is None:
+        practiceareas = (models.PracticeAreaCategory.objects
+                         .filter(practicearea_category_type=ContentType.objects.get_for_model(app._models.Professional))
+                         .prefetch_related('children'))
+        html = render_to_string('lowbono_app/professional_list_pane.html', {
+            'app_name': app.name,
+            'professional_type': app.name.split("_")[1].capitalize(),
+            'practiceareas': practiceareas,
+            'selected_pa': str(practicearea_id) if practicearea_id else None,
+            'professionals_html': render_professionals_fragment(app, practicearea_id),
+        })
+        cache.set(key, html, DIRECTORY_CACHE_TIMEOUT)
+
+    return mark_safe(html)
+
+
+def directory_etag(request, *args, **kwargs):
+    """
+        ETag for directory responses.
+        Pages embed the navbar, so the requesting user and the current day (vacation
+        status) are part of the tag. Pending flash messages disable revalidation.
+    """
+    from django.contrib import messages
+
+    if len(messages.get_messages(request)):
+        return None
+
+    return '{}-{}-{}-{}-{}'.format(
+        get_directory_version(),
+        translation.get_language(),
+        request.user.pk or 0,
+        timezone.localdate().isoformat(),
+        request.GET.urlencode(),
+    )
+
+
+def directory_last_modified(request, *args, **kwargs):
+    from django.contrib import messages
+
+    if len(messages.get_messages(request)):
+        return None
+
+    candidates = [
+        get_directory_last_modified(),
+        timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time.min)),
+    ]
+    if getattr(request.user, 'last_login', None):
+        candidates.append(request.user.last_login)
+
+    return max(candidates)
+
+
+def connect_directory_signals():
+    """
+        Bumps the directory version whenever data rendered in the directory changes.
+    """
+    from . import models
+    from .pluggable_app import PluggableApp
+
+    post_save.connect(_bump_directory_version_for_user, sender=models.User, dispatch_uid='directory_cache_user_save')
+    post_delete.connect(bump_directory_version, sender=models.User, dispatch_uid='directory_cache_user_delete')
+
+    senders = [models.Vacation, models.BarAdmission, models.Language,
+               models.PracticeArea, models.PracticeAreaCategory, models.ImageRendition]
+
+    for app in PluggableApp.get_apps():
+        professional_model = app._models.Professional
+        senders.extend([professional_model, professional_model.practice_areas.through])
+        m2m_changed.connect(bump_directory_version, sender=professional_model.practice_areas.through,
+                            dispatch_uid=f'directory_cache_m2m_{app.name}')
+
+    for sender in senders:
+        uid = f'directory_cache_{sender._meta.label_lower}'
+        post_save.connect(bump_directory_version, sender=sender, dispatch_uid=f'{uid}_save')
+        post_delete.connect(bump_directory_version, sender=sender, dispatch_uid=f'{uid}_delete')
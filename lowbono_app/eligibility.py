@@ -0,0 +1,129 @@
+"""
+    Daily snapshots of the professionals' matching eligibility.
+
+    A professional is matched for a practice area by `get_<type>_matches` when their user is
+    active, their profile is enabled and complete, they are not on vacation and their practice
+    area is approved. `take_snapshot` evaluates these checks for every professional and practice
+    area in one pass (two queries per professional type) and stores an EligibilitySnapshot row
+    per pair, with the checks that failed, so "why did this lawyer stop getting referrals" is a
+    lookup instead of a replay of the querysets.
+
+    Each row is compared with the latest earlier snapshot: `change` marks the pairs that were
+    added, dropped out of matching or came back, and `previous_reasons` keeps what failed then.
+"""
+import datetime
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Max
+
+from .availability import unavailable_q
+
+
+REASON_INACTIVE = 'inactive'
+REASON_DISABLED = 'disabled'
+REASON_INCOMPLETE_PROFILE = 'incomplete_profile'
+REASON_INCOMPLETE_USER = 'incomplete_user'
+REASON_ON_VACATION = 'on_vacation'
+REASON_NOT_APPROVED = 'not_approved'
+REASON_NO_PRACTICE_AREA = 'no_practice_area'
+# an eligible pair of the previous snapshot whose practice area was removed since
+REASON_UNLINKED = 'unlinked'
+
+BULK_BATCH_SIZE = 1000
+
+
+def _professional_reasons(row):
+    reasons = []
+    if not row['user__is_active']:
+        reasons.append(REASON_INACTIVE)
+    if not row['is_enabled']:
+        reasons.append(REASON_DISABLED)
+    if not row['is_profile_complete']:
+        reasons.append(REASON_INCOMPLETE_PROFILE)
+    if not row['user__is_profile_complete']:
+        reasons.append(REASON_INCOMPLETE_USER)
+    if row['on_vacation']:
+        reasons.append(REASON_ON_VACATION)
+    return reasons
+
+
+def evaluate_eligibility(model, day):
+    """ yields (professional user id, practice area id or None, failed checks) of every `model` professional on `day` """
+
+    field = model._meta.get_field('practice_areas')
+    through = field.remote_field.through
+    professional_field, practice_area_field = field.m2m_field_name(), field.m2m_reverse_field_name()
+
+    professionals = (model.objects.annotate(on_vacation=unavailable_q(day))
+                                  .values('pk', 'user_id', 'is_enabled', 'is_profile_complete', 'user__is_active', 'user__is_profile_complete', 'on_vacation'))
+    links = {}
+    for professional_id, practice_area_id, approved in through.objects.values_list(f'{professional_field}_id', f'{practice_area_field}_id', 'approved'):
+        links.setdefault(professional_id, []).append((practice_area_id, approved))
+
+    for row in professionals.iterator():
+        reasons = _professional_reasons(row)
+        practice_areas = links.get(row['pk'])
+        if not practice_areas:
+            yield row['user_id'], None, reasons + [REASON_NO_PRACTICE_AREA]
+            continue
+        for practice_area_id, approved in practice_areas:
+            yield row['user_id'], practice_area_id, reasons if approved else reasons + [REASON_NOT_APPROVED]
+
+
+def _change(previous, is_eligible):
+    from .models import EligibilitySnapshot
+
+    if previous is None:
+        return EligibilitySnapshot.CHANGE_NEW
+    if previous[0] and not is_eligible:
+        return EligibilitySnapshot.CHANGE_DROPPED
+    if not previous[0] and is_eligible:
+        return EligibilitySnapshot.CHANGE_RESTORED
+    return ''
+
+
+def take_snapshot(day=None):
+    """
+        Stores the eligibility of every professional and practice area on `day` (today by default),
+        replacing an earlier snapshot of that day; returns {change: number of rows}
+    """
+    from .models import EligibilitySnapshot
+    from .pluggable_app import PluggableApp
+
+    day = day or datetime.date.today()
+    previous_day = EligibilitySnapshot.objects.filter(date__lt=day).aggregate(date=Max('date'))['date']
+    previous = {}
+    if previous_day:
+        rows = EligibilitySnapshot.objects.filter(date=previous_day).values_list('professional_type_id', 'professional_id', 'practice_area_id', 'is_eligible', 'reasons')
+        previous = {(type_id, professional_id, practice_area_id): (is_eligible, reasons) for type_id, professional_id, practice_area_id, is_eligible, reasons in rows.iterator()}
+
+    models = [app._models.Professional for app in PluggableApp.get_apps()]
+    content_types = ContentType.objects.get_for_models(*models)
+    snapshots = []
+    for model in models:
+        type_id = content_types[model].pk
+        for professional_id, practice_area_id, reasons in evaluate_eligibility(model, day):
+            key = (type_id, professional_id, practice_area_id)
+            before = previous.pop(key, None)
+            is_eligible = not reasons
+            snapshots.append(EligibilitySnapshot(date=day, professional_type_id=type_id, professional_id=professional_id, practice_area_id=practice_area_id,
+                                                 is_eligible=is_eligible, reasons=','.join(reasons),
+                                                 previous_reasons=before[1] if before else '',
+                                                 change=_change(before, is_eligible) if previous_day else ''))
+
+    # pairs gone since the previous snapshot only matter when they were matched then
+    for (type_id, professional_id, practice_area_id), (was_eligible, reasons) in previous.items():
+        if was_eligible:
+            snapshots.append(EligibilitySnapshot(date=day, professional_type_id=type_id, professional_id=professional_id, practice_area_id=practice_area_id,
+                                                 is_eligible=False, reasons=REASON_UNLINKED, previous_reasons=reasons,
+                                                 change=EligibilitySnapshot.CHANGE_DROPPED))
+
+    with transaction.atomic():
+        EligibilitySnapshot.objects.filter(date=day).delete()
+        EligibilitySnapshot.objects.bulk_create(snapshots, batch_size=BULK_BATCH_SIZE)
+
+    counts = {}
+    for snapshot in snapshots:
+        counts[snapshot.change] = counts.get(snapshot.change, 0) + 1
+    return counts
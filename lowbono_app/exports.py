@@ -0,0 +1,212 @@
+"""
+    Streaming exports of referrals, engagement reports and notifications.
+
+    Rows are read in keyset pages (`pk > last_pk`, ordered by pk) with server-side
+    iteration, and written as CSV or JSON lines, so memory stays constant regardless
+    of how much history is exported. Workflow history moved to the archive
+    (lowbono_app.archive) is exported along with the hot rows.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Value, Count, Sum, Subquery, OuterRef, Case, When, CharField, IntegerField, BooleanField, DecimalField
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+
+class Echo:
+    """ pseudo-buffer handing each csv line back to the caller instead of storing it """
+
+    def write(self, value):
+        return value
+
+
+def iter_keyset(queryset, chunk_size=EXPORT_CHUNK_SIZE, key='pk'):
+    """
+        Iterates `queryset` (values() or model rows) in keyset pages ordered by `key`.
+        Each page is a short query streamed with `.iterator()`, so no long-lived cursor is held.
+    """
+
+    last_key = None
+    while True:
+        page = queryset.order_by(key)
+        if last_key is not None:
+            page = page.filter(**{f'{key}__gt': last_key})
+
+        rows = 0
+        for row in page[:chunk_size].iterator(chunk_size=chunk_size):
+            rows += 1
+            last_key = row[key] if isinstance(row, dict) else getattr(row, key)
+            yield row
+
+        if rows < chunk_size:
+            return
+
+
+def _workflow_apps():
+    from .pluggable_app import PluggableApp
+
+    for app in PluggableApp.get_apps():
+        workflow_model = app._models.ReferralWorkflowState
+        accessor = workflow_model._meta.get_field('referral').remote_field.get_accessor_name()
+        yield app, workflow_model, accessor
+
+
+REFERRAL_FIELDS = (
+    'id', 'created_at', 'professional_id', 'professional_email', 'first_name', 'last_name', 'email',
+    'practice_area', 'income_status', 'monthly_income', 'household_size', 'language',
+    'workflow_type', 'workflow_state', 'is_overdue', 'is_income_eligible', 'hours_worked_total', 'notifications_sent',
+)
+
+
+def referral_rows(queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """ referrals joined with their workflow state, cumulative hours (archived ones included) and notification count """
+    from . import archive, models
+
+    queryset = models.Referral.objects.all() if queryset is None else queryset
+
+    notifications_sent = models.ReferralNotifications.objects.filter(referral=OuterRef('pk')).order_by() \
+                                                             .values('referral').annotate(total=Count('pk')).values('total')
+    archived_hours = models.ArchivedRecord.objects.filter(kind=archive.KIND_WORKFLOW_HISTORY, referral_id=OuterRef('pk')).order_by() \
+                                                  .values('referral_id').annotate(total=Sum('hours_worked')).values('total')
+    hours_field = DecimalField(max_digits=10, decimal_places=2)
+
+    workflow_type, workflow_state, is_overdue, is_income_eligible, hours = [], [], [], [], []
+    for app, workflow_model, accessor in _workflow_apps():
+        history_hours = workflow_model.history.field.model.objects.filter(id=OuterRef(f'{accessor}__pk')).order_by() \
+                                                                  .values('id').annotate(total=Sum('hours_worked')).values('total')
+        workflow_type.append(When(**{f'{accessor}__isnull': False}, then=Value(app.name.split('_')[1])))
+        workflow_state.append(F(f'{accessor}__current_task__name'))
+        is_overdue.append(F(f'{accessor}__is_overdue'))
+        is_income_eligible.append(F(f'{accessor}__is_income_eligible'))
+        hours.append(Subquery(history_hours))
+
+    rows = queryset.values('id').annotate(
+        export_created_at=F('created_at'),
+        professional_email=F('professional__email'),
+        export_practice_area=F('practice_area__title'),
+        workflow_type=Case(*workflow_type, default=Value(''), output_field=CharField()),
+        workflow_state=Coalesce(*workflow_state, Value(''), output_field=CharField()),
+        export_is_overdue=Coalesce(*is_overdue, Value(None), output_field=BooleanField()),
+        export_is_income_eligible=Coalesce(*is_income_eligible, Value(None), output_field=BooleanField()),
+        hours_worked_total=Coalesce(*hours, Value(0), output_field=hours_field)
+                           + Coalesce(Subquery(archived_hours), Value(0), output_field=hours_field),
+        notifications_sent=Coalesce(Subquery(notifications_sent), Value(0), output_field=IntegerField()),
+    ).values(
+        'id', 'export_created_at', 'professional_id', 'professional_email', 'first_name', 'last_name', 'email',
+        'export_practice_area', 'income_status', 'monthly_income', 'household_size', 'language',
+        'workflow_type', 'workflow_state', 'export_is_overdue', 'export_is_income_eligible', 'hours_worked_total', 'notifications_sent',
+    )
+
+    renamed = {'export_created_at': 'created_at', 'export_practice_area': 'practice_area',
+               'export_is_overdue': 'is_overdue', 'export_is_income_eligible': 'is_income_eligible'}
+    for row in iter_keyset(rows, chunk_size, key='id'):
+        yield {renamed.get(key, key): value for key, value in row.items()}
+
+
+ENGAGEMENT_REPORT_FIELDS = (
+    'workflow_type', 'history_id', 'workflow_id', 'referral_id', 'state', 'hours_worked', 'notes',
+    'is_income_eligible', 'ineligible_reason', 'updated_at', 'reported_by',
+)
+
+
+def archived_engagement_report_rows(app, workflow_model, referrals=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """ human status reports of `app` moved to the archive, unpacked a chunk at a time """
+    from . import archive, models
+
+    records = models.ArchivedRecord.objects.filter(kind=archive.KIND_WORKFLOW_HISTORY,
+                                                   workflow_type=ContentType.objects.get_for_model(workflow_model))
+    if referrals is not None:
+        records = records.filter(referral_id__in=referrals.values('pk'))
+
+    history_model = workflow_model.history.field.model
+    records = iter_keyset(records.values('pk', 'payload'), chunk_size, key='pk')
+    while batch := list(islice(records, chunk_size)):
+        reports = [archive.restore(history_model, archive.unpack(record['payload'])) for record in batch]
+        reports = [report for report in reports if report.is_human_activity]
+        emails = dict(models.User.objects.filter(pk__in={report.history_user_id for report in reports}).values_list('pk', 'email'))
+        for report in reports:
+            yield {
+                'workflow_type': app.name.split('_')[1], 'history_id': report.history_id, 'workflow_id': report.id,
+                'referral_id': report.referral_id, 'state': getattr(report, 'archive_task_name', None), 'hours_worked': report.hours_worked,
+                'notes': report.notes, 'is_income_eligible': report.is_income_eligible, 'ineligible_reason': report.ineligible_reason,
+                'updated_at': report.updated_at, 'reported_by': emails.get(report.history_user_id),
+            }
+
+
+def engagement_report_rows(referrals=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """ human status reports from every app's workflow history, app by app, hot rows then archived ones """
+
+    for app, workflow_model, accessor in _workflow_apps():
+        reports = workflow_model.history.field.model.objects.filter(is_human_activity=True)
+        if referrals is not None:
+            reports = reports.filter(referral__in=referrals.values('pk'))
+
+        reports = reports.values('history_id').annotate(
+            workflow_type=Value(app.name.split('_')[1], output_field=CharField()),
+            workflow_id=F('id'),
+            state=F('current_task__name'),
+            reported_by=F('history_user__email'),
+        ).values(*ENGAGEMENT_REPORT_FIELDS)
+
+        yield from iter_keyset(reports, chunk_size, key='history_id')
+        yield from archived_engagement_report_rows(app, workflow_model, referrals, chunk_size)
+
+
+NOTIFICATION_FIELDS = ('id', 'referral_id', 'template_description', 'recipient', 'subject', 'status', 'created_at')
+
+
+def notification_rows(referrals=None, chunk_size=EXPORT_CHUNK_SIZE):
+    from . import models
+
+    notifications = models.ReferralNotifications.objects.all()
+    if referrals is not None:
+        notifications = notifications.filter(referral__in=referrals.values('pk'))
+
+    notifications = notifications.values('id').annotate(
+        template_description=F('template__description'),
+        recipient=F('template__recipient'),
+    ).values(*NOTIFICATION_FIELDS)
+
+    yield from iter_keyset(notifications, chunk_size, key='id')
+
+
+EXPORT_DATASETS = {
+    'referrals': (REFERRAL_FIELDS, referral_rows),
+    'engagement_reports': (ENGAGEMENT_REPORT_FIELDS, engagement_report_rows),
+    'notifications': (NOTIFICATION_FIELDS, notification_rows),
+}
+
+
+def iter_csv(rows, fieldnames):
+    writer = csv.DictWriter(Echo(), fieldnames=fieldnames, extrasaction='ignore')
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def iter_export(dataset, export_format, referrals=None, chunk_size=EXPORT_CHUNK_SIZE):
+    fieldnames, row_generator = EXPORT_DATASETS[dataset]
+    rows = row_generator(referrals, chunk_size=chunk_size)
+    return iter_csv(rows, fieldnames) if export_format == 'csv' else iter_jsonl(rows)
+
+
+def streaming_export_response(dataset, export_format, referrals=None):
+    content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(iter_export(dataset, export_format, referrals), content_type=content_type)
+    filename = f'{dataset}-{timezone.now():%Y%m%d-%H%M}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
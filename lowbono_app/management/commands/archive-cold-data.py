@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from lowbono_app.archive import ARCHIVE_BATCH_SIZE, archive_cold_data
+
+
+class Command(BaseCommand):
+    help = 'Moves history and notifications of long-closed referrals, old email API logs and celery results to the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS, help='Archive rows closed/created more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        counts = archive_cold_data(days=options['days'], batch_size=options['batch_size'])
+        for kind, count in counts.items():
+            self.stdout.write(f'Archived {count} {kind} rows')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from lowbono_app.transitions import backfill_transitions
+
+
+class Command(BaseCommand):
+    help = 'Writes workflow transition log entries for joeflow tasks started before the log existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = backfill_transitions(batch_size=options['batch_size'])
+        self.stdout.write(f'Wrote {count} workflow transitions')
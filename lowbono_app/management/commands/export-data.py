@@ -0,0 +1,24 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from lowbono_app.exports import EXPORT_DATASETS, EXPORT_FORMATS, EXPORT_CHUNK_SIZE, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Streams referrals, engagement reports or notifications as CSV or JSON lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=EXPORT_DATASETS.keys())
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', help='File to write to, defaults to stdout')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        output = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for chunk in iter_export(options['dataset'], options['format'], chunk_size=options['chunk_size']):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
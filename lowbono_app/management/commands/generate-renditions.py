@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from lowbono_app.renditions import backfill
+
+
+class Command(BaseCommand):
+    help = 'Generates responsive WebP/JPEG renditions of uploaded headshots, news photos and CMS card images missing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate renditions that already exist')
+        parser.add_argument('--queue', action='store_true', help='Queue a celery task per image instead of generating them here')
+
+    def handle(self, *args, **options):
+        counts = backfill(force=options['force'], queue=options['queue'])
+        for kind, count in counts.items():
+            self.stdout.write(f'{count} images {kind}')
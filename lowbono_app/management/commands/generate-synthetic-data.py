@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from lowbono_app.synthetic import SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = 'Fills the database with synthetic professionals, referrals, workflow histories and notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--professionals', type=int, default=10, help='Professionals to create per professional app')
+        parser.add_argument('--referrals', type=int, default=20, help='Average referrals per professional')
+        parser.add_argument('--days', type=int, default=365, help='Spread referrals and their histories over this many past days')
+        parser.add_argument('--seed', type=int, default=None, help='Seed for a reproducible data set')
+
+    def handle(self, *args, **options):
+        generator = SyntheticDataGenerator(seed=options['seed'], days=options['days'])
+
+        # workflows send their enter-state emails while being created, keep those in memory
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            counts = generator.generate(professionals=options['professionals'], referrals=options['referrals'], stdout=self.stdout)
+
+        self.stdout.write(', '.join(f'{count} {kind}' for kind, count in counts.items()))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from lowbono_app.availability import get_window, rebuild_availability
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the professionals availability calendar from their vacations, e.g. after the nightly rollover missed several days'
+
+    def handle(self, *args, **options):
+        first, last = get_window()
+        count = rebuild_availability()
+        self.stdout.write(f'Materialized {count} unavailable days from {first} to {last}')
@@ -0,0 +1,16 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from lowbono_app.reporting import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recomputes referral funnel and engagement hours rollups from workflow tasks and history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=datetime.date.fromisoformat, help='Only rebuild rollups from this date (YYYY-MM-DD) onwards')
+
+    def handle(self, *args, **options):
+        count = rebuild_rollups(since=options['since'])
+        self.stdout.write(f'Wrote {count} rollup rows')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from lowbono_app.profile_completeness import refresh_profile_completeness
+
+
+class Command(BaseCommand):
+    help = 'Recomputes is_profile_complete of every user and professional profile, e.g. after an import'
+
+    def handle(self, *args, **options):
+        changed = refresh_profile_completeness()
+        for model, rows in changed.items():
+            self.stdout.write(f'Updated {len(rows)} {model._meta.verbose_name_plural}')
+        self.stdout.write(f'Done! {sum(len(rows) for rows in changed.values())} profile flags changed')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from lowbono_app.search import SEARCH_KINDS, reindex
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for professionals and referrals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=SEARCH_KINDS, action='append', help='Only rebuild the given kind (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        counts = reindex(kinds=options['kind'] or SEARCH_KINDS, batch_size=options['batch_size'])
+        for kind, count in counts.items():
+            self.stdout.write(f'Indexed {count} {kind} documents')
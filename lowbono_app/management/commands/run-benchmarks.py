@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from lowbono_app.benchmarks import run_benchmarks, compare_results
+
+
+class Command(BaseCommand):
+    help = 'Times intake steps, matter/referral pages, admin changelists and scheduled email tasks, writes JSON results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Only run benchmarks whose name contains one of these')
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--warmup', type=int, default=1)
+        parser.add_argument('--host', default='localhost', help='Host header sent with page requests, must be in ALLOWED_HOSTS')
+        parser.add_argument('--output', help='File to write the JSON results to, defaults to stdout')
+        parser.add_argument('--compare', help='JSON results of an earlier run (e.g. another commit) to compare against')
+        parser.add_argument('--threshold', type=float, default=0.1, help='Relative slowdown reported as a regression')
+
+    def handle(self, *args, **options):
+        results = run_benchmarks(names=options['names'], iterations=options['iterations'], warmup=options['warmup'],
+                                 host=options['host'], stdout=self.stderr)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+        else:
+            self.stdout.write(json.dumps(results, indent=2))
+
+        if options['compare']:
+            with open(options['compare']) as base:
+                rows = compare_results(json.load(base), results, threshold=options['threshold'])
+            for name, before, after, change, queries_before, queries_after, regressed in rows:
+                change = f'{change:+.1%}' if change is not None else 'n/a'
+                self.stderr.write(f'{"REGRESSED " if regressed else ""}{name}: {before} -> {after} ms ({change}), queries {queries_before} -> {queries_after}')
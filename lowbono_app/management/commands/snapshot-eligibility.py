@@ -0,0 +1,17 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from lowbono_app.eligibility import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Stores the matching eligibility of every professional and practice area, e.g. to audit a day the nightly snapshot missed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=datetime.date.fromisoformat, default=None, help='day to evaluate, YYYY-MM-DD (default: today)')
+
+    def handle(self, *args, **options):
+        counts = take_snapshot(options['date'])
+        self.stdout.write(f'Stored {sum(counts.values())} eligibility rows: '
+                          f'{counts.get("dropped", 0)} dropped out, {counts.get("restored", 0)} restored, {counts.get("new", 0)} new')
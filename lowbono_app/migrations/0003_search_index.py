@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+# the index tables as of this migration, kept here so later changes to lowbono_app.search
+# cannot break migrating from scratch
+SEARCH_TABLES = ('lowbono_search_user', 'lowbono_search_referral')
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in SEARCH_TABLES:
+        if vendor == 'sqlite':
+            schema_editor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} "
+                                  f"USING fts5(title, body, tokenize = 'porter unicode61 remove_diacritics 2')")
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'CREATE TABLE IF NOT EXISTS {table} (object_id bigint PRIMARY KEY, document tsvector NOT NULL)')
+            schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {table}_document_idx ON {table} USING GIN (document)')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        for table in SEARCH_TABLES:
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lowbono_app', '0002_auto_20260214_0543'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.7 on 2026-10-19 12:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('lowbono_app', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferralDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('state', models.CharField(max_length=255)),
+                ('income_status', models.CharField(blank=True, default='', max_length=16)),
+                ('referrals_entered', models.PositiveIntegerField(default=0)),
+                ('hours_reported', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('practice_area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='lowbono_app.practicearea')),
+                ('professional', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('workflow_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Referral Daily Rollup',
+                'verbose_name_plural': 'Referral Daily Rollups',
+                'indexes': [models.Index(fields=['date', 'workflow_type', 'state'], name='lowbono_app_date_070b87_idx')],
+            },
+        ),
+    ]
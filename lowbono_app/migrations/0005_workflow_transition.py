@@ -0,0 +1,36 @@
+# Generated by Django 5.0.7 on 2026-10-19 12:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('joeflow', '0001_initial'),
+        ('lowbono_app', '0004_referral_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkflowTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('workflow_id', models.PositiveIntegerField()),
+                ('from_state', models.CharField(blank=True, default='', max_length=255)),
+                ('to_state', models.CharField(max_length=255)),
+                ('is_human', models.BooleanField(default=False)),
+                ('timestamp', models.DateTimeField()),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('task', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='joeflow.task')),
+                ('workflow_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Workflow Transition',
+                'verbose_name_plural': 'Workflow Transitions',
+                'indexes': [models.Index(fields=['workflow_type', 'workflow_id', 'timestamp'], name='lowbono_app_workflo_72f899_idx'), models.Index(fields=['workflow_type', 'to_state', 'timestamp'], name='lowbono_app_workflo_a39258_idx')],
+            },
+        ),
+    ]
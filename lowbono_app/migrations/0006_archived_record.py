@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-19 12:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('lowbono_app', '0005_workflow_transition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('workflow_history', 'Workflow History'), ('notification', 'Referral Notification'), ('email_api_log', 'Email API Log'), ('celery_result', 'Celery Task Result')], max_length=32)),
+                ('referral_id', models.BigIntegerField(blank=True, null=True)),
+                ('source_id', models.BigIntegerField()),
+                ('timestamp', models.DateTimeField()),
+                ('payload', models.BinaryField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('workflow_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Archived Record',
+                'verbose_name_plural': 'Archived Records',
+                'indexes': [models.Index(fields=['kind', 'referral_id', 'timestamp'], name='lowbono_app_kind_784515_idx'), models.Index(fields=['kind', 'timestamp'], name='lowbono_app_kind_4b9e9a_idx')],
+            },
+        ),
+    ]
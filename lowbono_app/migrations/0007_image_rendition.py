@@ -0,0 +1,28 @@
+# Generated by Django 5.0.7 on 2026-10-19 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lowbono_app', '0006_archived_record'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=512, unique=True)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('renditions', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Image Rendition',
+                'verbose_name_plural': 'Image Renditions',
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.7 on 2026-10-19 13:28
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils.text import slugify
+
+
+def dedupe_slugs(apps, schema_editor):
+    """ gives every article a slug nobody else has before the unique index is added, the oldest article keeps a shared slug """
+    NewsArticles = apps.get_model('lowbono_app', 'NewsArticles')
+
+    NewsArticles.objects.update(updated_at=F('created_at'))
+
+    taken = set()
+    for article in NewsArticles.objects.order_by('created_at', 'id'):
+        base = article.slug or slugify(article.title)[:500] or 'news'
+        slug, counter = base, 1
+        while slug in taken:
+            slug = f'{base}-{counter}'
+            counter += 1
+        taken.add(slug)
+        if slug != article.slug:
+            NewsArticles.objects.filter(pk=article.pk).update(slug=slug)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lowbono_app', '0007_image_rendition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsarticles',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(dedupe_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='newsarticles',
+            name='slug',
+            field=models.CharField(blank=True, default='', max_length=512, null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='newsarticles',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='lowbono_app_status_0d163d_idx'),
+        ),
+    ]
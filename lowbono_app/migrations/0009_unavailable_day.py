@@ -0,0 +1,49 @@
+# Generated by Django 5.0.7 on 2026-10-19 13:45
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def materialize_vacations(apps, schema_editor):
+    """ the current vacations as unavailable days, like lowbono_app.availability.rebuild_availability """
+    Vacation = apps.get_model('lowbono_app', 'Vacation')
+    UnavailableDay = apps.get_model('lowbono_app', 'UnavailableDay')
+
+    today = datetime.date.today()
+    first = today - datetime.timedelta(days=settings.AVAILABILITY_RETENTION_DAYS)
+    last = today + datetime.timedelta(days=settings.AVAILABILITY_HORIZON_DAYS)
+
+    days = set()
+    for user_id, first_day, last_day in Vacation.objects.filter(first_day__lte=last).filter(Q(last_day=None) | Q(last_day__gte=first)).values_list('user_id', 'first_day', 'last_day'):
+        day, end = max(first_day, first), min(last_day or last, last)
+        while day <= end:
+            days.add((user_id, day))
+            day += datetime.timedelta(days=1)
+    UnavailableDay.objects.bulk_create([UnavailableDay(user_id=user_id, day=day) for user_id, day in days], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lowbono_app', '0008_news_unique_slug'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnavailableDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unavailable_days', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='unavailableday',
+            constraint=models.UniqueConstraint(fields=('day', 'user'), name='unique_unavailable_day'),
+        ),
+        migrations.RunPython(materialize_vacations, migrations.RunPython.noop),
+    ]
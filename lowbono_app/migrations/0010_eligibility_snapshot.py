@@ -0,0 +1,39 @@
+# Generated by Django 5.0.7 on 2026-10-19 13:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('lowbono_app', '0009_unavailable_day'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EligibilitySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('is_eligible', models.BooleanField()),
+                ('reasons', models.CharField(blank=True, default='', max_length=255)),
+                ('previous_reasons', models.CharField(blank=True, default='', max_length=255)),
+                ('change', models.CharField(blank=True, choices=[('', 'Unchanged'), ('new', 'New'), ('dropped', 'Dropped out'), ('restored', 'Restored')], default='', max_length=16)),
+                ('practice_area', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='lowbono_app.practicearea')),
+                ('professional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eligibility_snapshots', to=settings.AUTH_USER_MODEL)),
+                ('professional_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'Eligibility Snapshot',
+                'verbose_name_plural': 'Eligibility Snapshots',
+                'indexes': [models.Index(fields=['date', 'change'], name='lowbono_app_date_5f55cb_idx'), models.Index(fields=['date', 'practice_area', 'is_eligible'], name='lowbono_app_date_90eb22_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='eligibilitysnapshot',
+            constraint=models.UniqueConstraint(fields=('date', 'professional_type', 'professional', 'practice_area'), name='unique_eligibility_snapshot'),
+        ),
+    ]
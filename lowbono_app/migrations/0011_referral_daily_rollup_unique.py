@@ -0,0 +1,34 @@
+# Generated by Django 5.0.7 on 2026-10-19 14:16
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_rollups(apps, schema_editor):
+    """ folds rows created twice for one key by concurrent first writes into the oldest one """
+    ReferralDailyRollup = apps.get_model('lowbono_app', 'ReferralDailyRollup')
+
+    key = ('date', 'workflow_type_id', 'state', 'practice_area_id', 'professional_id', 'income_status')
+    duplicates = ReferralDailyRollup.objects.values(*key).order_by().annotate(
+        rows=Count('id'), keep=Min('id'), referrals=Sum('referrals_entered'), hours=Sum('hours_reported')).filter(rows__gt=1)
+    for duplicate in duplicates:
+        rows = ReferralDailyRollup.objects.filter(**{field: duplicate[field] for field in key})
+        rows.exclude(id=duplicate['keep']).delete()
+        rows.filter(id=duplicate['keep']).update(referrals_entered=duplicate['referrals'], hours_reported=duplicate['hours'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('lowbono_app', '0010_eligibility_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='referraldailyrollup',
+            constraint=models.UniqueConstraint(models.F('date'), models.F('workflow_type'), models.F('state'), django.db.models.functions.comparison.Coalesce(models.F('practice_area'), models.Value(0)), django.db.models.functions.comparison.Coalesce(models.F('professional'), models.Value(0)), models.F('income_status'), name='unique_referral_daily_rollup'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-19 14:20
+
+import json
+import zlib
+
+from django.db import migrations, models
+
+
+def backfill_hours_worked(apps, schema_editor):
+    """ copies the reported hours out of the archived workflow history payloads (zlib-compressed JSON) """
+    ArchivedRecord = apps.get_model('lowbono_app', 'ArchivedRecord')
+
+    records = ArchivedRecord.objects.filter(kind='workflow_history', hours_worked=None).only('id', 'payload')
+    for record in records.iterator(chunk_size=500):
+        hours_worked = json.loads(zlib.decompress(bytes(record.payload))).get('hours_worked')
+        if hours_worked is not None:
+            ArchivedRecord.objects.filter(id=record.id).update(hours_worked=hours_worked)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lowbono_app', '0011_referral_daily_rollup_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedrecord',
+            name='hours_worked',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.RunPython(backfill_hours_worked, migrations.RunPython.noop),
+    ]
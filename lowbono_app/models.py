@@ -4,7 +4,8 @@ import random
 import string
 from django.apps import apps
 from django.db import models
-from django.db.models import Q, Subquery
+from django.db.models import Q, F, Exists, Subquery, OuterRef, Window, Value
+from django.db.models.functions import Coalesce, Lead
 from django.db.models.signals import m2m_changed
 from django.contrib.contenttypes.models import ContentType
 from ckeditor.fields import RichTextField
@@ -26,8 +27,6 @@ from datetime import date
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from simple_history.models import HistoricalRecords
 from html_sanitizer.django import get_sanitizer
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 
 from django.template import Context, Template
 from bs4 import BeautifulSoup
@@ -135,10 +134,10 @@ class User(AbstractUser):
         return languages
 
     def is_on_vacation(self):
-        _date = date.today()
-        if self.vacations.filter(first_day__lte=_date).filter(Q(last_day=None) | Q(last_day__gte=_date)):
-            return True
-        return False
+        # annotated on admin changelist rows by UserAdmin.get_queryset
+        if hasattr(self, 'on_vacation'):
+            return self.on_vacation
+        return self.unavailable_days.filter(day=date.today()).exists()
 
     def invite(self, profile_type):
 
@@ -165,16 +164,6 @@ class User(AbstractUser):
         self.bio = sanitizer.sanitize(self.bio)
 
 
-@receiver(post_save, sender=User)
-def post_save_user(sender, instance, created, **kwargs):
-    if hasattr(instance, 'lawyer_user') and instance.lawyer_user.id:
-        instance.lawyer_user.is_profile_complete = instance.lawyer_user._is_profile_complete()
-        instance.lawyer_user.save()
-    if hasattr(instance, 'mediator_user') and instance.mediator_user.id:
-        instance.mediator_user.is_profile_complete = instance.mediator_user._is_profile_complete()
-        instance.mediator_user.save()
-
-
 class ReferralSource(models.Model):
     source = models.CharField(max_length=128)
 
@@ -294,9 +283,9 @@ class ProfessionalQuerySet(models.QuerySet):
         that practice area or in the immediate parent practice area.
         """
         if profile_type == 'lawyer':
-            return self.filter(lawyerpracticeareas__approved=True).filter(lawyerpracticeareas__practicearea=practice_area).distinct()
+            return self.filter(lawyerpracticeareas__approved=True, lawyerpracticeareas__practicearea=practice_area).distinct()
         if profile_type == 'mediator':
-            return self.filter(mediatorpracticeareas__approved=True).filter(mediatorpracticeareas__practicearea=practice_area).distinct()
+            return self.filter(mediatorpracticeareas__approved=True, mediatorpracticeareas__practicearea=practice_area).distinct()
         return self
 
     def is_on_vacation(self, _date=None):
@@ -305,10 +294,12 @@ class ProfessionalQuerySet(models.QuerySet):
 
         pass in a date for testing purposes
         """
+        from .availability import unavailable_q
+
         if _date is None:
             _date = date.today()
 
-        return self.filter(user__vacations__first_day__lte=_date).filter(Q(user__vacations__last_day=None) | Q(user__vacations__last_day__gte=_date))
+        return self.filter(unavailable_q(_date))
 
     def is_ready_for_referrals(self):
         """
@@ -322,10 +313,21 @@ class ProfessionalQuerySet(models.QuerySet):
 
         pass in a date for testing purposes
         """
+        from .availability import unavailable_q
+
         if _date is None:
             _date = date.today()
 
-        return self.filter(Q(user__vacations=None) | Q(user__vacations__first_day__gt=_date) | Q(user__vacations__last_day__lt=_date))
+        return self.exclude(unavailable_q(_date))
+
+    def is_working_between(self, first_day, last_day):
+        """
+        Return all professionals with no vacation day from first_day to last_day,
+        e.g. to match a referral against next month's schedule
+        """
+        from .availability import unavailable_between_q
+
+        return self.exclude(unavailable_between_q(first_day, last_day))
 
     def is_user_profile_active(self):
         """
@@ -333,17 +335,17 @@ class ProfessionalQuerySet(models.QuerySet):
         """
         return self.filter(user__is_active=True)
 
-    def get_lawyer_matches(self, practice_area):
+    def get_lawyer_matches(self, practice_area, _date=None):
         """
-        Return all available matching lawyer professionals
+        Return all available matching lawyer professionals (on _date, today by default)
         """
-        return self.is_user_profile_active().is_ready_for_referrals().is_working().practices_in(practice_area, 'lawyer')
+        return self.is_user_profile_active().is_ready_for_referrals().is_working(_date).practices_in(practice_area, 'lawyer')
 
-    def get_mediator_matches(self, practice_area):
+    def get_mediator_matches(self, practice_area, _date=None):
         """
-        Return all available matching mediator professionals
+        Return all available matching mediator professionals (on _date, today by default)
         """
-        return self.is_user_profile_active().is_ready_for_referrals().is_working().practices_in(practice_area, 'mediator')
+        return self.is_user_profile_active().is_ready_for_referrals().is_working(_date).practices_in(practice_area, 'mediator')
 
     def save(self, *args, **kwargs):
         self.is_profile_complete = self._is_profile_complete()
@@ -369,18 +371,13 @@ class Professional(models.Model):
     def _is_profile_complete(self):
         return bool(self.practice_areas.count())
 
-
-def _update_is_profile_complete(instance, action, reverse, **kwargs):
-    """
-    Handler for practice_areas m2m signal handler.
-    Updates is_profile_complete whenever the m2m changes.
-    """
-    if reverse:
-        raise NotImplementedError(f'reverse m2m changes for Professionals not supported ({instance}, {action}, {reverse})')
-    if action.startswith('pre_'):
-        return
-    instance.is_profile_complete = instance._is_profile_complete()
-    instance.save()
+    @classmethod
+    def profile_complete_expression(cls):
+        """
+        The SQL counterpart of _is_profile_complete(), see lowbono_app.profile_completeness.
+        """
+        practice_areas = cls._meta.get_field('practice_areas')
+        return Exists(practice_areas.remote_field.through.objects.filter(**{practice_areas.m2m_field_name(): OuterRef('pk')}))
 
 
 class Token(models.Model):
@@ -462,16 +459,6 @@ class BarAdmission(models.Model):
         # TODO: return full name of state shortcode
         return (self.state, self.admission_date)
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.user.is_profile_complete = self.user._is_profile_complete()
-        self.user.save()
-
-    def delete(self, *args, **kwargs):
-        super().delete(*args, **kwargs)
-        self.user.is_profile_complete = self.user._is_profile_complete()
-        self.user.save()
-
 
 class Vacation(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='vacations')
@@ -479,6 +466,22 @@ class Vacation(models.Model):
     last_day = models.DateField(null=True, blank=True)
 
 
+class UnavailableDay(models.Model):
+    """
+        one row per professional and day on vacation, inside the window kept by lowbono_app.availability
+        rebuilt per user when their vacations change and rolled over nightly
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='unavailable_days')
+    day = models.DateField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['day', 'user'], name='unique_unavailable_day')]
+
+    def __str__(self):
+        return f'{self.user_id} unavailable on {self.day}'
+
+
 class SystemEmailEvents(models.Model):
     template = models.OneToOneField("SystemEmailTemplates", on_delete=models.CASCADE, blank=True, null=True)
     event_name = models.CharField(max_length=128, default='')
@@ -613,11 +616,12 @@ class EmailTemplates(models.Model):
 
         tasks.dispatch_email_via_api.delay(to_email=to_email, subject=subject, text_content=text_content, html_content=html_content)
 
-        for workflow in overdue_workflows:
-            notification = ReferralNotifications.objects.create(referral_id=workflow.referral.id, template=self, subject=subject, message=text_content)
-            workflow.notification = notification
-            workflow.is_human_activity = False
-            workflow.save()
+        overdue_workflows = list(overdue_workflows)
+        notifications = ReferralNotifications.objects.bulk_create([
+            ReferralNotifications(referral_id=workflow.referral_id, template=self, subject=subject, message=text_content)
+            for workflow in overdue_workflows
+        ])
+        self.workflow_type.model_class().objects.mark_notified(list(zip(overdue_workflows, notifications)))
 
     def send_email(self, referral, workflow=None, task_id=None):
         """
@@ -649,9 +653,7 @@ class EmailTemplates(models.Model):
                                            referral_notification_id=notification.id, task_id=task_id)
 
         if workflow:
-            workflow.notification = notification
-            workflow.is_human_activity = False
-            workflow.save()
+            workflow.__class__.objects.mark_notified([(workflow, notification)])
 
 
     class Meta:
@@ -696,6 +698,190 @@ class CeleryETATasks(models.Model):
         return f'Celery ETA Task: {self.func} at {self.eta}'
 
 
+class ReferralDailyRollup(models.Model):
+    """
+        daily referral funnel counts and reported hours per (workflow type, state, practice area, professional, income status)
+        maintained incrementally by lowbono_app.reporting, rebuilt from history by `manage.py rebuild-rollups`
+        one row per key: missing practice areas and professionals count as 0 in the unique constraint
+    """
+
+    date = models.DateField()
+    workflow_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    state = models.CharField(max_length=255)
+    practice_area = models.ForeignKey(PracticeArea, on_delete=models.SET_NULL, null=True, blank=True)
+    professional = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    income_status = models.CharField(max_length=16, blank=True, default='')
+
+    referrals_entered = models.PositiveIntegerField(default=0)
+    hours_reported = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = 'Referral Daily Rollup'
+        verbose_name_plural = 'Referral Daily Rollups'
+        indexes = [models.Index(fields=['date', 'workflow_type', 'state'])]
+        constraints = [models.UniqueConstraint(F('date'), F('workflow_type'), F('state'), Coalesce(F('practice_area'), Value(0)),
+                                               Coalesce(F('professional'), Value(0)), F('income_status'), name='unique_referral_daily_rollup')]
+
+    def __str__(self):
+        return f'Referral Daily Rollup: {self.date} {self.state}'
+
+
+class WorkflowTransitionQuerySet(models.QuerySet):
+
+    def for_workflow(self, workflow):
+        return self.filter(workflow_type=ContentType.objects.get_for_model(workflow.__class__), workflow_id=workflow.pk)
+
+    def as_of(self, when):
+        """
+            latest transition of every workflow at or before `when`, i.e. each workflow's state as of that moment
+            answered by the (workflow_type, workflow_id, timestamp) index, one probe per workflow
+        """
+
+        latest = WorkflowTransition.objects.filter(workflow_type=OuterRef('workflow_type'),
+                                                   workflow_id=OuterRef('workflow_id'),
+                                                   timestamp__lte=when) \
+                                           .order_by('-timestamp', '-id').values('id')[:1]
+        return self.filter(timestamp__lte=when, id=Subquery(latest))
+
+    def with_left_at(self):
+        """ annotates each transition with the timestamp at which its workflow left `to_state` (None while still there) """
+
+        return self.annotate(left_at=Window(Lead('timestamp'),
+                                            partition_by=[F('workflow_type'), F('workflow_id')],
+                                            order_by=[F('timestamp').asc(), F('id').asc()]))
+
+    def time_in_state(self, states=None, until=None):
+        """
+            total time spent in each state across the selected workflows, as {state: timedelta}
+            the current state of a workflow counts until `until` (default now)
+            narrow the queryset by workflow only: a filter on state would hide the transitions that leave it
+        """
+
+        until = until or timezone.now()
+        totals = {}
+        for to_state, timestamp, left_at in self.with_left_at().values_list('to_state', 'timestamp', 'left_at'):
+            if states is None or to_state in states:
+                totals[to_state] = totals.get(to_state, datetime.timedelta()) + ((left_at or until) - timestamp)
+        return totals
+
+
+class WorkflowTransition(models.Model):
+    """
+        append-only log of workflow state transitions, one row per joeflow task start
+        written by lowbono_app.transitions, backfilled from tasks by `manage.py backfill-transitions`
+    """
+
+    workflow_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    workflow_id = models.PositiveIntegerField()
+    task = models.OneToOneField('joeflow.Task', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    from_state = models.CharField(max_length=255, blank=True, default='')
+    to_state = models.CharField(max_length=255)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    is_human = models.BooleanField(default=False)
+    timestamp = models.DateTimeField()
+
+    objects = WorkflowTransitionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Workflow Transition'
+        verbose_name_plural = 'Workflow Transitions'
+        indexes = [
+            models.Index(fields=['workflow_type', 'workflow_id', 'timestamp']),
+            models.Index(fields=['workflow_type', 'to_state', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f'Workflow Transition: {self.from_state or "-"} -> {self.to_state} at {self.timestamp}'
+
+
+class ArchivedRecord(models.Model):
+    """
+        cold rows moved out of hot tables by lowbono_app.archive, stored as zlib-compressed JSON
+        (workflow history and notifications of long-closed referrals, old email API logs and celery results)
+        archived workflow history keeps its reported hours in `hours_worked`, so totals are summed without unpacking payloads
+    """
+
+    KIND_CHOICES = [
+        ('workflow_history', 'Workflow History'),
+        ('notification', 'Referral Notification'),
+        ('email_api_log', 'Email API Log'),
+        ('celery_result', 'Celery Task Result'),
+    ]
+
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    workflow_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True)
+    referral_id = models.BigIntegerField(null=True, blank=True)
+    source_id = models.BigIntegerField()
+    timestamp = models.DateTimeField()
+    payload = models.BinaryField()
+    hours_worked = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Archived Record'
+        verbose_name_plural = 'Archived Records'
+        indexes = [
+            models.Index(fields=['kind', 'referral_id', 'timestamp']),
+            models.Index(fields=['kind', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f'Archived Record: {self.kind} #{self.source_id}'
+
+
+class ImageRendition(models.Model):
+    """
+        resized WebP/JPEG copies of an uploaded image, stored under content-hashed names
+        generated by lowbono_app.renditions on upload, backfilled by `manage.py generate-renditions`
+        `renditions` maps format -> [[width, storage name], ...], smallest first
+    """
+
+    source = models.CharField(max_length=512, unique=True)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    renditions = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Image Rendition'
+        verbose_name_plural = 'Image Renditions'
+
+    def __str__(self):
+        return f'Image Rendition: {self.source}'
+
+
+class EligibilitySnapshot(models.Model):
+    """
+        daily matching eligibility of every professional per practice area they are linked to
+        (one row with no practice area when they have none), taken by lowbono_app.eligibility
+        `reasons` lists the failed checks, `change` compares with the previous day's snapshot
+    """
+
+    CHANGE_NEW = 'new'
+    CHANGE_DROPPED = 'dropped'
+    CHANGE_RESTORED = 'restored'
+    CHANGE_CHOICES = [('', 'Unchanged'), (CHANGE_NEW, 'New'), (CHANGE_DROPPED, 'Dropped out'), (CHANGE_RESTORED, 'Restored')]
+
+    date = models.DateField()
+    professional_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    professional = models.ForeignKey(User, on_delete=models.CASCADE, related_name='eligibility_snapshots')
+    practice_area = models.ForeignKey(PracticeArea, on_delete=models.CASCADE, null=True, blank=True)
+
+    is_eligible = models.BooleanField()
+    reasons = models.CharField(max_length=255, blank=True, default='')
+    previous_reasons = models.CharField(max_length=255, blank=True, default='')
+    change = models.CharField(max_length=16, blank=True, default='', choices=CHANGE_CHOICES)
+
+    class Meta:
+        verbose_name = 'Eligibility Snapshot'
+        verbose_name_plural = 'Eligibility Snapshots'
+        constraints = [models.UniqueConstraint(fields=['date', 'professional_type', 'professional', 'practice_area'], name='unique_eligibility_snapshot')]
+        indexes = [models.Index(fields=['date', 'change']), models.Index(fields=['date', 'practice_area', 'is_eligible'])]
+
+    def __str__(self):
+        return f'Eligibility Snapshot: {self.date} {self.professional_id} {self.practice_area_id}'
+
+
 class LLMLogs(models.Model):
     """ stores LLM logs """
 
@@ -716,29 +902,78 @@ class LLMLogs(models.Model):
         self.save()
 
 
+NEWS_CURSOR_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class NewsArticlesQuerySet(models.QuerySet):
+
+    def published(self):
+        return self.filter(status='published')
+
+    def keyset_page(self, cursor=None, size=9):
+        """
+            one page of articles, newest first, starting after `cursor` (from a previous page)
+            answered by the (status, created_at, id) index however deep the page; returns (articles, next cursor or None)
+        """
+
+        articles = self.order_by('-created_at', '-id')
+        if cursor:
+            created_at, pk = NewsArticles.decode_cursor(cursor)
+            articles = articles.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        articles = list(articles[:size + 1])
+        next_cursor = NewsArticles.encode_cursor(articles[size - 1]) if len(articles) > size else None
+        return articles[:size], next_cursor
+
+
 class NewsArticles(models.Model):
     title = models.CharField(max_length=512)
-    slug = models.CharField(max_length=512, blank=True, default='', null=True)
+    slug = models.CharField(max_length=512, blank=True, default='', null=True, unique=True)
     content = RichTextField(config_name='admin_toolbar')
     photo = models.ImageField(upload_to='news_images', blank=True, null=True)
     status = models.CharField(max_length=10, choices=[('draft', 'Draft'), ('published', 'Published')], default='draft',)
     author = models.CharField(max_length=64, default='LowBono Team')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = NewsArticlesQuerySet.as_manager()
+
+    def unique_slug(self):
+        """ slug of the title, suffixed with the first free counter; one query for all candidates """
+
+        base = slugify(self.title)[:500] or 'news'
+        taken = set(NewsArticles.objects.filter(slug__startswith=base).exclude(pk=self.pk).values_list('slug', flat=True))
+        slug, counter = base, 1
+        while slug in taken:
+            slug = f'{base}-{counter}'
+            counter += 1
+        return slug
 
     def save(self, *args, **kwargs):
-        self.slug = slugify(self.title)
-        original_slug = self.slug
-        if not self.pk:
-            counter = 1
-            while NewsArticles.objects.filter(slug=self.slug).exists():
-                self.slug = f'{original_slug}-{counter}'
-                counter += 1
+        # the slug is only generated once, editing the title keeps published URLs working
+        if not self.slug:
+            self.slug = self.unique_slug()
         super().save(*args, **kwargs)
 
+    def get_absolute_url(self):
+        return reverse('news_article_page', kwargs={'slug': self.slug})
+
+    @staticmethod
+    def encode_cursor(article):
+        return f'{(article.created_at - NEWS_CURSOR_EPOCH) // datetime.timedelta(microseconds=1)}.{article.pk}'
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """ (created_at, id) of a cursor from `encode_cursor`, ValueError when malformed """
+
+        microseconds, pk = cursor.split('.')
+        return NEWS_CURSOR_EPOCH + datetime.timedelta(microseconds=int(microseconds)), int(pk)
+
     def __str__(self):
         return self.title
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at', 'id'])]
         verbose_name = 'News Article'
         verbose_name_plural = 'News Articles'
@@ -0,0 +1,178 @@
+"""
+    Profile completeness of users and their professional profiles.
+
+    A user's profile is complete when all of USER_PROFILE_FIELDS are filled in, a professional
+    profile (Lawyer, Mediator, ...) when `Professional.profile_complete_expression()` holds.
+    `refresh_profile_completeness` computes the flags of one, many or all users with one
+    annotated query per model and only writes the rows whose flag changed, so saving a user, a
+    bar admission or a practice area no longer re-saves the related profiles in a cascade.
+
+    Bulk edits and imports can wrap their work in `defer_profile_completeness()`: the users
+    touched inside the block are refreshed together once it exits.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+
+USER_PROFILE_FIELDS = ('email', 'first_name', 'last_name', 'firm_name', 'phone', 'address', 'photo', 'bio')
+
+_deferred = threading.local()
+
+
+def user_complete_expression():
+    """ the SQL counterpart of User._is_profile_complete() """
+
+    condition = Q()
+    for name in USER_PROFILE_FIELDS:
+        condition &= Q(**{f'{name}__isnull': False}) & ~Q(**{name: ''})
+    return condition
+
+
+def _sync(queryset, expression):
+    """ sets is_profile_complete to `expression` where they differ, returns {pk: new value} of the changed rows """
+
+    changed = dict(queryset.annotate(complete=ExpressionWrapper(expression, output_field=BooleanField()))
+                           .exclude(is_profile_complete=F('complete'))
+                           .values_list('pk', 'complete'))
+    for value in (True, False):
+        pks = [pk for pk, complete in changed.items() if complete == value]
+        if pks:
+            queryset.model._base_manager.filter(pk__in=pks).update(is_profile_complete=value)
+    return changed
+
+
+def _user_ids(users):
+    return {user if isinstance(user, int) else user.pk for user in users}
+
+
+def _professional_models():
+    from .pluggable_app import PluggableApp
+
+    return [app._models.Professional for app in PluggableApp.get_apps()]
+
+
+def refresh_profile_completeness(users=None, include_users=True):
+    """
+        Recomputes is_profile_complete of `users` (User instances or ids, every user when None) and of
+        their professional profiles; `include_users=False` only refreshes the professional profiles.
+        Returns {model: {pk: new value}} of the rows that changed; User instances passed in, and their
+        cached professional profiles, get the new values too.
+    """
+    from .directory_cache import bump_directory_version
+    from .models import User
+
+    users = None if users is None else list(users)
+    user_ids = None if users is None else _user_ids(users)
+    if user_ids is not None and not user_ids:
+        return {}
+
+    changed = {}
+    if include_users:
+        queryset = User.objects.all() if user_ids is None else User.objects.filter(pk__in=user_ids)
+        changed[User] = _sync(queryset, user_complete_expression())
+
+    for model in _professional_models():
+        queryset = model.objects.all() if user_ids is None else model.objects.filter(user_id__in=user_ids)
+        changed[model] = _sync(queryset, model.profile_complete_expression())
+
+    changed = {model: rows for model, rows in changed.items() if rows}
+    if changed:
+        # queryset updates send no post_save, but the directory only lists complete profiles
+        bump_directory_version()
+        _apply(users or [], changed)
+    return changed
+
+
+def _apply(users, changed):
+    from .models import User
+
+    for user in users:
+        if isinstance(user, int):
+            continue
+        if user.pk in changed.get(User, {}):
+            user.is_profile_complete = changed[User][user.pk]
+        for model, rows in changed.items():
+            if model is User:
+                continue
+            descriptor = getattr(User, model._meta.get_field('user').remote_field.get_accessor_name())
+            if descriptor.is_cached(user):
+                profile = descriptor.__get__(user)
+                if profile.pk in rows:
+                    profile.is_profile_complete = rows[profile.pk]
+
+
+def schedule_profile_completeness(users, include_users=False):
+    """ refreshes `users` now, or when the enclosing `defer_profile_completeness()` block exits """
+
+    pending = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        pending.update(_user_ids(users))
+        return {}
+    return refresh_profile_completeness(users, include_users=include_users)
+
+
+@contextmanager
+def defer_profile_completeness():
+    """ collects the users changed inside the block and refreshes them all, with one query per model, on exit """
+
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+
+    _deferred.pending = set()
+    try:
+        yield
+        pending = _deferred.pending
+    finally:
+        _deferred.pending = None
+    refresh_profile_completeness(pending)
+
+
+def _refresh_for_user(sender, instance, update_fields=None, raw=False, **kwargs):
+    # User.save() already set its own flag; logins only touch `last_login`
+    if raw or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    schedule_profile_completeness([instance])
+
+
+def _refresh_for_bar_admission(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_profile_completeness([instance.user_id])
+
+
+def _refresh_for_practice_area(sender, instance, raw=False, **kwargs):
+    """ saves/deletes of the practice area through models, e.g. from the admin inlines """
+
+    if not raw:
+        professional = next(field for field in sender._meta.fields if field.is_relation and field.related_model in _professional_models())
+        schedule_profile_completeness(professional.related_model.objects.filter(pk=getattr(instance, professional.attname)).values_list('user_id', flat=True))
+
+
+def _refresh_for_practice_areas_m2m(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        changed = schedule_profile_completeness([instance.user_id])
+        instance.is_profile_complete = changed.get(type(instance), {}).get(instance.pk, instance.is_profile_complete)
+    elif pk_set:
+        # practice_area.lawyer_practiceareas.add(lawyer): `model` is the professional model
+        schedule_profile_completeness(model.objects.filter(pk__in=pk_set).values_list('user_id', flat=True))
+
+
+def connect_profile_completeness_signals():
+    from .models import User, BarAdmission
+
+    post_save.connect(_refresh_for_user, sender=User, dispatch_uid='profile_completeness_user_save')
+    post_save.connect(_refresh_for_bar_admission, sender=BarAdmission, dispatch_uid='profile_completeness_bar_admission_save')
+    post_delete.connect(_refresh_for_bar_admission, sender=BarAdmission, dispatch_uid='profile_completeness_bar_admission_delete')
+
+    for model in _professional_models():
+        through = model.practice_areas.through
+        uid = f'profile_completeness_{through._meta.label_lower}'
+        m2m_changed.connect(_refresh_for_practice_areas_m2m, sender=through, dispatch_uid=f'{uid}_m2m')
+        post_save.connect(_refresh_for_practice_area, sender=through, dispatch_uid=f'{uid}_save')
+        post_delete.connect(_refresh_for_practice_area, sender=through, dispatch_uid=f'{uid}_delete')
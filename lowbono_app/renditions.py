@@ -0,0 +1,201 @@
+"""
+    Responsive image renditions.
+
+    Uploaded headshots, news photos and CMS card images are resized once, when saved, into
+    WebP and JPEG copies at RENDITION_WIDTHS (never wider than the original). Each copy is stored
+    under a name containing a hash of its bytes, so it can be served with a far-future cache
+    lifetime and a re-upload never reuses a URL. The widths and names are kept on an
+    ImageRendition row per source file and rendered as srcset by the `responsive_image` tag;
+    until they exist the tag falls back to the uploaded file. Saving an ImageRendition bumps the
+    CMS content and directory versions, so cached renders pick the renditions up.
+"""
+import hashlib
+import io
+import logging
+import posixpath
+from functools import partial
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+logger_joeflow = logging.getLogger('joeflow_log')
+
+RENDITION_WIDTHS = (96, 192, 384, 768, 1280)
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+RENDITION_DIRECTORY = 'renditions'
+RENDITION_CACHE_KEY = 'lowbono:renditions:{}'
+RENDITION_CACHE_TIMEOUT = 60 * 60 * 24
+
+# (model label, image field) pairs whose uploads get renditions
+RENDITION_FIELDS = (
+    ('lowbono_app.User', 'photo'),
+    ('lowbono_app.NewsArticles', 'photo'),
+    ('lowbono_cms.CMSRichTextMemberCard', 'photo'),
+    ('lowbono_cms.CMSThemeQuoteCard', 'brand_image'),
+    ('lowbono_cms.CMSThemeQuoteCard', 'person_image'),
+)
+
+
+def _cache_key(source):
+    return RENDITION_CACHE_KEY.format(hashlib.sha1(source.encode()).hexdigest())
+
+
+def rendition_name(source, width, extension, data):
+    """ renditions/<source directory>/<source stem>-<width>w.<content hash>.<extension> """
+
+    directory, filename = posixpath.split(source)
+    stem = posixpath.splitext(filename)[0]
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return posixpath.join(RENDITION_DIRECTORY, directory, f'{stem}-{width}w.{digest}.{extension}')
+
+
+def _encode(image, width, image_format, options):
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image.copy()
+
+    if image_format == 'JPEG' and resized.mode != 'RGB':
+        rgba = resized.convert('RGBA')
+        resized = Image.new('RGB', rgba.size, (255, 255, 255))
+        resized.paste(rgba, mask=rgba.getchannel('A'))
+    elif resized.mode not in ('RGB', 'RGBA'):
+        resized = resized.convert('RGBA')
+
+    buffer = io.BytesIO()
+    resized.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def get_widths(original_width):
+    """ RENDITION_WIDTHS narrower than the original, plus the original width when it's within the range """
+
+    widths = [width for width in RENDITION_WIDTHS if width < original_width]
+    if original_width <= RENDITION_WIDTHS[-1] or not widths:
+        widths.append(min(original_width, RENDITION_WIDTHS[-1]))
+    return widths
+
+
+def generate_renditions(source, storage=None, force=False):
+    """
+        creates (or, with `force`, recreates) the renditions of the stored file `source`
+        returns its ImageRendition, None when `source` is missing or not an image
+    """
+    from .models import ImageRendition
+
+    storage = storage or default_storage
+    if not force:
+        existing = ImageRendition.objects.filter(source=source).first()
+        if existing:
+            return existing
+
+    try:
+        with storage.open(source) as f:
+            image = Image.open(f)
+            image.load()
+    except (FileNotFoundError, UnidentifiedImageError, OSError) as e:
+        logger_joeflow.warning("Could not generate renditions of %s: %s" % (source, e))
+        return None
+
+    image = ImageOps.exif_transpose(image)
+    renditions = {}
+    for extension, (image_format, options) in RENDITION_FORMATS.items():
+        renditions[extension] = []
+        for width in get_widths(image.width):
+            data = _encode(image, width, image_format, options)
+            name = rendition_name(source, width, extension, data)
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(data))
+            renditions[extension].append([width, name])
+
+    rendition, _ = ImageRendition.objects.update_or_create(source=source, defaults={
+        'width': image.width, 'height': image.height, 'renditions': renditions})
+    cache.delete(_cache_key(source))
+    return rendition
+
+
+def get_renditions(source):
+    """ {'width', 'height', 'renditions'} of `source`, None until they're generated; cached """
+    from .models import ImageRendition
+
+    key = _cache_key(source)
+    renditions = cache.get(key)
+    if renditions is None:
+        renditions = ImageRendition.objects.filter(source=source).values('width', 'height', 'renditions').first() or {}
+        cache.set(key, renditions, RENDITION_CACHE_TIMEOUT)
+    return renditions or None
+
+
+def srcset(renditions, extension, storage=None):
+    storage = storage or default_storage
+    return ', '.join(f'{storage.url(name)} {width}w' for width, name in renditions['renditions'].get(extension, []))
+
+
+def _enqueue(source):
+    from . import tasks
+
+    try:
+        tasks.generate_image_renditions.delay(source)
+    except Exception as e:
+        # the upload itself succeeded, `manage.py generate-renditions` picks the file up later
+        logger_joeflow.warning("Could not queue renditions of %s: %s" % (source, e))
+
+
+def schedule_renditions(sender, instance, update_fields=None, **kwargs):
+    """ post_save receiver queueing renditions of newly uploaded images once the transaction commits """
+
+    for label, field_name in RENDITION_FIELDS:
+        if sender._meta.label != label or (update_fields and field_name not in update_fields):
+            continue
+        file = getattr(instance, field_name)
+        if file and file.name and get_renditions(file.name) is None:
+            transaction.on_commit(partial(_enqueue, file.name))
+
+
+def iter_sources(models_fields=RENDITION_FIELDS):
+    """ distinct stored file names of every image field in RENDITION_FIELDS """
+
+    for label, field_name in models_fields:
+        try:
+            model = apps.get_model(label)
+        except LookupError:
+            continue
+        names = model._base_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}) \
+                                   .values_list(field_name, flat=True).distinct()
+        yield from names.iterator()
+
+
+def backfill(force=False, queue=False):
+    """ generates (or with `queue`, queues) renditions for every stored image missing them; returns counts """
+    from .models import ImageRendition
+
+    counts = {'generated': 0, 'queued': 0, 'skipped': 0, 'failed': 0}
+    done = set() if force else set(ImageRendition.objects.values_list('source', flat=True))
+    for source in set(iter_sources()):
+        if source in done:
+            counts['skipped'] += 1
+        elif queue:
+            _enqueue(source)
+            counts['queued'] += 1
+        elif generate_renditions(source, force=force):
+            counts['generated'] += 1
+        else:
+            counts['failed'] += 1
+    return counts
+
+
+def connect_rendition_signals():
+    for label in {label for label, _ in RENDITION_FIELDS}:
+        try:
+            model = apps.get_model(label)
+        except LookupError:
+            continue
+        post_save.connect(schedule_renditions, sender=model, dispatch_uid=f'renditions_{model._meta.label_lower}')
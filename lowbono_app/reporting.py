@@ -0,0 +1,247 @@
+"""
+    Reporting rollups for the referral funnel and engagement hours.
+
+    `ReferralDailyRollup` rows hold, per day and per (workflow type, state, practice area,
+    professional, income status), how many referrals entered a state for the first time
+    and how many hours were reported. They are updated incrementally from joeflow task
+    creation and workflow history inserts, so reports never scan the history tables;
+    `rebuild_rollups` recomputes them from history, archived history included, when needed.
+
+    Rows are keyed by the referral's current practice area, professional and income status,
+    like the rebuild: when a referral changes any of them, its contributions are moved to the
+    new key. A unique constraint keeps one row per key, concurrent first writes for a key
+    retry as an increment.
+"""
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import F, Min, Sum
+from django.db.models.signals import pre_save, post_save
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+REPORT_GROUPINGS = {
+    'workflow_type': 'workflow_type__model',
+    'state': 'state',
+    'practice_area': 'practice_area__title',
+    'professional': 'professional__email',
+    'income_status': 'income_status',
+}
+
+
+def _workflow_models():
+    from .pluggable_app import PluggableApp
+
+    return [app._models.ReferralWorkflowState for app in PluggableApp.get_apps()]
+
+
+def _referral_dimensions(referral):
+    return {
+        'practice_area_id': referral.practice_area_id,
+        'professional_id': referral.professional_id,
+        'income_status': referral.income_status or '',
+    }
+
+
+def _dimensions(workflow, state):
+    return {
+        'workflow_type': ContentType.objects.get_for_model(workflow.__class__),
+        'state': state or '',
+        **_referral_dimensions(workflow.referral),
+    }
+
+
+def _update(day, dimensions, amounts):
+    from .models import ReferralDailyRollup
+
+    return ReferralDailyRollup.objects.filter(date=day, **dimensions) \
+                                      .update(**{field: F(field) + amount for field, amount in amounts.items()})
+
+
+def _increment(day, dimensions, **amounts):
+    from .models import ReferralDailyRollup
+
+    if _update(day, dimensions, amounts):
+        return
+    try:
+        with transaction.atomic():
+            ReferralDailyRollup.objects.create(date=day, **dimensions, **amounts)
+    except IntegrityError:
+        # another writer created the row since our update
+        _update(day, dimensions, amounts)
+
+
+def record_state_entered(workflow, state, when):
+    """ a referral's workflow entered `state` for the first time """
+
+    _increment(timezone.localdate(when), _dimensions(workflow, state), referrals_entered=1)
+
+
+def record_hours_reported(workflow, state, hours, when):
+    """ hours reported on a workflow while at `state` """
+
+    if hours:
+        _increment(timezone.localdate(when), _dimensions(workflow, state), hours_reported=Decimal(hours))
+
+
+def _archived_hours(workflow_type, **filters):
+    """
+        (day, state, referral id, hours) of the archived workflow history of `workflow_type` with reported hours;
+        only these rows are unpacked, for the state they were reported at
+    """
+    from . import archive
+    from .models import ArchivedRecord
+
+    records = ArchivedRecord.objects.filter(kind=archive.KIND_WORKFLOW_HISTORY, workflow_type=workflow_type, hours_worked__gt=0, **filters) \
+                                    .values_list('timestamp', 'referral_id', 'hours_worked', 'payload')
+    for timestamp, referral_id, hours, payload in records.iterator():
+        yield timezone.localdate(timestamp), archive.unpack(payload).get('archive_task_name') or '', referral_id, hours
+
+
+def _workflow_contributions(workflow):
+    """ {(day, state): amounts} a workflow adds to the rollups, counted as `rebuild_rollups` does """
+    from joeflow.models import Task
+
+    workflow_type = ContentType.objects.get_for_model(workflow.__class__)
+    contributions = {}
+    first_entries = Task.objects.filter(content_type=workflow_type, _workflow_id=workflow.pk) \
+                                .order_by().values('name').annotate(first_entered=Min('created'))
+    for entry in first_entries:
+        contributions.setdefault((timezone.localdate(entry['first_entered']), entry['name']), {})['referrals_entered'] = 1
+
+    hours = workflow.history.filter(hours_worked__gt=0).annotate(day=TruncDate('updated_at')).order_by() \
+                            .values('day', 'current_task__name').annotate(total=Sum('hours_worked'))
+    hours = [(row['day'], row['current_task__name'] or '', row['total']) for row in hours]
+    hours += [(day, state, total) for day, state, _, total in _archived_hours(workflow_type, referral_id=workflow.referral_id)]
+    for day, state, total in hours:
+        amounts = contributions.setdefault((day, state), {})
+        amounts['hours_reported'] = amounts.get('hours_reported', 0) + total
+    return contributions
+
+
+def move_referral_rollups(referral, previous):
+    """ moves the contributions of `referral` from its `previous` dimensions to its current ones """
+    from .models import ReferralDailyRollup
+
+    current = _referral_dimensions(referral)
+    if current == previous:
+        return
+
+    for workflow_model in _workflow_models():
+        workflow = workflow_model.objects.filter(referral=referral).first()
+        if workflow is None:
+            continue
+        workflow_type = ContentType.objects.get_for_model(workflow_model)
+        with transaction.atomic():
+            for (day, state), amounts in _workflow_contributions(workflow).items():
+                previous_key = {'workflow_type': workflow_type, 'state': state, **previous}
+                _update(day, previous_key, {field: -amount for field, amount in amounts.items()})
+                ReferralDailyRollup.objects.filter(date=day, **previous_key, referrals_entered=0, hours_reported=0).delete()
+                _increment(day, {'workflow_type': workflow_type, 'state': state, **current}, **amounts)
+
+
+def rebuild_rollups(since=None):
+    """
+        Recomputes rollups from joeflow tasks (first entry per state) and workflow history, hot and archived (hours).
+        With `since` (a date), only rollups from that day onwards are replaced.
+        Returns the number of rollup rows written.
+    """
+    from joeflow.models import Task
+    from .models import ReferralDailyRollup
+
+    totals = {}
+
+    def add(key, field, amount):
+        row = totals.setdefault(key, {'referrals_entered': 0, 'hours_reported': Decimal(0)})
+        row[field] += amount
+
+    for workflow_model in _workflow_models():
+        workflow_type = ContentType.objects.get_for_model(workflow_model)
+        referrals, referral_dimensions = {}, {}
+        for workflow in workflow_model.objects.values('pk', 'referral_id',
+                                                      rollup_practice_area=F('referral__practice_area_id'),
+                                                      rollup_professional=F('referral__professional_id'),
+                                                      rollup_income_status=F('referral__income_status')):
+            dimensions = (workflow['rollup_practice_area'], workflow['rollup_professional'], workflow['rollup_income_status'] or '')
+            referrals[workflow['pk']] = referral_dimensions[workflow['referral_id']] = dimensions
+
+        first_entries = Task.objects.filter(content_type=workflow_type).order_by() \
+                                    .values('_workflow_id', 'name').annotate(first_entered=Min('created'))
+        for entry in first_entries.iterator():
+            day = timezone.localdate(entry['first_entered'])
+            if entry['_workflow_id'] not in referrals or (since and day < since):
+                continue
+            add((day, workflow_type.id, entry['name'], *referrals[entry['_workflow_id']]), 'referrals_entered', 1)
+
+        hours = workflow_model.history.field.model.objects.filter(hours_worked__gt=0)
+        if since:
+            hours = hours.filter(updated_at__date__gte=since)
+        hours = hours.annotate(day=TruncDate('updated_at')).order_by() \
+                     .values('day', 'current_task__name', 'referral__practice_area_id', 'referral__professional_id', 'referral__income_status') \
+                     .annotate(total=Sum('hours_worked'))
+        for row in hours.iterator():
+            key = (row['day'], workflow_type.id, row['current_task__name'] or '', row['referral__practice_area_id'],
+                   row['referral__professional_id'], row['referral__income_status'] or '')
+            add(key, 'hours_reported', row['total'])
+
+        archived = _archived_hours(workflow_type, **({'timestamp__date__gte': since} if since else {}))
+        for day, state, referral_id, total in archived:
+            if referral_id in referral_dimensions:
+                add((day, workflow_type.id, state, *referral_dimensions[referral_id]), 'hours_reported', total)
+
+    rollups = [
+        ReferralDailyRollup(date=day, workflow_type_id=workflow_type_id, state=state, practice_area_id=practice_area_id,
+                            professional_id=professional_id, income_status=income_status, **amounts)
+        for (day, workflow_type_id, state, practice_area_id, professional_id, income_status), amounts in totals.items()
+    ]
+
+    with transaction.atomic():
+        stale = ReferralDailyRollup.objects.all()
+        if since:
+            stale = stale.filter(date__gte=since)
+        stale.delete()
+        ReferralDailyRollup.objects.bulk_create(rollups, batch_size=1000)
+
+    return len(rollups)
+
+
+def rollup_report(start=None, end=None, workflow_type=None, group_by=('state',)):
+    """ referrals entered and hours reported between `start` and `end` (inclusive dates), grouped by `group_by` """
+    from .models import ReferralDailyRollup
+
+    rollups = ReferralDailyRollup.objects.all()
+    if start:
+        rollups = rollups.filter(date__gte=start)
+    if end:
+        rollups = rollups.filter(date__lte=end)
+    if workflow_type:
+        rollups = rollups.filter(workflow_type=workflow_type)
+
+    columns = [REPORT_GROUPINGS[grouping] for grouping in group_by]
+    return rollups.values(*columns) \
+                  .annotate(referrals_entered=Sum('referrals_entered'), hours_reported=Sum('hours_reported')) \
+                  .order_by(*columns)
+
+
+def _remember_referral_dimensions(sender, instance, raw=False, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & {'practice_area', 'professional', 'income_status'}:
+        return
+    if not raw and instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values('practice_area_id', 'professional_id', 'income_status').first()
+        if previous:
+            instance._rollup_dimensions = {**previous, 'income_status': previous['income_status'] or ''}
+
+
+def _move_referral_rollups(sender, instance, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_rollup_dimensions', None)
+    if not raw and previous is not None:
+        move_referral_rollups(instance, previous)
+
+
+def connect_reporting_signals():
+    from .models import Referral
+
+    pre_save.connect(_remember_referral_dimensions, sender=Referral, dispatch_uid='reporting_referral_pre_save')
+    post_save.connect(_move_referral_rollups, sender=Referral, dispatch_uid='reporting_referral_save')
@@ -0,0 +1,277 @@
+"""
+    Full-text search over professionals (users) and referrals.
+
+    Each searchable kind gets its own index table keyed by the object's primary key:
+    an FTS5 virtual table on SQLite and a tsvector table with a GIN index on Postgres.
+    Both backends expose the same interface, picked by `get_search_backend()`.
+"""
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models.signals import post_save, post_delete
+from django.db.models import Case, When, IntegerField
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+
+
+SEARCH_KINDS = ('user', 'referral')
+# matches ordered by rank, the others follow unordered; filtering is never capped
+RANK_LIMIT = 200
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize_query(query):
+    return TOKEN_RE.findall(query or '')
+
+
+class SearchBackend:
+    """
+        Interface shared by the database specific search backends.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def table_name(self, kind):
+        if kind not in SEARCH_KINDS:
+            raise ValueError(f"Unknown search kind '{kind}'")
+        return f'lowbono_search_{kind}'
+
+    def create_tables(self):
+        raise NotImplementedError
+
+    def drop_tables(self):
+        with self.connection.cursor() as cursor:
+            for kind in SEARCH_KINDS:
+                cursor.execute(f'DROP TABLE IF EXISTS {self.table_name(kind)}')
+
+    def index(self, kind, object_id, title, body):
+        raise NotImplementedError
+
+    def remove(self, kind, object_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table_name(kind)} WHERE {self.pk_column} = %s', [object_id])
+
+    def clear(self, kind):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table_name(kind)}')
+
+    def match_sql(self, kind, tokens):
+        """ (sql, params) of a query selecting the ids of every match """
+        raise NotImplementedError
+
+    def rank_sql(self, kind, tokens):
+        """ (sql, params) of a query selecting the ids of every match, best match first """
+        raise NotImplementedError
+
+    def search(self, kind, query, limit=RANK_LIMIT):
+        """ returns matching object ids, best match first; all of them when `limit` is None """
+        tokens = tokenize_query(query)
+        if not tokens:
+            return []
+
+        sql, params = self.rank_sql(kind, tokens)
+        if limit is not None:
+            sql, params = f'{sql} LIMIT %s', params + [limit]
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class SQLiteSearchBackend(SearchBackend):
+    pk_column = 'rowid'
+
+    def create_tables(self):
+        with self.connection.cursor() as cursor:
+            for kind in SEARCH_KINDS:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table_name(kind)} "
+                    f"USING fts5(title, body, tokenize = 'porter unicode61 remove_diacritics 2')"
+                )
+
+    def index(self, kind, object_id, title, body):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table_name(kind)} WHERE rowid = %s', [object_id])
+            cursor.execute(f'INSERT INTO {self.table_name(kind)} (rowid, title, body) VALUES (%s, %s, %s)', [object_id, title, body])
+
+    def match_sql(self, kind, tokens):
+        table = self.table_name(kind)
+        return f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [' '.join(f'"{token}"*' for token in tokens)]
+
+    def rank_sql(self, kind, tokens):
+        sql, params = self.match_sql(kind, tokens)
+        return f'{sql} ORDER BY bm25({self.table_name(kind)}, 10.0, 1.0)', params
+
+
+class PostgresSearchBackend(SearchBackend):
+    pk_column = 'object_id'
+    config = 'english'
+
+    def create_tables(self):
+        with self.connection.cursor() as cursor:
+            for kind in SEARCH_KINDS:
+                table = self.table_name(kind)
+                cursor.execute(f'CREATE TABLE IF NOT EXISTS {table} (object_id bigint PRIMARY KEY, document tsvector NOT NULL)')
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS {table}_document_idx ON {table} USING GIN (document)')
+
+    def index(self, kind, object_id, title, body):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {self.table_name(kind)} (object_id, document) "
+                f"VALUES (%s, setweight(to_tsvector(%s, %s), 'A') || setweight(to_tsvector(%s, %s), 'B')) "
+                f"ON CONFLICT (object_id) DO UPDATE SET document = EXCLUDED.document",
+                [object_id, self.config, title, self.config, body]
+            )
+
+    def _tsquery(self, tokens):
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def match_sql(self, kind, tokens):
+        return f'SELECT object_id FROM {self.table_name(kind)} WHERE document @@ to_tsquery(%s, %s)', [self.config, self._tsquery(tokens)]
+
+    def rank_sql(self, kind, tokens):
+        sql, params = self.match_sql(kind, tokens)
+        return f'{sql} ORDER BY ts_rank(document, to_tsquery(%s, %s)) DESC', params + [self.config, self._tsquery(tokens)]
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend(using='default'):
+    """ returns None when the database has no supported full-text search """
+    connection = connections[using]
+    backend_class = SEARCH_BACKENDS.get(connection.vendor)
+    return backend_class(connection) if backend_class else None
+
+
+def user_document(user):
+    title = ' '.join(filter(None, [user.first_name, user.last_name, user.firm_name]))
+    body = ' '.join(filter(None, [user.email, strip_tags(user.bio or '')] + [strip_tags(lang.bio) for lang in user.languages.all()]))
+    return title, body
+
+
+def referral_document(referral):
+    title = ' '.join(filter(None, [referral.first_name, referral.last_name]))
+    body = ' '.join(filter(None, [referral.email, referral.issue_description]))
+    return title, body
+
+
+def _get_documented_models():
+    from . import models
+    return {
+        'user': (models.User, user_document),
+        'referral': (models.Referral, referral_document),
+    }
+
+
+def index_object(kind, instance):
+    backend = get_search_backend()
+    if backend:
+        _, build_document = _get_documented_models()[kind]
+        backend.index(kind, instance.pk, *build_document(instance))
+
+
+def remove_object(kind, object_id):
+    backend = get_search_backend()
+    if backend:
+        backend.remove(kind, object_id)
+
+
+def reindex(kinds=SEARCH_KINDS, batch_size=500):
+    """ rebuilds the index for the given kinds, returns the number of indexed objects per kind """
+    backend = get_search_backend()
+    if backend is None:
+        raise ImproperlyConfigured(f"Full-text search is not supported on '{connections['default'].vendor}'")
+    counts = {}
+    for kind in kinds:
+        model, build_document = _get_documented_models()[kind]
+        queryset = model.objects.all()
+        if kind == 'user':
+            queryset = queryset.prefetch_related('languages')
+
+        backend.clear(kind)
+        counts[kind] = 0
+        for instance in queryset.iterator(chunk_size=batch_size):
+            backend.index(kind, instance.pk, *build_document(instance))
+            counts[kind] += 1
+    return counts
+
+
+def search_ids(kind, query, limit=RANK_LIMIT):
+    """ returns None when full-text search is unavailable """
+    backend = get_search_backend()
+    return backend.search(kind, query, limit=limit) if backend else None
+
+
+def match_subquery(kind, query):
+    """
+        Every match of `query`, uncapped, as a value for an `__in` lookup.
+        Returns None when full-text search is unavailable.
+    """
+    backend = get_search_backend()
+    if backend is None:
+        return None
+    tokens = tokenize_query(query)
+    return RawSQL(*backend.match_sql(kind, tokens)) if tokens else []
+
+
+def rank_ordering(ids, pk_field='pk'):
+    """ ordering expression that keeps `ids` in their search rank order, other rows last """
+    return Case(*[When(**{pk_field: pk}, then=position) for position, pk in enumerate(ids)], output_field=IntegerField()).asc(nulls_last=True)
+
+
+def filter_by_search(queryset, kind, query, pk_field='pk'):
+    """
+        Narrows `queryset` to every search match, the RANK_LIMIT best ones first.
+        `pk_field` points at the indexed object when searching a related model.
+        Returns None when full-text search is unavailable so callers can fall back.
+    """
+    matches = match_subquery(kind, query)
+    if matches is None:
+        return None
+    return queryset.filter(**{f'{pk_field}__in': matches}).order_by(rank_ordering(search_ids(kind, query, limit=RANK_LIMIT), pk_field))
+
+
+def _index_user(sender, instance, update_fields=None, **kwargs):
+    # logins only touch `last_login`, which is not indexed
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    index_object('user', instance)
+
+
+def _remove_user(sender, instance, **kwargs):
+    remove_object('user', instance.pk)
+
+
+def _index_language_user(sender, instance, **kwargs):
+    from . import models
+    try:
+        index_object('user', instance.user)
+    except models.User.DoesNotExist:
+        pass
+
+
+def _index_referral(sender, instance, **kwargs):
+    index_object('referral', instance)
+
+
+def _remove_referral(sender, instance, **kwargs):
+    remove_object('referral', instance.pk)
+
+
+def connect_search_signals():
+    """
+        Keeps the search index in step with the indexed models.
+    """
+    from . import models
+
+    post_save.connect(_index_user, sender=models.User, dispatch_uid='search_index_user_save')
+    post_delete.connect(_remove_user, sender=models.User, dispatch_uid='search_index_user_delete')
+    post_save.connect(_index_language_user, sender=models.Language, dispatch_uid='search_index_language_save')
+    post_delete.connect(_index_language_user, sender=models.Language, dispatch_uid='search_index_language_delete')
+    post_save.connect(_index_referral, sender=models.Referral, dispatch_uid='search_index_referral_save')
+    post_delete.connect(_remove_referral, sender=models.Referral, dispatch_uid='search_index_referral_delete')
@@ -0,0 +1,210 @@
+"""
+    Synthetic data generator, used to reproduce production scale locally (see the
+    `generate-synthetic-data` and `run-benchmarks` commands).
+
+    Professionals of every pluggable app are created with practice areas, bar admissions and
+    vacations, then referrals whose workflows are walked through random human updates the same
+    way ReferralUpdateViewBase moves them, with each step backdated so task history, workflow
+    history, transitions, notifications and rollups spread over the last `days` days.
+"""
+import datetime
+import random
+import uuid
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from faker import Faker
+
+from .availability import rebuild_user_availability
+from .profile_completeness import defer_profile_completeness
+
+
+SYNTHETIC_EMAIL_DOMAIN = 'synthetic.lowbono.org'
+
+
+class SyntheticDataGenerator:
+    """
+        Builds a consistent, seeded data set. `generate()` returns the number of rows created per kind.
+    """
+
+    def __init__(self, seed=None, days=365, max_updates=4):
+        self.random = random.Random(seed)
+        self.fake = Faker()
+        self.fake.seed_instance(seed)
+        self.days = days
+        self.max_updates = max_updates
+        self.run_id = uuid.UUID(int=self.random.getrandbits(128)).hex[:8]
+        self.counts = {'professionals': 0, 'practice_areas': 0, 'vacations': 0, 'referrals': 0, 'workflow_updates': 0, 'notifications': 0}
+
+    def _random_moment(self, after=None):
+        """ random moment between `after` (default: `days` ago) and now """
+
+        start = after or timezone.now() - datetime.timedelta(days=self.days)
+        return start + (timezone.now() - start) * self.random.random()
+
+    def _practice_areas(self, professional_model):
+        """ practice areas of the app, a few synthetic ones are created when the app has none """
+        from .models import PracticeArea, PracticeAreaCategory
+
+        practicearea_type = ContentType.objects.get_for_model(professional_model)
+        practice_areas = list(PracticeArea.objects.filter(practicearea_type=practicearea_type))
+        if practice_areas:
+            return practice_areas
+
+        def next_id(model):
+            ids = [int(pk) for pk in model.objects.values_list('id', flat=True) if pk.isdigit()]
+            return max(ids, default=0) + 1
+
+        category = PracticeAreaCategory.objects.create(id=str(next_id(PracticeAreaCategory)), title=self.fake.bs().title(),
+                                                       definition=self.fake.sentence(), practicearea_category_type=practicearea_type)
+        first_id = next_id(PracticeArea)
+        practice_areas = PracticeArea.objects.bulk_create([
+            PracticeArea(id=str(first_id + i), title=self.fake.bs().title(), definition=self.fake.paragraph(),
+                         parent=category, practicearea_type=practicearea_type)
+            for i in range(5)
+        ])
+        self.counts['practice_areas'] += len(practice_areas)
+        return practice_areas
+
+    def create_professional(self, app, index, practice_areas):
+        from .models import User, BarAdmission, Vacation
+
+        first_name, last_name = self.fake.first_name(), self.fake.last_name()
+        user = User.objects.create_user(f'{app.name}-{self.run_id}-{index}@{SYNTHETIC_EMAIL_DOMAIN}', None)
+        user.first_name, user.last_name = first_name, last_name
+        user.firm_name = self.fake.company()
+        user.phone = '+1202555' + str(self.random.randint(1000, 9999))
+        user.address = self.fake.address()
+        user.bio = f'<p>{self.fake.paragraph()}</p>'
+        user.save()
+
+        BarAdmission.objects.create(user=user, state='DC', bar_number=str(self.random.randint(100000, 999999)),
+                                    admission_date=self.fake.date_between(start_date='-30y', end_date='-1y'))
+
+        professional = app._models.Professional.objects.create(user=user, is_enabled=True)
+        professional.practice_areas.add(*self.random.sample(practice_areas, min(len(practice_areas), self.random.randint(1, 3))),
+                                        through_defaults={'approved': True})
+
+        vacations = []
+        for _ in range(self.random.choice([0, 0, 1, 2])):
+            first_day = timezone.localdate() + datetime.timedelta(days=self.random.randint(-self.days, 60))
+            vacations.append(Vacation(user=user, first_day=first_day, last_day=first_day + datetime.timedelta(days=self.random.randint(1, 21))))
+        if vacations:
+            Vacation.objects.bulk_create(vacations)
+            rebuild_user_availability([user.pk])
+
+        self.counts['professionals'] += 1
+        self.counts['vacations'] += len(vacations)
+        return user
+
+    def create_referral(self, app, professional, practice_areas, referral_source, received_at):
+        from .models import Referral
+
+        household_size = self.random.randint(1, 6)
+        referral = Referral.objects.create(
+            professional=professional,
+            first_name=self.fake.first_name(),
+            last_name=self.fake.last_name(),
+            email=f'client-{self.run_id}-{self.counts["referrals"]}@{SYNTHETIC_EMAIL_DOMAIN}',
+            address=self.fake.address(),
+            zipcode=self.fake.zipcode(),
+            monthly_income=self.random.randint(500, 12000),
+            household_size=household_size,
+            income_status=self.random.choice(['low', 'moderate', 'high', None]),
+            practice_area=self.random.choice(practice_areas),
+            issue_description=self.fake.paragraph(),
+            contact_preference=self.random.choice(['0', '1']),
+            deadline_date=(received_at + datetime.timedelta(days=self.random.randint(7, 120))).date() if self.random.random() < 0.3 else None,
+            referred_by=referral_source,
+        )
+        Referral.objects.filter(pk=referral.pk).update(created_at=received_at)
+        app._models.Referral.objects.create(referral=referral)
+
+        self.counts['referrals'] += 1
+        return referral
+
+    def _backdate(self, workflow, since, when):
+        """ moves every row the workflow wrote after `since` (wall clock) to `when` """
+        from .models import WorkflowTransition
+
+        workflow.task_set.filter(created__gte=since).update(created=when, modified=when)
+        workflow.task_set.filter(completed__gte=since).update(completed=when, modified=when)
+        workflow.history.filter(history_date__gte=since).update(history_date=when, updated_at=when)
+        WorkflowTransition.objects.filter(workflow_type=ContentType.objects.get_for_model(workflow.__class__),
+                                          workflow_id=workflow.pk, timestamp__gte=since).update(timestamp=when)
+        workflow.__class__.objects.filter(pk=workflow.pk).update(updated_at=when)
+
+    def create_workflow(self, app, referral, received_at):
+        """ starts the referral's workflow and walks it through random human updates, backdating each step """
+
+        workflow_model = app._models.ReferralWorkflowState
+
+        since = timezone.now()
+        workflow = workflow_model.referral_received(referral=referral)
+        self._backdate(workflow, since, received_at)
+
+        when = received_at
+        for _ in range(self.random.randint(0, self.max_updates)):
+            task = workflow.task_set.scheduled().filter(type='human').first()
+            if not task:
+                break
+            when = self._random_moment(after=when)
+
+            since = timezone.now()
+            workflow.hours_worked = Decimal(self.random.choice([0, 0, 0.5, 1, 1.5, 2, 3, 5]))
+            workflow.notes = self.fake.sentence()
+            workflow.is_human_activity = True
+            task.finish(referral.professional)
+            task.start_next_tasks([workflow.get_node(self.random.choice(workflow.get_next_node_choices(task.name))[0])])
+            workflow.save()
+            self._backdate(workflow, since, when)
+            self.counts['workflow_updates'] += 1
+
+        return workflow
+
+    def create_notifications(self, app, workflow, templates, received_at):
+        from .models import ReferralNotifications
+
+        notifications = [
+            ReferralNotifications(referral_id=workflow.referral_id, template=self.random.choice(templates) if templates else None,
+                                  subject='Reminder to update', message=self.fake.paragraph(), status=self.random.choice(['SENT', 'DELIVERED']))
+            for _ in range(self.random.choice([0, 0, 1, 2, 3]))
+        ]
+        for notification in ReferralNotifications.objects.bulk_create(notifications):
+            ReferralNotifications.objects.filter(pk=notification.pk).update(created_at=self._random_moment(after=received_at))
+
+        self.counts['notifications'] += len(notifications)
+
+    def generate(self, professionals=10, referrals=20, stdout=None):
+        """
+            Creates `professionals` professionals per pluggable app with on average `referrals` referrals each.
+            Each professional is written in its own transaction.
+        """
+        from .models import EmailTemplates, ReferralSource
+        from .pluggable_app import PluggableApp
+        from . import reporting
+
+        referral_sources = [ReferralSource.objects.get_or_create(source=source)[0] for source in ('Web search', 'Friend or family', 'Court')]
+
+        for app in PluggableApp.get_apps():
+            practice_areas = self._practice_areas(app._models.Professional)
+            templates = list(EmailTemplates.objects.filter(workflow_type=ContentType.objects.get_for_model(app._models.ReferralWorkflowState)))
+
+            for index in range(professionals):
+                with transaction.atomic():
+                    with defer_profile_completeness():
+                        professional = self.create_professional(app, index, practice_areas)
+                    for _ in range(self.random.randint(0, 2 * referrals)):
+                        received_at = self._random_moment()
+                        referral = self.create_referral(app, professional, practice_areas, self.random.choice(referral_sources), received_at)
+                        workflow = self.create_workflow(app, referral, received_at)
+                        self.create_notifications(app, workflow, templates, received_at)
+
+                if stdout:
+                    stdout.write(f'{app.name}: {index + 1}/{professionals} professionals')
+
+        reporting.rebuild_rollups()
+        return self.counts
@@ -106,6 +106,53 @@ def initiate_missing_workflows():
     return True
 
 
+@shared_task(name="archive_cold_data")
+def archive_cold_data():
+    """ Moves history/notifications of long-closed referrals, old email API logs and celery results to the archive table """
+
+    from lowbono_app.archive import archive_cold_data as _archive_cold_data
+
+    counts = _archive_cold_data()
+    logger_joeflow.info("archived cold rows: %s" % counts)
+
+    return counts
+
+
+@shared_task(name="roll_over_availability")
+def roll_over_availability():
+    """ Moves the professionals' availability calendar window to the new day """
+
+    from lowbono_app.availability import roll_over_availability as _roll_over_availability
+
+    removed, added = _roll_over_availability()
+    logger_joeflow.info("availability rolled over: %d days removed, %d added" % (removed, added))
+
+    return removed, added
+
+
+@shared_task(name="snapshot_eligibility")
+def snapshot_eligibility():
+    """ Stores today's matching eligibility of every professional and practice area """
+
+    from lowbono_app.eligibility import take_snapshot
+
+    counts = take_snapshot()
+    logger_joeflow.info("eligibility snapshot taken: %d rows, %d dropped out, %d restored"
+                        % (sum(counts.values()), counts.get('dropped', 0), counts.get('restored', 0)))
+
+    return counts
+
+
+@shared_task(name="generate_image_renditions")
+def generate_image_renditions(source):
+    """ Resized WebP/JPEG renditions of an uploaded image, queued by lowbono_app.renditions on save """
+
+    from lowbono_app.renditions import generate_renditions
+
+    rendition = generate_renditions(source)
+    return rendition and rendition.renditions
+
+
 def anonymize_text(text):
     from presidio_analyzer import AnalyzerEngine
     from presidio_anonymizer import AnonymizerEngine
@@ -4,6 +4,7 @@ from django.conf import global_settings
 from django import template
 from lowbono_app import constants
 from lowbono_app import models
+from lowbono_app import renditions
 from django.utils import timezone, timesince
 from localflavor.us.models import STATE_CHOICES
 
@@ -66,3 +67,23 @@ def pretty_date_bulk_update_template(value):
             return value.strftime("%b %d, %Y")
         return "Recently Updated" if time_diff.days < 3 else f"{time_diff.days} days ago"
     return value
+
+
+@register.inclusion_tag('lowbono_app/responsive_image.html')
+def responsive_image(image, sizes='100vw', css_class='', alt='', fallback=''):
+    """ <picture> with WebP and JPEG srcsets of an image field's renditions, the uploaded file until they exist """
+    context = {'sizes': sizes, 'css_class': css_class, 'alt': alt, 'src': fallback}
+    if not image:
+        return context
+
+    context['src'] = image.url
+    data = renditions.get_renditions(image.name)
+    if data:
+        context.update({
+            'webp_srcset': renditions.srcset(data, 'webp', image.storage),
+            'jpeg_srcset': renditions.srcset(data, 'jpeg', image.storage),
+            'src': image.storage.url(data['renditions']['jpeg'][-1][1]),
+            'width': data['width'],
+            'height': data['height'],
+        })
+    return context
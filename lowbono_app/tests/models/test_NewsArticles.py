@@ -0,0 +1,42 @@
+from django.test import TestCase
+from django.utils import timezone
+
+from lowbono_app.models import NewsArticles
+
+
+class NewsArticlesTestCase(TestCase):
+
+    def test_save_WHEN_title_taken_EXPECT_next_free_suffix_in_one_query(self):
+        for _ in range(3):
+            NewsArticles.objects.create(title='Clinic Day', content='<p>x</p>')
+
+        cut = NewsArticles(title='Clinic Day', content='<p>x</p>')
+        with self.assertNumQueries(2):
+            cut.save()
+
+        expected = ['clinic-day', 'clinic-day-1', 'clinic-day-2', 'clinic-day-3']
+        actual = sorted(NewsArticles.objects.values_list('slug', flat=True))
+        self.assertEqual(expected, actual)
+
+    def test_save_WHEN_title_edited_EXPECT_slug_kept(self):
+        cut = NewsArticles.objects.create(title='Clinic Day', content='<p>x</p>')
+        cut.title = 'Clinic Day Moved'
+        cut.save()
+
+        self.assertEqual('clinic-day', NewsArticles.objects.get(pk=cut.pk).slug)
+
+    def test_keyset_page_WHEN_articles_share_created_at_EXPECT_every_article_once(self):
+        for i in range(5):
+            NewsArticles.objects.create(title=f'Article {i}', content='<p>x</p>', status='published')
+        NewsArticles.objects.update(created_at=timezone.now())
+        NewsArticles.objects.create(title='Draft', content='<p>x</p>')
+
+        seen, cursor = [], None
+        while True:
+            articles, cursor = NewsArticles.objects.published().keyset_page(cursor, size=2)
+            seen += [article.title for article in articles]
+            if not cursor:
+                break
+
+        expected = ['Article 4', 'Article 3', 'Article 2', 'Article 1', 'Article 0']
+        self.assertEqual(expected, seen)
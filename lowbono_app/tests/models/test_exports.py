@@ -0,0 +1,56 @@
+import json
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from lowbono_app import exports
+from lowbono_app.models import User, Referral, ReferralSource, ReferralNotifications, EmailTemplates
+from lowbono_lawyer.workflows import ReferralLawyerWorkflowState
+
+
+class ExportsTestCase(TestCase):
+
+    def setUp(self):
+        self.professional = User.objects.create_user('a1@dcerefer.org', 'password')
+        self.referral_source = ReferralSource.objects.create(source='DC Affordable Law Firm')
+        self.referrals = [
+            Referral.objects.create(professional=self.professional, email=f'c{i}@client.com', referred_by=self.referral_source)
+            for i in range(3)
+        ]
+        self.workflow = ReferralLawyerWorkflowState.referral_received(referral=self.referrals[0])
+
+    def test_referral_rows_WHERE_chunk_smaller_than_table_EXPECT_every_referral_once(self):
+        cut = list(exports.referral_rows(chunk_size=2))
+
+        expected = [r.id for r in self.referrals]
+        actual = [row['id'] for row in cut]
+        self.assertEqual(expected, actual)
+
+    def test_referral_rows_WHERE_hours_reported_EXPECT_cumulative_hours_and_notifications(self):
+        for hours in (2, 3):
+            self.workflow.hours_worked = hours
+            self.workflow.save()
+        template = EmailTemplates.objects.create(subject='Reminder', recipient='PROFESSIONAL_EMAIL',
+                                                 workflow_type=ContentType.objects.get_for_model(ReferralLawyerWorkflowState))
+        ReferralNotifications.objects.create(referral=self.referrals[0], template=template)
+
+        cut = next(exports.referral_rows(Referral.objects.filter(id=self.referrals[0].id)))
+
+        expected = ('lawyer', 'waiting_for_first_pre_consult_update', Decimal('5'), 1)
+        actual = (cut['workflow_type'], cut['workflow_state'], Decimal(cut['hours_worked_total']), cut['notifications_sent'])
+        self.assertEqual(expected, actual)
+
+    def test_iter_export_WHERE_csv_EXPECT_header_and_one_line_per_referral(self):
+        cut = ''.join(exports.iter_export('referrals', 'csv')).splitlines()
+
+        expected = [','.join(exports.REFERRAL_FIELDS), 4]
+        actual = [cut[0], len(cut)]
+        self.assertEqual(expected, actual)
+
+    def test_iter_export_WHERE_jsonl_EXPECT_engagement_reports_as_json_lines(self):
+        cut = [json.loads(line) for line in exports.iter_export('engagement_reports', 'jsonl')]
+
+        expected = {self.workflow.id}
+        actual = {row['workflow_id'] for row in cut}
+        self.assertEqual(expected, actual)
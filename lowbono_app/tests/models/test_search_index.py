@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from lowbono_app import search
+from lowbono_app.models import Language, Referral, User
+from lowbono_app.tests.utils import create_user, get_complete_kwargs, create_referral
+
+
+class SearchIndexTestCase(TestCase):
+
+    def setUp(self):
+        kwargs = get_complete_kwargs()
+        kwargs['user_kwargs']['firm_name'] = 'Quillfeather Legal'
+        self.user, _, _ = create_user('jdoe@example.com', password='testpass', **kwargs)
+        self.referral = create_referral(self.user)
+
+    def test_search_ids_WHERE_firm_name_matches_EXPECT_user_returned(self):
+        cut = search.search_ids('user', 'quillfeath')
+
+        expected = [self.user.id]
+        actual = cut
+        self.assertEqual(expected, actual)
+
+    def test_search_ids_WHERE_language_bio_updated_EXPECT_user_reindexed(self):
+        Language.objects.create(user=self.user, language='es', bio='<p>Abogada de inmigración</p>')
+
+        cut = search.search_ids('user', 'abogada')
+
+        expected = [self.user.id]
+        actual = cut
+        self.assertEqual(expected, actual)
+
+    def test_search_ids_WHERE_issue_description_matches_EXPECT_referral_returned(self):
+        self.referral.issue_description = 'Landlord withholding security deposit'
+        self.referral.save()
+
+        cut = search.search_ids('referral', 'deposit landlord')
+
+        expected = [self.referral.id]
+        actual = cut
+        self.assertEqual(expected, actual)
+
+    def test_search_ids_WHERE_referral_deleted_EXPECT_referral_not_returned(self):
+        query = self.referral.email
+        Referral.objects.filter(id=self.referral.id).delete()
+
+        cut = search.search_ids('referral', query)
+
+        expected = []
+        actual = cut
+        self.assertEqual(expected, actual)
+
+    def test_reindex_WHERE_index_cleared_EXPECT_documents_restored(self):
+        search.get_search_backend().clear('user')
+
+        search.reindex(kinds=['user'])
+        cut = search.search_ids('user', 'quillfeather')
+
+        expected = [self.user.id]
+        actual = cut
+        self.assertEqual(expected, actual)
+
+    def test_filter_by_search_WHERE_more_matches_than_rank_limit_EXPECT_all_matches_returned(self):
+        kwargs = get_complete_kwargs()
+        kwargs['user_kwargs']['firm_name'] = 'Quillfeather Partners'
+        other, _, _ = create_user('other@example.com', **kwargs)
+
+        with mock.patch.object(search, 'RANK_LIMIT', 1):
+            cut = search.filter_by_search(User.objects.all(), 'user', 'quillfeather')
+
+            expected = {self.user.id, other.id}
+            actual = set(cut.values_list('id', flat=True))
+            self.assertEqual(expected, actual)
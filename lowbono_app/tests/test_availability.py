@@ -0,0 +1,67 @@
+import datetime
+
+from django.test import TestCase
+
+from lowbono_app import availability
+from lowbono_app.models import UnavailableDay, Vacation
+from lowbono_app.tests.utils import create_user
+from lowbono_lawyer.models import Lawyer
+
+
+def days_from_today(days):
+    return datetime.date.today() + datetime.timedelta(days=days)
+
+
+class AvailabilityTestCase(TestCase):
+
+    def setUp(self):
+        self.user, self.lawyer, _ = create_user('jdoe@example.com', lawyer_kwargs={})
+
+    def test_vacation_WHEN_saved_and_deleted_EXPECT_unavailable_days_follow(self):
+        vacation = Vacation.objects.create(user=self.user, first_day=days_from_today(0), last_day=days_from_today(2))
+        self.assertEqual(set(self.user.unavailable_days.values_list('day', flat=True)), {days_from_today(0), days_from_today(1), days_from_today(2)})
+        self.assertTrue(self.user.is_on_vacation())
+
+        vacation.first_day, vacation.last_day = days_from_today(30), days_from_today(31)
+        vacation.save()
+        self.assertEqual(set(self.user.unavailable_days.values_list('day', flat=True)), {days_from_today(30), days_from_today(31)})
+        self.assertFalse(self.user.is_on_vacation())
+        self.assertNotIn(self.lawyer, Lawyer.objects.is_working_between(days_from_today(25), days_from_today(30)))
+        self.assertIn(self.lawyer, Lawyer.objects.is_working_between(days_from_today(32), days_from_today(40)))
+
+        vacation.delete()
+        self.assertFalse(self.user.unavailable_days.exists())
+
+    def test_is_working_WHERE_past_and_current_vacations_EXPECT_not_working_and_no_duplicates(self):
+        Vacation.objects.create(user=self.user, first_day=days_from_today(-10), last_day=days_from_today(-5))
+        Vacation.objects.create(user=self.user, first_day=days_from_today(-1), last_day=None)
+        other, other_lawyer, _ = create_user('other@example.com', lawyer_kwargs={})
+        Vacation.objects.create(user=other, first_day=days_from_today(-10), last_day=days_from_today(-5))
+
+        self.assertEqual(list(Lawyer.objects.is_working()), [other_lawyer])
+        self.assertEqual(list(Lawyer.objects.is_on_vacation()), [self.lawyer])
+        self.assertEqual(list(Lawyer.objects.is_working(days_from_today(-7))), [])
+
+    def test_get_availability_WHERE_many_users_and_days_EXPECT_one_query(self):
+        other, _, _ = create_user('other@example.com', lawyer_kwargs={})
+        Vacation.objects.create(user=self.user, first_day=days_from_today(1), last_day=days_from_today(2))
+        days = [days_from_today(offset) for offset in range(5)]
+
+        with self.assertNumQueries(1):
+            actual = availability.get_availability([self.user.pk, other.pk], days)
+
+        self.assertEqual(actual[self.user.pk], {days[0]: True, days[1]: False, days[2]: False, days[3]: True, days[4]: True})
+        self.assertTrue(all(actual[other.pk].values()))
+
+    def test_roll_over_availability_WHEN_next_day_EXPECT_window_moved(self):
+        today = datetime.date.today()
+        first, last = availability.get_window(today)
+        Vacation.objects.create(user=self.user, first_day=first, last_day=None)
+        self.assertEqual(UnavailableDay.objects.count(), (last - first).days + 1)
+
+        tomorrow = today + datetime.timedelta(days=1)
+        removed, added = availability.roll_over_availability(tomorrow)
+
+        self.assertEqual((removed, added), (1, 1))
+        self.assertEqual(list(availability.get_window(tomorrow)), [min(self.user.unavailable_days.values_list('day', flat=True)),
+                                                                  max(self.user.unavailable_days.values_list('day', flat=True))])
@@ -0,0 +1,81 @@
+import datetime
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from lowbono_app import eligibility
+from lowbono_app.models import EligibilitySnapshot, PracticeArea, Vacation
+from lowbono_app.tests.utils import create_user, create_practice_area, get_complete_kwargs
+from lowbono_lawyer.models import Lawyer, LawyerPracticeAreas
+from lowbono_mediator.models import Mediator
+
+
+class EligibilitySnapshotTestCase(TestCase):
+
+    def setUp(self):
+        self.today = datetime.date.today()
+        self.practice_area = create_practice_area()
+        self.user, self.lawyer, _ = self.create_professional('jdoe@example.com')
+
+    def create_professional(self, email):
+        user, lawyer, mediator = create_user(email, **get_complete_kwargs(self.practice_area))
+        Lawyer.objects.filter(pk=lawyer.pk).update(is_enabled=True)
+        LawyerPracticeAreas.objects.filter(lawyer=lawyer).update(approved=True)
+        return user, lawyer, mediator
+
+    def get_snapshot(self, user, model=Lawyer, day=None, practice_area=None):
+        return EligibilitySnapshot.objects.get(date=day or self.today, professional=user, practice_area=practice_area or self.practice_area,
+                                               professional_type=ContentType.objects.get_for_model(model))
+
+    def test_take_snapshot_WHERE_professionals_fail_checks_EXPECT_eligibility_matches_get_lawyer_matches(self):
+        on_vacation, _, _ = self.create_professional('vacation@example.com')
+        Vacation.objects.create(user=on_vacation, first_day=self.today, last_day=None)
+
+        eligibility.take_snapshot()
+
+        matched = set(Lawyer.objects.get_lawyer_matches(self.practice_area).values_list('user_id', flat=True))
+        eligible = set(EligibilitySnapshot.objects.filter(date=self.today, practice_area=self.practice_area, is_eligible=True,
+                                                          professional_type=ContentType.objects.get_for_model(Lawyer)).values_list('professional_id', flat=True))
+        self.assertEqual(eligible, matched)
+        self.assertEqual(eligible, {self.user.pk})
+        self.assertEqual(self.get_snapshot(on_vacation).reasons, eligibility.REASON_ON_VACATION)
+        self.assertEqual(self.get_snapshot(self.user, Mediator).reasons, ','.join([eligibility.REASON_DISABLED, eligibility.REASON_NOT_APPROVED]))
+
+    def test_take_snapshot_WHERE_approved_in_other_practice_area_only_EXPECT_not_matched_for_unapproved_one(self):
+        other_practice_area = PracticeArea.objects.exclude(pk=self.practice_area.pk).first()
+        LawyerPracticeAreas.objects.create(lawyer=self.lawyer, practicearea=other_practice_area, approved=False)
+
+        eligibility.take_snapshot()
+
+        expected = (set(), eligibility.REASON_NOT_APPROVED)
+        actual = (set(Lawyer.objects.get_lawyer_matches(other_practice_area).values_list('user_id', flat=True)),
+                  self.get_snapshot(self.user, practice_area=other_practice_area).reasons)
+        self.assertEqual(expected, actual)
+
+    def test_take_snapshot_WHEN_next_day_EXPECT_dropped_and_unlinked_pairs_marked(self):
+        other, other_lawyer, _ = self.create_professional('other@example.com')
+        yesterday = self.today - datetime.timedelta(days=1)
+        eligibility.take_snapshot(yesterday)
+        self.assertEqual(self.get_snapshot(self.user, day=yesterday).change, '')
+
+        Lawyer.objects.filter(pk=self.lawyer.pk).update(is_enabled=False)
+        other_lawyer.practice_areas.clear()
+        counts = eligibility.take_snapshot()
+
+        dropped = self.get_snapshot(self.user)
+        self.assertEqual((dropped.change, dropped.reasons, dropped.previous_reasons), (EligibilitySnapshot.CHANGE_DROPPED, eligibility.REASON_DISABLED, ''))
+        unlinked = self.get_snapshot(other)
+        self.assertEqual((unlinked.change, unlinked.reasons), (EligibilitySnapshot.CHANGE_DROPPED, eligibility.REASON_UNLINKED))
+        self.assertEqual(counts[EligibilitySnapshot.CHANGE_DROPPED], 2)
+        self.assertEqual(counts[EligibilitySnapshot.CHANGE_NEW], 1)  # `other` without practice area
+
+    def test_take_snapshot_WHERE_many_professionals_EXPECT_query_count_constant(self):
+        eligibility.take_snapshot()
+        with self.assertNumQueries(10) as few:
+            eligibility.take_snapshot()
+
+        for i in range(5):
+            self.create_professional(f'user{i}@example.com')
+        with self.assertNumQueries(len(few.captured_queries)):
+            eligibility.take_snapshot()
+        self.assertEqual(EligibilitySnapshot.objects.filter(date=self.today).count(), 12)
@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from lowbono.logging_handlers import AlertDeliveryHandler, AlertQueueListener, QueuedAlertHandler
+
+
+class RecordingAlertHandler(AlertDeliveryHandler):
+
+    def __init__(self, block=None):
+        super().__init__()
+        self.block = block
+        self.batches = []
+
+    def emit_batch(self, records, dropped=0):
+        if self.block:
+            self.block.wait()
+        self.batches.append(self.format_batch(records, dropped))
+
+
+def _record(message, name='joeflow_log'):
+    return logging.makeLogRecord({'name': name, 'levelno': logging.WARNING, 'levelname': 'WARNING', 'msg': message})
+
+
+class QueuedAlertHandlerTestCase(SimpleTestCase):
+
+    def test_emit_WHERE_delivery_blocked_and_queue_full_EXPECT_no_blocking_and_drops_reported(self):
+        block = threading.Event()
+        delivery = RecordingAlertHandler(block=block)
+        cut = QueuedAlertHandler(delivery, maxsize=2, batch_size=1, flush_interval=0.01)
+
+        start = time.monotonic()
+        for i in range(50):
+            cut.handle(_record(f'Redis not available, checkpoint {i}'))
+        elapsed = time.monotonic() - start
+
+        block.set()
+        cut.close()
+        self.assertLess(elapsed, 1)
+        self.assertIn('more alerts were dropped because the alert queue was full', '\n'.join(delivery.batches))
+
+    def test_listener_WHERE_records_arrive_together_EXPECT_one_batch(self):
+        delivery = RecordingAlertHandler()
+        cut = QueuedAlertHandler(delivery, batch_size=10, flush_interval=0.5)
+
+        for i in range(3):
+            cut.handle(_record(f'workflow started manually for referral ID: {i}'))
+        cut.close()
+
+        expected = ['workflow started manually for referral ID: 0\n\n'
+                    'workflow started manually for referral ID: 1\n\n'
+                    'workflow started manually for referral ID: 2']
+        actual = delivery.batches
+        self.assertEqual(expected, actual)
+
+    def test_deduplicate_WHERE_message_repeated_within_window_EXPECT_single_delivery_then_repeat_count(self):
+        now = [0]
+        cut = AlertQueueListener(None, RecordingAlertHandler(), dedup_window=60, clock=lambda: now[0])
+
+        first = cut.deduplicate([_record('Redis not available'), _record('Redis not available')])
+        now[0] = 30
+        during = cut.deduplicate([_record('Redis not available')])
+        now[0] = 61
+        after = cut.deduplicate([])
+
+        expected = (1, 0, [('Redis not available', 2)])
+        actual = (len(first), len(during), [(record.getMessage(), record.repeated) for record in after])
+        self.assertEqual(expected, actual)
+
+    def test_listener_WHERE_repeated_then_idle_or_stopped_EXPECT_repeat_count_delivered(self):
+        delivery = RecordingAlertHandler()
+        cut = QueuedAlertHandler(delivery, batch_size=10, flush_interval=0.05, dedup_window=0.1)
+
+        for _ in range(3):
+            cut.handle(_record('Redis not available'))
+        time.sleep(0.5)  # nothing else is logged, the window ends while the listener waits
+        cut.handle(_record('Celery queue is backed up'))
+        cut.handle(_record('Celery queue is backed up'))
+        cut.close()
+
+        expected = ['Redis not available', 'Redis not available (repeated 2 more times)',
+                    'Celery queue is backed up\n\nCelery queue is backed up (repeated 1 more times)']
+        actual = delivery.batches
+        self.assertEqual(expected, actual)
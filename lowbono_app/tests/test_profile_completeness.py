@@ -0,0 +1,56 @@
+from django.test import TestCase
+
+from lowbono_app.models import BarAdmission, User
+from lowbono_app.profile_completeness import defer_profile_completeness, refresh_profile_completeness
+from lowbono_app.tests.utils import create_user, create_practice_area, get_complete_kwargs
+from lowbono_lawyer.models import Lawyer
+from lowbono_mediator.models import Mediator
+
+
+class ProfileCompletenessTestCase(TestCase):
+
+    def setUp(self):
+        self.practice_area = create_practice_area()
+
+    def test_bar_admission_WHEN_deleted_EXPECT_lawyer_incomplete_without_saving_user(self):
+        user, lawyer, _ = create_user('jdoe@example.com', **get_complete_kwargs(self.practice_area))
+        self.assertTrue(Lawyer.objects.get(pk=lawyer.pk).is_profile_complete)
+
+        User.objects.filter(pk=user.pk).update(first_name='Changed')  # a re-saved user would write back 'John'
+        BarAdmission.objects.get(user=user).delete()
+
+        self.assertFalse(Lawyer.objects.get(pk=lawyer.pk).is_profile_complete)
+        self.assertEqual(User.objects.get(pk=user.pk).first_name, 'Changed')
+
+    def test_refresh_profile_completeness_WHERE_many_users_EXPECT_query_count_constant_and_only_changes_written(self):
+        users = [create_user(f'user{i}@example.com', **get_complete_kwargs(self.practice_area))[0] for i in range(5)]
+        Lawyer.objects.update(is_profile_complete=False)
+        Mediator.objects.filter(user=users[0]).update(is_profile_complete=False)
+
+        # one SELECT per model, one UPDATE per model with changes
+        with self.assertNumQueries(5):
+            changed = refresh_profile_completeness(users)
+
+        self.assertEqual(len(changed[Lawyer]), 5)
+        self.assertEqual(changed[Mediator], {users[0].mediator_user.pk: True})
+        self.assertNotIn(User, changed)
+        self.assertTrue(users[0].mediator_user.is_profile_complete)
+
+        with self.assertNumQueries(3):
+            self.assertEqual(refresh_profile_completeness(users), {})
+
+    def test_defer_profile_completeness_WHERE_practice_areas_added_EXPECT_one_refresh_on_exit(self):
+        kwargs = get_complete_kwargs(self.practice_area)
+        kwargs.pop('lawyer_kwargs')
+        kwargs.pop('mediator_kwargs')
+        lawyers = []
+        for i in range(3):
+            user, _, _ = create_user(f'user{i}@example.com', **kwargs)
+            lawyers.append(Lawyer.objects.create(user=user))
+
+        with defer_profile_completeness():
+            for lawyer in lawyers:
+                lawyer.practice_areas.add(self.practice_area)
+            self.assertFalse(Lawyer.objects.filter(is_profile_complete=True).exists())
+
+        self.assertEqual(Lawyer.objects.filter(is_profile_complete=True).count(), 3)
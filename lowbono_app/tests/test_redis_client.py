@@ -0,0 +1,82 @@
+import redis
+
+from django.test import SimpleTestCase
+
+from lowbono import redis_client
+from lowbono.redis_client import CircuitBreaker, CircuitOpenError, LatencyHistogram
+
+
+class FakePipeline:
+
+    def __init__(self, lists):
+        self.lists = lists
+        self.keys = []
+
+    def llen(self, key):
+        self.keys.append(key)
+
+    def execute(self):
+        return [self.lists.get(key, 0) for key in self.keys]
+
+
+class FakeRedis:
+
+    def __init__(self, lists):
+        self.lists = lists
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.lists)
+
+
+class RedisClientTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.breaker = redis_client.breaker
+        redis_client.breaker = CircuitBreaker()
+
+    def tearDown(self):
+        redis_client.breaker = self.breaker
+
+    def test_circuit_breaker_WHERE_failures_reach_threshold_EXPECT_fail_fast_then_trial_call(self):
+        now = [0]
+        cut = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: now[0])
+
+        def unavailable():
+            raise redis.ConnectionError()
+
+        for _ in range(2):
+            with self.assertRaises(redis.ConnectionError):
+                cut.call(unavailable)
+        with self.assertRaises(CircuitOpenError):
+            cut.call(lambda: 'PONG')
+        now[0] = 31
+
+        expected = ('half_open', 'PONG', 'closed')
+        actual = (cut.state, cut.call(lambda: 'PONG'), cut.state)
+        self.assertEqual(expected, actual)
+
+    def test_latency_histogram_WHERE_observed_EXPECT_cumulative_buckets(self):
+        cut = LatencyHistogram(buckets=(1, 10, float('inf')))
+        for latency in (0.5, 3, 4, 200):
+            cut.observe(latency)
+
+        expected = {'buckets': {'1': 1, '10': 3, '+Inf': 4}, 'count': 4, 'sum_ms': 207.5}
+        actual = cut.snapshot()
+        self.assertEqual(expected, actual)
+
+    def test_queue_depths_WHERE_priority_lists_EXPECT_summed_per_queue(self):
+        lists = {'celery': 4, 'celery\x06\x169': 1, 'llm_queue\x06\x163': 2}
+        redis_client.breaker.call = lambda func, client: func(FakeRedis(lists))
+
+        expected = {'celery': 5, 'llm_queue': 2}
+        actual = redis_client.queue_depths()
+        self.assertEqual(expected, actual)
+
+    def test_execute_WHERE_redis_unavailable_EXPECT_default_and_circuit_opens(self):
+        def unavailable(client):
+            raise redis.ConnectionError()
+
+        actual = [redis_client.execute(unavailable, default='fallback') for _ in range(4)]
+
+        self.assertEqual(['fallback'] * 4, actual)
+        self.assertEqual(CircuitBreaker.OPEN, redis_client.breaker.state)
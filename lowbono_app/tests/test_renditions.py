@@ -0,0 +1,82 @@
+import io
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.template import Context, Template
+from django.test import TestCase
+
+from PIL import Image
+
+from lowbono_app import directory_cache, renditions
+from lowbono_app.models import ImageRendition, User
+
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), (200, 30, 30, 128)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class RenditionsTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.storage = FileSystemStorage(location=root.name, base_url='/media/')
+        self.source = self.storage.save('headshots/jane.png', ContentFile(png(1000, 500)))
+
+    def test_generate_renditions_WHERE_image_uploaded_EXPECT_hashed_webp_and_jpeg_per_width(self):
+        cut = renditions.generate_renditions(self.source, storage=self.storage)
+
+        expected = [96, 192, 384, 768, 1000]
+        self.assertEqual(expected, [width for width, name in cut.renditions['webp']])
+        self.assertEqual(expected, [width for width, name in cut.renditions['jpeg']])
+        self.assertEqual((1000, 500), (cut.width, cut.height))
+
+        width, name = cut.renditions['jpeg'][0]
+        self.assertRegex(name, r'^renditions/headshots/jane-96w\.[0-9a-f]{12}\.jpeg$')
+        with self.storage.open(name) as f:
+            self.assertEqual(Image.open(f).size, (96, 48))
+
+        self.assertEqual(renditions.get_renditions(self.source)['renditions'], cut.renditions)
+        self.assertEqual(cut, renditions.generate_renditions(self.source, storage=self.storage))
+        self.assertEqual(ImageRendition.objects.count(), 1)
+
+    def test_generate_renditions_WHERE_generated_EXPECT_directory_fragments_invalidated(self):
+        before = directory_cache.get_directory_version()
+
+        renditions.generate_renditions(self.source, storage=self.storage)
+
+        self.assertNotEqual(before, directory_cache.get_directory_version())
+
+    def test_responsive_image_WHERE_renditions_exist_EXPECT_picture_with_srcsets(self):
+        user = User(photo=self.source)
+        user.photo.storage = self.storage
+        template = Template('{% load custom_template_filters %}{% responsive_image user.photo sizes="96px" css_class="avatar-img" alt="Jane" %}')
+
+        actual = template.render(Context({'user': user}))
+        self.assertNotIn('<picture>', actual)
+        self.assertIn('src="/media/headshots/jane.png"', actual)
+
+        renditions.generate_renditions(self.source, storage=self.storage)
+        actual = template.render(Context({'user': user}))
+        self.assertIn('<source type="image/webp" srcset="/media/renditions/headshots/jane-96w.', actual)
+        self.assertIn('.webp 1000w"', actual)
+        self.assertIn('sizes="96px"', actual)
+
+    def test_schedule_renditions_WHERE_photo_saved_EXPECT_task_queued_on_commit(self):
+        user = User.objects.create_user('jane@lowbono.org', 'testpassword')
+        user.photo = self.source
+
+        with mock.patch('lowbono_app.tasks.generate_image_renditions.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                user.save(update_fields=['last_login'])
+            delay.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                user.save()
+            delay.assert_called_once_with(self.source)
@@ -0,0 +1,56 @@
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from lowbono.storage import supabase
+from lowbono.storage.supabase import SupabaseCustomStorage
+
+
+class SupabaseCustomStorageTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        self.cut = SupabaseCustomStorage(base_url='https://example.supabase.co', bucket_name='lowbono-test', local_root=self.root.name)
+
+    def test_url_WHERE_called_EXPECT_public_url_built_without_client(self):
+        expected = 'https://example.supabase.co/storage/v1/object/public/lowbono-test/photos/a%20b.png'
+        actual = self.cut.url('photos/a b.png')
+        self.assertEqual(expected, actual)
+
+    def test_save_WHERE_file_chunked_EXPECT_open_returns_content_and_metadata_cached(self):
+        content = b'x' * (supabase.STORAGE_CHUNK_SIZE * 2 + 10)
+
+        name = self.cut.save('documents/report.pdf', ContentFile(content))
+        self.assertEqual(name, 'documents/report.pdf')
+
+        with self.cut.open(name) as f:
+            self.assertEqual(f.read(), content)
+
+        (self.cut.transport.root / name).unlink()  # existence and size are answered from the cache
+        self.assertTrue(self.cut.exists(name))
+        self.assertEqual(self.cut.size(name), len(content))
+
+    def test_save_WHERE_name_taken_EXPECT_available_name_used_and_delete_invalidates(self):
+        first = self.cut.save('avatar.png', ContentFile(b'first'))
+        second = self.cut.save('avatar.png', ContentFile(b'second'))
+        self.assertNotEqual(first, second)
+
+        self.cut.delete(first)
+        self.assertFalse(self.cut.exists(first))
+        self.assertTrue(self.cut.exists(second))
+        with self.assertRaises(FileNotFoundError):
+            self.cut.open(first)
+
+    def test_exists_WHERE_object_uploaded_elsewhere_after_miss_EXPECT_found(self):
+        self.assertFalse(self.cut.exists('shared.txt'))
+
+        other = SupabaseCustomStorage(base_url='https://example.supabase.co', bucket_name='lowbono-test', local_root=self.root.name)
+        other.transport.upload('shared.txt', [b'shared'])
+
+        expected = (True, 6)
+        actual = (self.cut.exists('shared.txt'), self.cut.size('shared.txt'))
+        self.assertEqual(expected, actual)
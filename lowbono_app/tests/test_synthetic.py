@@ -0,0 +1,29 @@
+from django.test import TestCase, override_settings
+
+from lowbono_app import benchmarks
+from lowbono_app.models import User, Referral, WorkflowTransition
+from lowbono_app.synthetic import SyntheticDataGenerator
+from joeflow.models import Task
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class SyntheticDataTestCase(TestCase):
+
+    def test_generate_WHERE_seeded_EXPECT_professionals_referrals_and_backdated_workflows(self):
+        cut = SyntheticDataGenerator(seed=1, days=90).generate(professionals=2, referrals=3)
+
+        expected = (2 * 2, cut['referrals'], cut['referrals'], set(Referral.objects.values_list('created_at', flat=True)))
+        actual = (User.objects.count(), Referral.objects.count(), WorkflowTransition.objects.filter(from_state='').count(),
+                  set(Task.objects.filter(name='referral_received').values_list('created', flat=True)))
+        self.assertEqual(expected, actual)
+
+    def test_run_benchmarks_WHERE_synthetic_data_EXPECT_json_results_per_benchmark(self):
+        SyntheticDataGenerator(seed=1, days=90).generate(professionals=2, referrals=5)
+        User.objects.create_superuser(email='c1@lowbono.org', password='testpassword')
+
+        cut = benchmarks.run_benchmarks(names=['user-matters', 'admin:lowbono_app_referral_changelist', 'task:'], iterations=2, warmup=0)
+
+        expected = {'user-matters', 'admin:lowbono_app_referral_changelist', 'task:send_scheduled_notification_emails', 'task:send_scheduled_eta_emails'}
+        actual = {name for name, result in cut['benchmarks'].items() if 'median_ms' in result}
+        self.assertEqual(expected, actual)
+        self.assertEqual([], [row for row in benchmarks.compare_results(cut, cut) if row[-1]])
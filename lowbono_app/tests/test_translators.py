@@ -0,0 +1,76 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from lowbono_app import directory_cache, models, translators
+
+
+class FlakyTranslator(translators.StubTranslator):
+    """ fails every batch containing `failing` """
+
+    failing = 'Family'
+
+    def translate_batch(self, texts, to_lang, from_lang='en'):
+        if self.failing in texts:
+            raise ConnectionError('translation service unavailable')
+        return super().translate_batch(texts, to_lang, from_lang)
+
+
+class TranslationPipelineTestCase(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        self.memory_path = os.path.join(self.root.name, 'memory.json')
+        models.PracticeAreaCategory.objects.create(id='family', title='Family', definition='Family matters')
+        models.PracticeAreaCategory.objects.create(id='housing', title='Housing', definition='Family matters')
+        self.values = ['Family', 'Family matters', 'Housing', 'Family matters']
+
+    def test_translate_missing_WHERE_memory_has_entries_EXPECT_only_new_unique_strings_translated_and_checkpointed(self):
+        with open(self.memory_path, 'w') as f:
+            json.dump({'Housing': 'Vivienda'}, f)
+        memory = translators.TranslationMemory(self.memory_path)
+
+        translated, failed = translators.translate_missing(memory, translators.StubTranslator(), 'es', self.values, workers=2, batch_size=1)
+
+        self.assertEqual((translated, failed), (2, 0))
+        with open(self.memory_path) as f:
+            saved = json.load(f)
+        self.assertEqual(saved, {'Housing': 'Vivienda', 'Family': '[es] Family', 'Family matters': '[es] Family matters'})
+
+    def test_translate_missing_WHERE_batch_fails_EXPECT_others_kept_and_rerun_resumes(self):
+        memory = translators.TranslationMemory(self.memory_path)
+
+        translated, failed = translators.translate_missing(memory, FlakyTranslator(), 'es', self.values, batch_size=1)
+        self.assertEqual((translated, failed), (2, 1))
+        self.assertNotIn('Family', translators.TranslationMemory(self.memory_path))
+
+        resumed = translators.TranslationMemory(self.memory_path)
+        translated, failed = translators.translate_missing(resumed, translators.StubTranslator(), 'es', self.values)
+        self.assertEqual((translated, failed), (1, 0))
+        self.assertEqual(resumed.get('Family'), '[es] Family')
+
+    def test_translate_models_WHERE_all_with_stub_translator_EXPECT_translation_columns_saved(self):
+        call_command('translate-models', '--all', '--translator', 'lowbono_app.translators.StubTranslator', '--memory', self.memory_path, stdout=io.StringIO())
+
+        category = models.PracticeAreaCategory.objects.get(id='housing')
+        self.assertEqual(category.title_es, '[es] Housing')
+        self.assertEqual(category.definition_es, '[es] Family matters')
+
+    def test_update_model_translations_WHERE_rows_updated_EXPECT_directory_cache_invalidated_once(self):
+        memory = translators.TranslationMemory(self.memory_path)
+        memory.add('Housing', 'Vivienda')
+        fields = [(models.PracticeAreaCategory, ['title'])]
+        before = directory_cache.get_directory_version()
+
+        updated = translators.update_model_translations(memory, 'es', fields)
+        after = directory_cache.get_directory_version()
+        unchanged = translators.update_model_translations(memory, 'es', fields)
+
+        expected = (models.PracticeAreaCategory.objects.filter(title='Housing').count(), True, 0, after)
+        actual = (updated, before != after, unchanged, directory_cache.get_directory_version())
+        self.assertEqual(expected, actual)
@@ -0,0 +1,48 @@
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from lowbono_app import admin
+from lowbono_app.models import PracticeArea, ProfileNote, User
+from lowbono_app.tests.utils import create_user, create_practice_area, create_referral, get_complete_kwargs
+from lowbono_lawyer.models import LawyerPracticeAreas
+
+
+class UserAdminChangeViewTestCase(TestCase):
+
+    def setUp(self):
+        self.staff_user = User.objects.create_superuser(email='c1@lowbono.org', password='testpassword')
+        self.client.login(email='c1@lowbono.org', password='testpassword')
+
+        practice_area = create_practice_area()
+        self.user, lawyer, _ = create_user('jdoe@example.com', **get_complete_kwargs(practice_area))
+        for other in PracticeArea.objects.exclude(pk=practice_area.pk)[:5]:
+            LawyerPracticeAreas.objects.create(lawyer=lawyer, practicearea=other)
+        for i in range(30):
+            create_referral(self.user, email=f'client{i}@example.com')
+            ProfileNote.objects.create(note=f'note {i}', admin=self.staff_user, professional=self.user)
+
+    def test_change_view_WHERE_busy_professional_EXPECT_bounded_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:lowbono_app_user_change', args=[self.user.pk]))
+        self.assertEqual(response.status_code, 200)
+        # was ~1300: permission content types, practice area choices per row, one user per note and referral
+        self.assertLess(len(queries), 40)
+        self.assertContains(response, 'Referrals (latest 20 of 30)')
+        self.assertContains(response, f'?professional__id__exact={self.user.pk}')
+        self.assertContains(response, 'client29@example.com')
+        self.assertNotContains(response, 'client9@example.com')
+
+    def test_profile_note_form_WHERE_shared_choices_EXPECT_staff_queried_once_per_request(self):
+        request = RequestFactory().get('/')
+        with self.assertNumQueries(1):
+            form_class = admin.with_shared_choices(request, admin.ProfileNoteInlineAdminForm)
+            admin.with_shared_choices(request, admin.ProfileNoteInlineAdminForm)
+
+        with self.assertNumQueries(0):
+            rendered = [str(form_class(prefix=f'note-{i}')['admin']) for i in range(5)]
+        self.assertIn(str(self.staff_user), rendered[-1])
+
+        form = form_class(data={'note': 'Called back', 'admin': self.staff_user.pk})
+        self.assertTrue(form.is_valid())
@@ -0,0 +1,66 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from lowbono_app import directory_cache
+from lowbono_app.tests.utils import create_user, get_complete_kwargs, create_vacation
+
+
+class DirectoryCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.user, self.lawyer, _ = create_user('jdoe@example.com', password='testpass', **get_complete_kwargs())
+        self.lawyer.is_enabled = True
+        self.lawyer.save()
+        self.client = Client()
+        self.client.login(email='jdoe@example.com', password='testpass')
+
+    def test_directory_version_WHERE_vacation_added_EXPECT_version_bumped(self):
+        before = directory_cache.get_directory_version()
+
+        create_vacation(self.user)
+
+        actual = directory_cache.get_directory_version()
+        self.assertNotEqual(before, actual)
+
+    def test_getProfessionalByPracticeAreas_WHERE_fragment_cached_EXPECT_no_professional_queries(self):
+        url = reverse('get-professional-by-practicearea') + '?lowbono_lawyer='
+        self.client.get(url, HTTP_HX_REQUEST='true')
+
+        with self.assertNumQueries(2):  # session and user lookups only
+            response = self.client.get(url, HTTP_HX_REQUEST='true')
+
+        self.assertContains(response, self.user.email)
+
+    def test_getProfessionalByPracticeAreas_WHERE_unknown_practice_areas_EXPECT_one_cache_key(self):
+        url = reverse('get-professional-by-practicearea')
+        self.client.get(url + '?lowbono_lawyer=999999', HTTP_HX_REQUEST='true')
+
+        with self.assertNumQueries(2 * 3):  # session and user lookups only
+            for value in ('abc', '999999', '1e3'):
+                response = self.client.get(url + '?lowbono_lawyer=' + value, HTTP_HX_REQUEST='true')
+                self.assertContains(response, self.user.email)
+
+    def test_getProfessionalByPracticeAreas_WHERE_etag_matches_EXPECT_304(self):
+        url = reverse('get-professional-by-practicearea') + '?lowbono_lawyer='
+        response = self.client.get(url, HTTP_HX_REQUEST='true')
+
+        cut = self.client.get(url, HTTP_HX_REQUEST='true', HTTP_IF_NONE_MATCH=response['ETag'])
+
+        expected = 304
+        actual = cut.status_code
+        self.assertEqual(expected, actual)
+
+    def test_getProfessionalByPracticeAreas_WHERE_professional_disabled_EXPECT_fragment_refreshed(self):
+        url = reverse('get-professional-by-practicearea') + '?lowbono_lawyer='
+        response = self.client.get(url, HTTP_HX_REQUEST='true')
+        self.assertContains(response, self.user.email)
+
+        self.lawyer.is_enabled = False
+        self.lawyer.save()
+
+        cut = self.client.get(url, HTTP_HX_REQUEST='true', HTTP_IF_NONE_MATCH=response['ETag'])
+
+        expected = 200
+        actual = cut.status_code
+        self.assertEqual(expected, actual)
+        self.assertNotContains(cut, self.user.email)
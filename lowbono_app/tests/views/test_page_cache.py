@@ -0,0 +1,46 @@
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from lowbono import page_cache
+from lowbono_app.models import NewsArticles, User
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class AnonymousPageCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.news = NewsArticles.objects.create(title='Court hours extended', content='<p>News</p>', status='published')
+        self.url = reverse('news_article_page', kwargs={'slug': self.news.slug})
+        self.client = Client()
+
+    def test_middleware_WHERE_anonymous_repeat_request_EXPECT_served_from_cache_with_304(self):
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+
+        expected = ('MISS', 'HIT', True)
+        actual = (first['X-Page-Cache'], second['X-Page-Cache'], first.content == second.content)
+        self.assertEqual(expected, actual)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('Cookie', second['Vary'])
+
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual({'hits': 2, 'misses': 1}, {key: value for key, value in page_cache.get_stats().items() if key != 'hit_ratio'})
+
+    def test_middleware_WHERE_news_saved_EXPECT_page_purged(self):
+        self.client.get(self.url)
+
+        self.news.content = '<p>Updated opening hours</p>'
+        self.news.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Updated opening hours')
+
+    def test_middleware_WHERE_logged_in_EXPECT_not_cached(self):
+        self.client.force_login(User.objects.create_superuser(email='c1@lowbono.org', password='testpassword'))
+
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from lowbono import profiling
+from lowbono_app.models import User
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_METRICS_TOKEN='secret',
+                   PROFILING_DEFAULT_BUDGET={'queries': 1000, 'duplicates': 1000, 'seconds': 60},
+                   PROFILING_BUDGETS={'dashboard': {'queries': 1}})
+class ProfilingTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_superuser(email='c1@lowbono.org', password='testpassword')
+        self.client = Client()
+        self.client.force_login(self.staff)
+
+    def test_middleware_WHERE_request_over_budget_EXPECT_aggregated_and_warning_logged(self):
+        with self.assertLogs('joeflow_log', level='WARNING') as logs:
+            self.client.get(reverse('dashboard'))
+            self.client.get(reverse('dashboard'))
+
+        cut = {entry['name']: entry for entry in profiling.get_stats()}['dashboard']
+        expected = ('request', 2, 2, True)
+        actual = (cut['kind'], cut['count'], cut['over_budget'], cut['queries'] > 0)
+        self.assertEqual(expected, actual)
+        self.assertIn('Profiling budget exceeded by request dashboard: queries', logs.output[0])
+        self.assertContains(self.client.get(reverse('profiling')), '<td>dashboard</td>')
+
+    def test_query_recorder_WHERE_same_query_repeated_EXPECT_duplicates_and_fingerprint(self):
+        recorder = profiling.QueryRecorder().start()
+        for _ in range(3):
+            list(User.objects.filter(id=self.staff.id))
+        list(User.objects.filter(id__in=[1, 2]))
+        list(User.objects.filter(id__in=[3, 4, 5]))
+        recorder.stop()
+
+        expected = (5, 2, [3, 2])
+        actual = (recorder.queries, recorder.duplicates, sorted(recorder.repeated_fingerprints().values(), reverse=True))
+        self.assertEqual(expected, actual)
+
+    def test_metrics_WHERE_token_or_anonymous_EXPECT_text_only_for_token(self):
+        with self.assertLogs('joeflow_log', level='WARNING'):
+            self.client.get(reverse('dashboard'))
+
+        cut = Client()
+        forbidden = cut.get(reverse('profiling-metrics'))
+        response = cut.get(reverse('profiling-metrics'), HTTP_AUTHORIZATION='Bearer secret')
+
+        wrong = cut.get(reverse('profiling-metrics'), HTTP_AUTHORIZATION='Bearer secreT')
+
+        expected = (403, 403, 200, True)
+        actual = (forbidden.status_code, wrong.status_code, response.status_code,
+                  'lowbono_profiled_runs_total{kind="request",name="dashboard"} 1' in response.content.decode())
+        self.assertEqual(expected, actual)
+
+    def test_record_WHERE_two_runs_EXPECT_counters_summed_and_reset(self):
+        first, second = profiling.QueryRecorder().start().stop(), profiling.QueryRecorder().start()
+        list(User.objects.filter(id=self.staff.id))
+        list(User.objects.filter(id=self.staff.id))
+        second.stop()
+
+        profiling.record(profiling.KIND_TASK, 'task', first)
+        profiling.record(profiling.KIND_TASK, 'task', second)
+
+        cut = profiling.get_stats()
+        sql = profiling.fingerprint(next(iter(second.statements))[0])
+        expected = (1, (2, 2, 2, 1, {sql: 2}))
+        actual = (len(cut), (cut[0]['count'], cut[0]['queries'], cut[0]['max_queries'], cut[0]['duplicates'], cut[0]['fingerprints']))
+        self.assertEqual(expected, actual)
+
+        profiling.reset_stats()
+        self.assertEqual([], profiling.get_stats())
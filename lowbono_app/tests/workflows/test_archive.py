@@ -0,0 +1,117 @@
+import datetime
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from django.utils import timezone
+
+from lowbono_app import archive, exports, reporting
+from lowbono_app.models import User, Referral, ReferralSource, ReferralNotifications, EmailTemplates, EmailAPILogs, ArchivedRecord, ReferralDailyRollup
+from lowbono_lawyer.workflows import ReferralLawyerWorkflowState
+
+
+class ArchiveTestCase(TestCase):
+
+    def setUp(self):
+        self.professional = User.objects.create_user('a1@dcerefer.org', 'password')
+        referral_source = ReferralSource.objects.create(source='DC Affordable Law Firm')
+        self.referral = Referral.objects.create(professional=self.professional, email='test1@client.com', referred_by=referral_source)
+        self.workflow = ReferralLawyerWorkflowState.referral_received(referral=self.referral)
+        template = EmailTemplates.objects.create(description='Reminder to update', subject='Reminder', recipient='PROFESSIONAL_EMAIL',
+                                                 workflow_type=ContentType.objects.get_for_model(ReferralLawyerWorkflowState))
+
+        self.workflow.hours_worked = 2
+        self.workflow.notes = 'first call'
+        self.workflow.save()
+        notification = ReferralNotifications.objects.create(referral=self.referral, template=template)
+        ReferralLawyerWorkflowState.objects.mark_notified([(self.workflow, notification)])
+
+    def _close_workflow(self):
+        task = self.workflow.task_set.scheduled().get(type='human')
+        task.finish()
+        task.start_next_tasks([ReferralLawyerWorkflowState.engagement_completed])
+        self.workflow.save()
+
+    def _archive_tomorrow(self):
+        return archive.archive_closed_referrals(timezone.now() + datetime.timedelta(days=1))
+
+    def test_archive_closed_referrals_WHERE_workflow_ongoing_EXPECT_nothing_archived(self):
+        cut = self._archive_tomorrow()
+
+        expected = {archive.KIND_WORKFLOW_HISTORY: 0, archive.KIND_NOTIFICATION: 0}
+        actual = cut
+        self.assertEqual(expected, actual)
+
+    def test_archive_closed_referrals_WHERE_workflow_closed_EXPECT_hot_rows_moved_and_workflow_kept(self):
+        self._close_workflow()
+        history_count = self.workflow.history.count()
+
+        cut = self._archive_tomorrow()
+
+        expected = {archive.KIND_WORKFLOW_HISTORY: history_count, archive.KIND_NOTIFICATION: 1}
+        actual = cut
+        self.assertEqual(expected, actual)
+        self.assertEqual((0, 0), (self.workflow.history.count(), ReferralNotifications.objects.count()))
+        self.assertTrue(ReferralLawyerWorkflowState.objects.filter(id=self.workflow.id).exists())
+
+    def test_get_timeline_WHERE_rows_archived_EXPECT_same_entries_and_hours(self):
+        self._close_workflow()
+        workflow = ReferralLawyerWorkflowState.objects.get(id=self.workflow.id)
+        expected = (workflow.get_timeline(audience='professional')[0], workflow.count_total_reported_hours())
+
+        self._archive_tomorrow()
+
+        workflow = ReferralLawyerWorkflowState.objects.get(id=self.workflow.id)
+        actual = (workflow.get_timeline(audience='professional')[0], workflow.count_total_reported_hours())
+        self.assertEqual(expected, actual)
+
+    def test_count_total_reported_hours_WHERE_rows_archived_EXPECT_one_query_and_same_type_of_reports(self):
+        self._close_workflow()
+        workflow = ReferralLawyerWorkflowState.objects.get(id=self.workflow.id)
+        expected = workflow.count_total_reported_hours()
+        self.assertIsInstance(workflow.get_all_engagement_reports(), list)
+
+        self._archive_tomorrow()
+
+        workflow = ReferralLawyerWorkflowState.objects.get(id=self.workflow.id)
+        with self.assertNumQueries(1):
+            actual = workflow.count_total_reported_hours()
+        self.assertEqual(expected, actual)
+        self.assertIsInstance(workflow.get_all_engagement_reports(), list)
+
+    def test_rebuild_rollups_and_exports_WHERE_rows_archived_EXPECT_same_hours(self):
+        self.workflow.hours_worked = 3
+        self.workflow.is_human_activity = True
+        self.workflow.save()
+        self._close_workflow()
+
+        def totals():
+            reporting.rebuild_rollups()
+            rollups = sorted(ReferralDailyRollup.objects.values_list('date', 'state', 'referrals_entered', 'hours_reported'))
+            referral = next(exports.referral_rows(Referral.objects.filter(pk=self.referral.pk)))
+            reports = sorted(exports.engagement_report_rows(), key=lambda row: row['history_id'])
+            return rollups, referral['hours_worked_total'], reports
+
+        expected = totals()
+        self._archive_tomorrow()
+        actual = totals()
+
+        self.assertEqual(expected, actual)
+        self.assertTrue(expected[1] > 0 and expected[2])
+
+        # moving the referral's rollups carries the archived hours along
+        self.referral.income_status = 'low'
+        self.referral.save()
+        moved = ReferralDailyRollup.objects.filter(hours_reported__gt=0).values_list('income_status', 'hours_reported')
+        self.assertEqual([('low', hours) for _, _, _, hours in expected[0] if hours], list(moved))
+
+    def test_archive_logs_WHERE_email_log_old_EXPECT_payload_compressed_and_restorable(self):
+        log = EmailAPILogs.objects.create(to_email='a1@dcerefer.org', html_content='<p>' + 'x' * 5000 + '</p>')
+
+        archive.archive_logs(timezone.now() + datetime.timedelta(days=1))
+
+        record = ArchivedRecord.objects.get(kind=archive.KIND_EMAIL_API_LOG)
+        cut = archive.restore(EmailAPILogs, archive.unpack(record.payload))
+        expected = (log.id, log.html_content, True)
+        actual = (cut.id, cut.html_content, len(record.payload) < 1000)
+        self.assertEqual(expected, actual)
+        self.assertFalse(EmailAPILogs.objects.exists())
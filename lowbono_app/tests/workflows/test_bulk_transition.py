@@ -0,0 +1,111 @@
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from lowbono_app.admin import BulkStatusUpdateForm
+from lowbono_app.models import User, Referral, ReferralSource
+from lowbono_lawyer.workflows import ReferralLawyerWorkflowState
+
+
+class BulkTransitionTestCase(TestCase):
+
+    def setUp(self):
+        self.professional = User.objects.create_user('a1@dcerefer.org', 'password')
+        self.referral_source = ReferralSource.objects.create(source='DC Affordable Law Firm')
+        self.workflows = [self._create_workflow(f'c{i}@client.com') for i in range(3)]
+
+    def _create_workflow(self, email):
+        referral = Referral.objects.create(professional=self.professional, email=email, referred_by=self.referral_source)
+        return ReferralLawyerWorkflowState.referral_received(referral=referral)
+
+    def test_bulk_transition_WHERE_valid_updates_EXPECT_new_states_hours_and_history(self):
+        updates = [(w.id, 'waiting_for_pre_consult_update', 1, 'called client') for w in self.workflows]
+
+        ReferralLawyerWorkflowState.objects.bulk_transition(updates, self.professional)
+
+        cut = ReferralLawyerWorkflowState.objects.get(id=self.workflows[0].id)
+        expected = ('waiting_for_pre_consult_update', 'waiting_for_pre_consult_update', Decimal('1'), 'called client', self.professional.id)
+        actual = (cut.current_task.name, cut.get_current_human_node_name(), cut.count_total_reported_hours(), cut.notes,
+                  cut.history.latest().history_user_id)
+        self.assertEqual(expected, actual)
+
+    def test_bulk_transition_WHERE_one_invalid_edge_EXPECT_nothing_applied(self):
+        updates = [(self.workflows[0].id, 'waiting_for_pre_consult_update', 1, ''),
+                   (self.workflows[1].id, 'referral_received', 1, '')]
+
+        with self.assertRaises(ValidationError) as cm:
+            ReferralLawyerWorkflowState.objects.bulk_transition(updates, self.professional)
+
+        expected = ([str(self.workflows[1].id)], {'waiting_for_first_pre_consult_update'})
+        actual = (list(cm.exception.message_dict), {w.get_current_human_node_name() for w in self.workflows})
+        self.assertEqual(expected, actual)
+
+    def test_bulk_update_endpoint_WHERE_other_professionals_matter_EXPECT_rejected(self):
+        other = User.objects.create_user('a2@dcerefer.org', 'password')
+        client = Client()
+        client.force_login(other)
+        payload = {'app': 'lowbono_lawyer', 'updates': [{'workflow_id': self.workflows[0].id, 'next_node': 'engagement_completed'}]}
+
+        cut = client.post(reverse('matters-bulk-update'), json.dumps(payload), content_type='application/json')
+
+        expected = (400, {str(self.workflows[0].id): ['Matter not found.']})
+        actual = (cut.status_code, cut.json()['errors'])
+        self.assertEqual(expected, actual)
+
+    def test_bulk_update_endpoint_WHERE_form_post_EXPECT_all_matters_updated_in_one_request(self):
+        client = Client()
+        client.force_login(self.professional)
+        data = {'app': 'lowbono_lawyer', 'workflow_id': [w.id for w in self.workflows]}
+        for w in self.workflows:
+            data[f'next_node_{w.id}'] = 'closed_without_consult'
+
+        client.post(reverse('matters-bulk-update'), data)
+
+        expected = {'closed_without_consult'}
+        actual = {w.current_task.name for w in ReferralLawyerWorkflowState.objects.all()}
+        self.assertEqual(expected, actual)
+
+    def test_bulk_transition_WHERE_hours_not_finite_or_too_large_EXPECT_per_matter_errors(self):
+        updates = [(w.id, 'waiting_for_pre_consult_update', hours, '') for w, hours in zip(self.workflows, ['NaN', 'Infinity', 1e10])]
+
+        with self.assertRaises(ValidationError) as cm:
+            ReferralLawyerWorkflowState.objects.bulk_transition(updates, self.professional)
+
+        expected = {str(w.id) for w in self.workflows}
+        actual = {workflow_id for workflow_id, errors in cm.exception.message_dict.items() if 'non-negative' in errors[0]}
+        self.assertEqual(expected, actual)
+
+    def test_bulk_transition_WHERE_low_income_engaged_at_standard_rates_without_reason_EXPECT_rejected(self):
+        Referral.objects.filter(pk=self.workflows[0].referral_id).update(income_status='low')
+        updates = [(self.workflows[0].id, 'engagement_completed', 1, '', False, None)]
+
+        with self.assertRaises(ValidationError) as cm:
+            ReferralLawyerWorkflowState.objects.bulk_transition(updates, self.professional)
+        ReferralLawyerWorkflowState.objects.bulk_transition([(*updates[0][:4], False, 'client asked for it')], self.professional)
+
+        expected = ([str(self.workflows[0].id)], (False, 'client asked for it'))
+        cut = ReferralLawyerWorkflowState.objects.get(id=self.workflows[0].id)
+        actual = (list(cm.exception.message_dict), (cut.is_income_eligible, cut.ineligible_reason))
+        self.assertEqual(expected, actual)
+
+    def test_bulk_update_endpoint_WHERE_update_not_an_object_EXPECT_400(self):
+        client = Client()
+        client.force_login(self.professional)
+        payload = {'app': 'lowbono_lawyer', 'updates': [self.workflows[0].id]}
+
+        cut = client.post(reverse('matters-bulk-update'), json.dumps(payload), content_type='application/json')
+
+        expected = (400, {'__all__': ['Invalid updates.']})
+        actual = (cut.status_code, cut.json()['errors'])
+        self.assertEqual(expected, actual)
+
+    def test_BulkStatusUpdateForm_WHERE_lawyer_workflows_only_EXPECT_lawyer_nodes_only(self):
+        cut = BulkStatusUpdateForm(workflow_models=(ReferralLawyerWorkflowState,))
+
+        expected = (['next_node_referrallawyerworkflowstate'], dict(ReferralLawyerWorkflowState.pretty_nodes))
+        actual = ([name for name in cut.fields if name.startswith('next_node')],
+                  dict(cut.fields['next_node_referrallawyerworkflowstate'].choices))
+        self.assertEqual(expected, actual)
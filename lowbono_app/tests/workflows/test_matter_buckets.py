@@ -0,0 +1,81 @@
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from lowbono_app.models import User, Referral, ReferralSource
+from lowbono_lawyer.workflows import ReferralLawyerWorkflowState
+
+
+class MatterBucketsTestCase(TestCase):
+
+    def setUp(self):
+        self.professional = User.objects.create_user('a1@dcerefer.org', 'password')
+        self.referral_source = ReferralSource.objects.create(source='DC Affordable Law Firm')
+
+    def _create_workflow(self, email='test1@client.com'):
+        referral = Referral.objects.create(professional=self.professional, email=email, referred_by=self.referral_source)
+        return ReferralLawyerWorkflowState.referral_received(referral=referral)
+
+    def _close_workflow(self, workflow):
+        task = workflow.task_set.scheduled().get(type='human')
+        task.finish()
+        task.start_next_tasks([ReferralLawyerWorkflowState.engagement_completed])
+        workflow.save()
+
+    def _mark_overdue(self, workflow):
+        workflow.is_human_activity = False
+        workflow.save()
+
+    def test_get_matter_bucket_counts_WHERE_mixed_states_EXPECT_counts_per_bucket(self):
+        self._mark_overdue(self._create_workflow('c1@client.com'))
+        self._create_workflow('c2@client.com')
+        self._create_workflow('c3@client.com')
+        self._close_workflow(self._create_workflow('c4@client.com'))
+
+        cut = ReferralLawyerWorkflowState.objects.get_matter_bucket_counts(self.professional.id)
+
+        expected = {'overdue': 1, 'pending': 2, 'closed': 1}
+        actual = cut
+        self.assertEqual(expected, actual)
+
+    def test_get_matter_bucket_page_WHERE_more_than_limit_EXPECT_keyset_pages(self):
+        workflows = [self._create_workflow(f'c{i}@client.com') for i in range(5)]
+
+        first_page, cursor = ReferralLawyerWorkflowState.objects.get_matter_bucket_page(self.professional.id, 'pending', limit=3)
+        second_page, last_cursor = ReferralLawyerWorkflowState.objects.get_matter_bucket_page(self.professional.id, 'pending', before=cursor, limit=3)
+
+        expected = [w.id for w in reversed(workflows)]
+        actual = [w.id for w in first_page + second_page]
+        self.assertEqual(expected, actual)
+        self.assertIsNone(last_cursor)
+
+    def test_user_matters_view_WHERE_many_matters_EXPECT_constant_queries(self):
+        for i in range(3):
+            self._create_workflow(f'c{i}@client.com')
+        client = Client()
+        client.force_login(self.professional)
+        url = reverse('user-matters', args=[self.professional.id])
+        client.get(url)
+
+        with self.assertNumQueries(10):
+            client.get(url)
+
+        for i in range(3, 8):
+            self._create_workflow(f'c{i}@client.com')
+
+        with self.assertNumQueries(10):
+            response = client.get(url)
+
+        self.assertContains(response, 'Pending Matters (Lawyer)')
+
+    def test_user_matters_view_WHERE_cursors_given_EXPECT_invalid_ignored_and_other_cursors_kept(self):
+        workflows = [self._create_workflow(f'c{i}@client.com') for i in range(12)]
+        client = Client()
+        client.force_login(self.professional)
+        url = reverse('user-matters', args=[self.professional.id])
+
+        response = client.get(url + '?lowbono_lawyer_overdue_before=abc&lowbono_mediator_pending_before=7')
+
+        self.assertEqual(response.status_code, 200)
+        expected = f'lowbono_lawyer_pending_before={workflows[2].id}'
+        self.assertContains(response, expected)
+        self.assertContains(response, 'lowbono_mediator_pending_before=7&amp;' + expected)
@@ -0,0 +1,45 @@
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from lowbono_app.models import User, Referral, ReferralSource, ReferralNotifications, EmailTemplates
+from lowbono_lawyer.workflows import ReferralLawyerWorkflowState
+
+
+class NotificationMarkingTestCase(TestCase):
+
+    def setUp(self):
+        self.professional = User.objects.create_user('a1@dcerefer.org', 'password')
+        self.referral_source = ReferralSource.objects.create(source='DC Affordable Law Firm')
+        self.template = EmailTemplates.objects.create(subject='Reminder', recipient='PROFESSIONAL_EMAIL',
+                                                      workflow_type=ContentType.objects.get_for_model(ReferralLawyerWorkflowState))
+
+    def _create_notified_workflows(self, count):
+        pairs = []
+        for i in range(count):
+            referral = Referral.objects.create(professional=self.professional, email=f'c{i}@client.com', referred_by=self.referral_source)
+            workflow = ReferralLawyerWorkflowState.referral_received(referral=referral)
+            pairs.append((workflow, ReferralNotifications.objects.create(referral=referral, template=self.template)))
+        return pairs
+
+    def test_mark_notified_WHERE_batch_grows_EXPECT_constant_queries(self):
+        pairs = self._create_notified_workflows(1)
+        with self.assertNumQueries(2):
+            ReferralLawyerWorkflowState.objects.mark_notified(pairs)
+
+        pairs = self._create_notified_workflows(5)
+        with self.assertNumQueries(2):
+            ReferralLawyerWorkflowState.objects.mark_notified(pairs)
+
+    def test_mark_notified_WHERE_workflow_reported_hours_EXPECT_machine_state_and_no_history_row(self):
+        [(workflow, notification)] = self._create_notified_workflows(1)
+        workflow.hours_worked = 3
+        workflow.save()
+        history_count = workflow.history.count()
+
+        ReferralLawyerWorkflowState.objects.mark_notified([(workflow, notification)])
+
+        cut = ReferralLawyerWorkflowState.objects.get(id=workflow.id)
+        expected = (notification.id, False, True, 0, workflow.task_set.latest().id, history_count)
+        actual = (cut.notification_id, cut.is_human_activity, cut.is_overdue, cut.hours_worked, cut.current_task_id, workflow.history.count())
+        self.assertEqual(expected, actual)
+        self.assertEqual(notification.id, workflow.notification_id)
@@ -0,0 +1,94 @@
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, RequestFactory
+from django.utils import timezone
+
+from lowbono_app.models import User, Referral, ReferralSource, ReferralNotifications, EmailTemplates
+from lowbono_app.views import ReferralDetailView
+from lowbono_lawyer.workflows import ReferralLawyerWorkflowState
+
+
+class ReferralTimelineTestCase(TestCase):
+
+    def setUp(self):
+        self.professional = User.objects.create_user('a1@dcerefer.org', 'password')
+        referral_source = ReferralSource.objects.create(source='DC Affordable Law Firm')
+        self.referral = Referral.objects.create(professional=self.professional, email='test1@client.com', referred_by=referral_source)
+        self.workflow = ReferralLawyerWorkflowState.referral_received(referral=self.referral)
+        self.template = EmailTemplates.objects.create(
+            description='Reminder to update', subject='Reminder', recipient='PROFESSIONAL_EMAIL',
+            workflow_type=ContentType.objects.get_for_model(ReferralLawyerWorkflowState))
+
+    def _report(self, hours, notes):
+        self.workflow.hours_worked = hours
+        self.workflow.notes = notes
+        self.workflow.is_human_activity = True
+        self.workflow.save()
+
+    def _notify(self):
+        return ReferralNotifications.objects.create(referral=self.referral, template=self.template)
+
+    def test_get_timeline_WHERE_reports_and_notifications_EXPECT_merged_newest_first(self):
+        self._report(2, 'first call')
+        self._notify()
+        self._report(3, 'second call')
+
+        with self.assertNumQueries(1):
+            cut, next_cursor = self.workflow.get_timeline(audience='professional')
+
+        expected = [('status_report', 'second call'), ('notification', 'Reminder to update'), ('status_report', 'first call')]
+        actual = [(entry['type'], entry['notes'] or entry['email_type']) for entry in cut]
+        self.assertEqual(expected, actual)
+        self.assertIsNone(next_cursor)
+
+    def test_get_timeline_WHERE_more_than_limit_EXPECT_next_page_continues_from_cursor(self):
+        for i in range(3):
+            self._notify()
+
+        first_page, cursor = self.workflow.get_timeline(kinds=('notification',), limit=2)
+        second_page, last_cursor = self.workflow.get_timeline(kinds=('notification',), before=cursor, limit=2)
+
+        expected = list(ReferralNotifications.objects.order_by('-created_at').values_list('id', flat=True))
+        actual = [entry['id'] for entry in first_page + second_page]
+        self.assertEqual(expected, actual)
+        self.assertIsNone(last_cursor)
+
+    def test_get_timeline_WHERE_status_report_EXPECT_pretty_task_name(self):
+        self._report(1, 'call')
+
+        cut, _ = self.workflow.get_timeline(kinds=('status_report',))
+
+        expected = 'Waiting for First Update'
+        actual = cut[0]['report_status']
+        self.assertEqual(expected, actual)
+
+    def test_get_timeline_WHERE_entries_share_timestamp_across_pages_EXPECT_none_skipped(self):
+        self._report(2, 'call')
+        for i in range(3):
+            self._notify()
+        now = timezone.now()
+        ReferralNotifications.objects.update(created_at=now)
+        self.workflow.history.update(updated_at=now)
+
+        entries, cursor = [], None
+        while True:
+            page, cursor = self.workflow.get_timeline(before=cursor, limit=1)
+            entries += [(entry['type'], entry['id']) for entry in page]
+            if cursor is None:
+                break
+
+        expected = [(entry['type'], entry['id']) for entry in self.workflow.get_timeline()[0]]
+        actual = entries
+        self.assertEqual(expected, actual)
+        self.assertEqual(len(set(actual)), self.workflow.history.filter(is_human_activity=True, current_task__isnull=False).count() + 3)
+
+    def test_referral_detail_timeline_page_WHERE_cursor_invalid_EXPECT_first_page(self):
+        notification = self._notify()
+        view = ReferralDetailView()
+
+        for cursor in ('2024-13-01T00:00~notification~1', 'abc', '2024-01-01T00:00~other~1'):
+            view.request = RequestFactory().get('/', {'notifications_before': cursor})
+            cut, _ = view._get_timeline_page(self.workflow, 'notifications_before', kinds=('notification',))
+
+            expected = [notification.id]
+            actual = [entry['id'] for entry in cut]
+            self.assertEqual(expected, actual)
@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+from django.test import TestCase, Client, RequestFactory
+from django.urls import reverse, resolve
+
+from lowbono_app.models import User, Referral, ReferralSource
+from lowbono_lawyer.workflows import ReferralLawyerWorkflowState
+
+
+class UpdateFormContextTestCase(TestCase):
+
+    def setUp(self):
+        self.professional = User.objects.create_user('a1@dcerefer.org', 'password')
+        referral_source = ReferralSource.objects.create(source='DC Affordable Law Firm')
+        referral = Referral.objects.create(professional=self.professional, email='test1@client.com', referred_by=referral_source)
+        self.workflow = ReferralLawyerWorkflowState.referral_received(referral=referral)
+        self.workflow.hours_worked = 2
+        self.workflow.is_human_activity = True
+        self.workflow.save()
+
+        self.task = self.workflow.task_set.scheduled().get(type='human')
+        self.url = reverse(f"{self.workflow.get_url_namespace()}:{self.task.name}", kwargs={'pk': self.task.pk})
+        self.client = Client()
+        self.client.force_login(self.professional)
+
+    def test_with_update_form_context_WHERE_history_reported_EXPECT_same_values_as_instance_methods(self):
+        workflow = ReferralLawyerWorkflowState.objects.get(id=self.workflow.id)
+
+        cut = ReferralLawyerWorkflowState.objects.with_update_form_context().get(id=self.workflow.id)
+
+        expected = (workflow.count_total_reported_hours(), workflow.human_last_updated_at(), workflow.dynamic_form_node_choices())
+        actual = (cut.count_total_reported_hours(), cut.human_last_updated_at(), cut.get_next_node_choices(self.task.name))
+        self.assertEqual(expected, actual)
+
+    def test_update_form_WHERE_get_EXPECT_task_and_workflow_loaded_once(self):
+        match = resolve(self.url)
+        request = RequestFactory().get(self.url)
+        request.user = self.professional
+
+        with self.assertNumQueries(2):  # task, workflow context
+            response = match.func(request, **match.kwargs)  # unrendered TemplateResponse, context built
+
+        expected = (200, f"Cumulative recorded hours: {self.workflow.count_total_reported_hours()}")
+        actual = (response.status_code, response.context_data['form'].fields['hours_worked'].help_text)
+        self.assertEqual(expected, actual)
+
+    def test_update_form_WHERE_post_EXPECT_workflow_moves_to_chosen_node(self):
+        self.client.post(self.url, {'user_node_choice': 'waiting_for_pre_consult_update', 'hours_worked': 1, 'notes': 'called'})
+
+        cut = ReferralLawyerWorkflowState.objects.get(id=self.workflow.id)
+        expected = ('waiting_for_pre_consult_update', Decimal('3'), 'called')
+        actual = (cut.get_current_human_node_name(), cut.count_total_reported_hours(), cut.notes)
+        self.assertEqual(expected, actual)
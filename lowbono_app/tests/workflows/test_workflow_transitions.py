@@ -0,0 +1,66 @@
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from lowbono_app import transitions
+from lowbono_app.models import User, Referral, ReferralSource, WorkflowTransition
+from lowbono_lawyer.workflows import ReferralLawyerWorkflowState
+
+
+class WorkflowTransitionsTestCase(TestCase):
+
+    def setUp(self):
+        self.professional = User.objects.create_user('a1@dcerefer.org', 'password')
+        referral_source = ReferralSource.objects.create(source='DC Affordable Law Firm')
+        referral = Referral.objects.create(professional=self.professional, email='test1@client.com', referred_by=referral_source)
+        self.workflow = ReferralLawyerWorkflowState.referral_received(referral=referral)
+
+    def _close_workflow(self):
+        task = self.workflow.task_set.scheduled().get(type='human')
+        task.finish(self.professional)
+        task.start_next_tasks([ReferralLawyerWorkflowState.engagement_completed])
+        self.workflow.save()
+
+    def test_record_transition_WHERE_human_task_completed_EXPECT_actor_and_states_logged(self):
+        self._close_workflow()
+
+        cut = WorkflowTransition.objects.for_workflow(self.workflow).latest('timestamp')
+
+        expected = ('waiting_for_first_pre_consult_update', 'engagement_completed', self.professional.id, True)
+        actual = (cut.from_state, cut.to_state, cut.actor_id, cut.is_human)
+        self.assertEqual(expected, actual)
+
+    def test_as_of_WHERE_closed_after_moment_EXPECT_state_at_that_moment(self):
+        moment = timezone.now()
+        self._close_workflow()
+
+        cut = WorkflowTransition.objects.as_of(moment)
+
+        expected = ['waiting_for_first_pre_consult_update']
+        actual = [t.to_state for t in cut]
+        self.assertEqual(expected, actual)
+        self.assertEqual('engagement_completed', self.workflow.get_state_as_of(timezone.now()))
+
+    def test_time_in_state_WHERE_transitions_spaced_EXPECT_durations_between_them(self):
+        self._close_workflow()
+        start = timezone.now() - datetime.timedelta(days=3)
+        for days, transition in enumerate(WorkflowTransition.objects.for_workflow(self.workflow).order_by('id')):
+            WorkflowTransition.objects.filter(id=transition.id).update(timestamp=start + datetime.timedelta(days=days))
+
+        cut = self.workflow.get_time_in_states(until=start + datetime.timedelta(days=5))
+
+        expected = {'referral_received': datetime.timedelta(days=1), 'waiting_for_first_pre_consult_update': datetime.timedelta(days=1),
+                    'engagement_completed': datetime.timedelta(days=3)}
+        actual = cut
+        self.assertEqual(expected, actual)
+
+    def test_backfill_transitions_WHERE_log_cleared_EXPECT_rebuilt_once(self):
+        expected = list(WorkflowTransition.objects.order_by('id').values_list('from_state', 'to_state'))
+        WorkflowTransition.objects.all().delete()
+
+        transitions.backfill_transitions()
+        transitions.backfill_transitions()
+
+        actual = list(WorkflowTransition.objects.order_by('id').values_list('from_state', 'to_state'))
+        self.assertEqual(expected, actual)
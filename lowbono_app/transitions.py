@@ -0,0 +1,66 @@
+"""
+    Workflow transition log.
+
+    Every joeflow task start appends one `WorkflowTransition` row (previous state, new state,
+    the user who completed the previous task, timestamp), so a workflow's state at any moment
+    and the time it spent in each state are answered from that indexed table rather than by
+    walking tasks and history snapshots.
+"""
+from django.contrib.contenttypes.models import ContentType
+
+from joeflow.typing import HUMAN
+
+
+def _transition(task, previous_task):
+    from .models import WorkflowTransition
+
+    return WorkflowTransition(
+        workflow_type_id=task.content_type_id,
+        workflow_id=task._workflow_id,
+        task=task,
+        from_state=previous_task.name if previous_task else '',
+        to_state=task.name,
+        actor_id=previous_task.completed_by_user_id if previous_task else None,
+        is_human=bool(previous_task and previous_task.type == HUMAN),
+        timestamp=task.created,
+    )
+
+
+def record_transition(task, previous_task=None):
+    """ appends the transition into `task`'s state, coming from `previous_task` (None for a workflow's first task) """
+
+    transition = _transition(task, previous_task)
+    transition.save()
+    return transition
+
+
+def backfill_transitions(batch_size=1000):
+    """
+        Appends transitions for tasks started before the log existed, replaying each workflow's tasks in order.
+        Tasks that already have a transition are skipped, so the backfill can be re-run safely.
+        Returns the number of transitions written.
+    """
+    from joeflow.models import Task
+    from .models import WorkflowTransition
+    from .pluggable_app import PluggableApp
+
+    written = 0
+    for app in PluggableApp.get_apps():
+        workflow_type = ContentType.objects.get_for_model(app._models.ReferralWorkflowState)
+        logged = set(WorkflowTransition.objects.filter(workflow_type=workflow_type, task__isnull=False).values_list('task_id', flat=True))
+
+        pending, previous_task = [], None
+        for task in Task.objects.filter(content_type=workflow_type).order_by('_workflow_id', 'id').iterator(chunk_size=batch_size):
+            if previous_task and previous_task._workflow_id != task._workflow_id:
+                previous_task = None
+            if task.id not in logged:
+                pending.append(_transition(task, previous_task))
+            previous_task = task
+
+            if len(pending) >= batch_size:
+                written += len(WorkflowTransition.objects.bulk_create(pending))
+                pending = []
+
+        written += len(WorkflowTransition.objects.bulk_create(pending))
+
+    return written
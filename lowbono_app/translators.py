@@ -0,0 +1,212 @@
+"""
+    Machine translation of modeltranslation fields, used by the `translate-models` command.
+
+    Source values are streamed from every registered model, deduplicated against a persistent
+    translation memory (a JSON file of source string -> translation), and only the missing
+    strings are sent to the translator, in batches, by a bounded thread pool. The memory is
+    checkpointed to disk as batches complete, so an interrupted run resumes where it stopped.
+
+    The translator is pluggable (settings.MODEL_TRANSLATOR): GoogleWebTranslator calls the
+    translate.google.com mobile page through a pooled session, StubTranslator translates
+    locally for tests and offline runs.
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+logger_joeflow = logging.getLogger('joeflow_log')
+
+TRANSLATION_WORKERS = 4
+TRANSLATION_BATCH_SIZE = 20
+TRANSLATION_TIMEOUT = (5, 30)
+UPDATE_BATCH_SIZE = 500
+
+
+class BaseTranslator:
+    """ translates plain strings; subclasses implement `translate`, or `translate_batch` when the service takes several at once """
+
+    def translate(self, text, to_lang, from_lang='en'):
+        raise NotImplementedError
+
+    def translate_batch(self, texts, to_lang, from_lang='en'):
+        return [self.translate(text, to_lang, from_lang) for text in texts]
+
+
+class GoogleWebTranslator(BaseTranslator):
+    """ the translate.google.com mobile page, parsed like lowbono_app.utils.translate_using_google did, over one pooled session """
+
+    url = 'https://translate.google.com/m'
+    headers = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X x.y; rv:42.0) Gecko/20100101 Firefox/42.0"}
+    result_expr = re.compile(r'(?s)class="(?:t0|result-container)">(.*?)<')
+
+    def __init__(self, pool_size=TRANSLATION_WORKERS):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=2)
+        self.session.mount('https://', adapter)
+
+    def translate(self, text, to_lang, from_lang='en'):
+        if not to_lang or not text:
+            return ""
+        response = self.session.get(self.url, params={'tl': to_lang, 'sl': from_lang, 'q': text}, headers=self.headers, timeout=TRANSLATION_TIMEOUT)
+        response.raise_for_status()
+        result = self.result_expr.findall(response.text)
+        return result[0] if result else ""
+
+
+class StubTranslator(BaseTranslator):
+    """ local stand-in: "[es] text" """
+
+    def translate(self, text, to_lang, from_lang='en'):
+        return f'[{to_lang}] {text}' if text else ""
+
+
+def get_translator(path=None):
+    return import_string(path or settings.MODEL_TRANSLATOR)()
+
+
+class TranslationMemory:
+    """ source string -> translation, persisted as JSON; `checkpoint()` replaces the file atomically """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+
+    def __contains__(self, source):
+        return source in self.entries
+
+    def get(self, source):
+        return self.entries.get(source)
+
+    def add(self, source, translation):
+        self.entries[source] = translation
+        self.dirty = True
+
+    def checkpoint(self):
+        if not self.dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(f.name, self.path)
+        self.dirty = False
+
+
+def get_translation_languages():
+    """ LANGUAGES without the default one """
+    return [lang[0] for lang in settings.LANGUAGES[1:]]
+
+
+def get_translated_fields():
+    """ [(model, [source field names])] of every model registered with modeltranslation """
+    from modeltranslation.translator import translator
+
+    return [(model, list(translator.get_options_for_model(model).get_field_names())) for model in translator.get_registered_models()]
+
+
+def iter_source_values(models_fields=None, chunk_size=2000):
+    """ every non-empty source (default language) value of the translated fields, streamed from the database """
+    from modeltranslation.utils import build_localized_fieldname
+
+    default_language = settings.LANGUAGE_CODE
+    for model, field_names in models_fields or get_translated_fields():
+        columns = [build_localized_fieldname(name, default_language) for name in field_names]
+        for row in model._base_manager.values_list(*columns).iterator(chunk_size=chunk_size):
+            yield from (value for value in row if value)
+
+
+def _batches(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def translate_missing(memory, translator, to_lang, values, workers=TRANSLATION_WORKERS, batch_size=TRANSLATION_BATCH_SIZE, stdout=None):
+    """
+        translates the `values` missing from `memory`, `workers` batches at a time, checkpointing
+        the memory after every completed batch; a failed batch is logged and left for the next run
+        returns (translated, failed) string counts
+    """
+
+    missing = sorted({value for value in values if value not in memory})
+    translated = failed = 0
+    if not missing:
+        return translated, failed
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(translator.translate_batch, batch, to_lang): batch for batch in _batches(missing, batch_size)}
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                failed += len(batch)
+                logger_joeflow.warning("Translating %d strings to %s failed: %s" % (len(batch), to_lang, e))
+                continue
+
+            for source, translation in zip(batch, results):
+                if translation:
+                    memory.add(source, translation)
+                    translated += 1
+                else:
+                    failed += 1
+            memory.checkpoint()
+            if stdout:
+                stdout.write(f'{translated + failed}/{len(missing)} strings translated to {to_lang}')
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        memory.checkpoint()
+
+    return translated, failed
+
+
+def update_model_translations(memory, to_lang, models_fields=None, batch_size=UPDATE_BATCH_SIZE):
+    """
+        writes translations from `memory` into the `<field>_<to_lang>` columns whose source value it knows,
+        streaming rows and saving the changed ones with bulk_update; returns the number of rows updated.
+        bulk_update sends no post_save, the cached directory fragments are invalidated here instead
+    """
+    from modeltranslation.utils import build_localized_fieldname
+    from .directory_cache import bump_directory_version
+
+    default_language = settings.LANGUAGE_CODE
+    updated = 0
+    for model, field_names in models_fields or get_translated_fields():
+        pairs = [(build_localized_fieldname(name, default_language), build_localized_fieldname(name, to_lang)) for name in field_names]
+        targets = [target for _, target in pairs]
+
+        changed = []
+        for obj in model._base_manager.only('pk', *[column for pair in pairs for column in pair]).iterator(chunk_size=batch_size):
+            dirty = False
+            for source, target in pairs:
+                translation = memory.get(getattr(obj, source))
+                if translation and getattr(obj, target) != translation:
+                    setattr(obj, target, translation)
+                    dirty = True
+            if dirty:
+                changed.append(obj)
+            if len(changed) >= batch_size:
+                model._base_manager.bulk_update(changed, targets)
+                updated += len(changed)
+                changed = []
+
+        if changed:
+            model._base_manager.bulk_update(changed, targets)
+            updated += len(changed)
+
+    if updated:
+        bump_directory_version()
+    return updated
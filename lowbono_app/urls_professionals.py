@@ -12,6 +12,9 @@ urlpatterns = [
     path('reset_password', views.resetPasswordPage, name="reset_password"),
 
     path('email_template/<str:id>', views.emailTemplateView, name="email_template"),
+    path('reports', views.ReportingView.as_view(), name="reports"),
+    path('profiling', views.ProfilingView.as_view(), name="profiling"),
+    path('profiling/metrics', views.profilingMetrics, name="profiling-metrics"),
 
     path('', views.ProfessionalListView.as_view(), name="professional-list"),
 
@@ -26,6 +29,7 @@ urlpatterns = [
     path('referrals/<str:id>/edit', views.ReferralUpdateView.as_view(), name="referral-update"),
 
     path('<str:id>/matters', views.UserMatterListView.as_view(), name="user-matters"),
+    path('matters/bulk-update', views.bulkUpdateWorkflows, name="matters-bulk-update"),
 
     path('get_workflow_pretty_nodes/', views.getWorkflowNodes, name="get-workflow-pretty-nodes"),
     path('get_professional_by_practicearea/', views.getProfessionalByPracticeAreas, name="get-professional-by-practicearea"),
@@ -3,7 +3,6 @@ import random
 import urllib.request
 import urllib.parse
 import datetime
-import redis
 import logging
 
 from django.template import Context, Template
@@ -12,7 +11,7 @@ from bs4 import BeautifulSoup
 
 from faker import Faker
 
-from lowbono.settings import REDIS_CONNECTION_URL
+from lowbono import redis_client
 
 from . import models
 
@@ -22,10 +21,7 @@ logger_joeflow = logging.getLogger('joeflow_log')
 
 
 def redis_status_log(failed_at=0):
-    conn = redis.from_url(REDIS_CONNECTION_URL)
-    try:
-        conn.ping()
-    except:
+    if redis_client.ping() is None:
         logger_joeflow.warning("Redis not available at: %s and failed at checkpoint: %d" % (datetime.datetime.today().strftime('%Y-%m-%d %H:%M:%S:%f'), failed_at))
 
 def translate_using_google(from_lang='en', to_lang=None, translate_str=None):
@@ -1,4 +1,5 @@
 import datetime
+import json
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils.translation import gettext_lazy as _
@@ -7,7 +8,8 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.contrib.contenttypes.models import ContentType
-from django.http import HttpResponseNotFound, HttpResponse
+from django.http import HttpResponseNotFound, HttpResponse, JsonResponse
+from django.core.exceptions import ValidationError
 from django.views.generic.base import TemplateView
 from django.views.generic.edit import CreateView, UpdateView
 from django.views.generic.detail import DetailView
@@ -16,13 +18,21 @@ from django.contrib import messages
 from django.utils import timezone, translation
 from django.views.generic.list import ListView
 from django.db.models import Q, F, Sum
-from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date
+from django.utils.http import urlencode, url_has_allowed_host_and_scheme
+from django.views.decorators.http import condition, require_POST
 
 from . import models
 from . import forms
 from . import constants
 from . import utils
 from . import emails
+from . import directory_cache
+
+from lowbono import page_cache, profiling, redis_client
 
 
 def loginPage(request):
@@ -196,22 +206,78 @@ def getWorkflowNodes(request):
         return HttpResponse(multi_elements)
 
 
+@condition(etag_func=directory_cache.directory_etag, last_modified_func=directory_cache.directory_last_modified)
 def getProfessionalByPracticeAreas(request):
     if request.htmx:
-        app_name = next(iter(request.GET.keys()), None)
+        app_name = next((key for key in request.GET.keys() if key != 'q'), None)
         practicearea_id = request.GET.get(app_name) if app_name else None
+        query = request.GET.get('q', '').strip()
 
         if app_name:
             from .pluggable_app import PluggableApp
 
             app = PluggableApp.get_app(app_name)
-            professional_type = app.name.split("_")[1].capitalize()
-            professionals = app._models.Professional.objects.filter(is_enabled=True).order_by('-id')
 
-            if practicearea_id:
-                professionals = professionals.filter(practice_areas=practicearea_id)
+        response = HttpResponse(directory_cache.render_professionals_fragment(app, practicearea_id, query))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
 
-        return HttpResponse(render_to_string('lowbono_app/professional_detail.html', {'professionals': professionals, 'professional_type': professional_type}))
+@require_POST
+def bulkUpdateWorkflows(request):
+    """
+    Applies status reports to many matters in one request, all or nothing.
+    Accepts the pending matters form (workflow_id list + next_node_<id>, hours_worked_<id>, notes_<id>,
+    is_income_eligible_<id>, ineligible_reason_<id>), or JSON {"app": ..., "updates": [{"workflow_id", "next_node",
+    "hours_worked", "notes", "is_income_eligible", "ineligible_reason"}, ...]}.
+    """
+
+    from .pluggable_app import PluggableApp
+
+    is_json = request.content_type == 'application/json'
+    if is_json:
+        try:
+            payload = json.loads(request.body or '{}')
+        except ValueError:
+            return JsonResponse({'errors': {'__all__': ['Invalid JSON.']}}, status=400)
+        updates = payload.get('updates', []) if isinstance(payload, dict) else None
+        if not isinstance(updates, list) or not all(isinstance(update, dict) for update in updates):
+            return JsonResponse({'errors': {'__all__': ['Invalid updates.']}}, status=400)
+        app_name = payload.get('app')
+        updates = [(update.get('workflow_id'), update.get('next_node'), update.get('hours_worked'), update.get('notes'),
+                    update.get('is_income_eligible'), update.get('ineligible_reason')) for update in updates]
+    else:
+        app_name = request.POST.get('app')
+        updates = []
+        for workflow_id in request.POST.getlist('workflow_id'):
+            is_income_eligible = request.POST.get(f'is_income_eligible_{workflow_id}')
+            updates.append((workflow_id, request.POST.get(f'next_node_{workflow_id}'), request.POST.get(f'hours_worked_{workflow_id}'),
+                            request.POST.get(f'notes_{workflow_id}', ''),
+                            None if is_income_eligible is None else is_income_eligible == 'True',
+                            request.POST.get(f'ineligible_reason_{workflow_id}')))
+
+    next_url = request.POST.get('next', '')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse('user-matters', args=[request.user.id])
+
+    app = PluggableApp.get_app(app_name) if app_name else None
+    try:
+        if app is None:
+            raise ValidationError({'__all__': 'Unknown workflow type.'})
+        if not all(str(update[0]).isdigit() for update in updates):
+            raise ValidationError({'__all__': 'Invalid matter id.'})
+        workflows = app._models.ReferralWorkflowState.objects.bulk_transition(updates, request.user)
+    except ValidationError as e:
+        if is_json:
+            return JsonResponse({'errors': e.message_dict}, status=400)
+        for workflow_id, errors in e.message_dict.items():
+            messages.error(request, errors[0] if workflow_id == '__all__' else f'Matter #{workflow_id}: {errors[0]}')
+        return redirect(next_url)
+
+    if is_json:
+        return JsonResponse({'updated': [workflow.id for workflow in workflows]})
+    messages.success(request, f'{len(workflows)} matters updated.')
+    return redirect(next_url)
 
 
 class UserCustomCanAccessTestMixin(UserPassesTestMixin):
@@ -414,6 +480,7 @@ class VacationCreateView(UserBySlugCanAccessTestMixin, CreateView):
         return super().form_valid(form)
 
 
+@method_decorator(condition(etag_func=directory_cache.directory_etag, last_modified_func=directory_cache.directory_last_modified), name='get')
 class ProfessionalListView(TemplateView):
 
     template_name = "lowbono_app/professional_list.html"
@@ -435,12 +502,10 @@ class ProfessionalListView(TemplateView):
                 "app_name": app.name,
                 "professional_type": app.name.split("_")[1].capitalize(),
                 "query_param_key": query_param_key,
-                'professionals': app._models.Professional.objects.filter(is_enabled=True).order_by('-id'),
-                "practiceareas": models.PracticeAreaCategory.objects.filter(practicearea_category_type=ContentType.objects.get_for_model(app._models.Professional)),
+                "pane_html": directory_cache.render_directory_pane_fragment(app, query_param_value),
             }
 
             if query_param_value:
-                app_context['professionals'] = app_context['professionals'].filter(practice_areas=query_param_value)
                 context[query_param_key] = query_param_value
                 app_context['selected_pa'] = query_param_value
                 app_context['is_active'] = True
@@ -456,6 +521,11 @@ class ProfessionalListView(TemplateView):
 
         return context
 
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
 
 class ReferralUpdateView(UserCustomCanAccessTestMixin, UpdateView):
     model = models.Referral
@@ -481,9 +551,28 @@ class ReferralDetailView(UserCustomCanAccessTestMixin, DetailView):
         obj = super(ReferralDetailView, self).get_object(*args, **kwargs)
         return self.request.user.id == obj.professional.id
 
+    timeline_page_size = 50
+
+    def get_queryset(self):
+        from .pluggable_app import PluggableApp
+
+        related = []
+        for app in PluggableApp.get_apps():
+            accessor = app._models.ReferralWorkflowState._meta.get_field('referral').remote_field.get_accessor_name()
+            related += [accessor, f'{accessor}__current_task']
+        return super().get_queryset().select_related('professional', *related)
+
+    def _get_timeline_page(self, referral_workflow, param, **kwargs):
+        try:
+            before = referral_workflow.decode_timeline_cursor(self.request.GET[param])
+        except (KeyError, ValueError):
+            before = None  # missing or invalid cursors start from the first page
+        entries, next_cursor = referral_workflow.get_timeline(before=before, limit=self.timeline_page_size, **kwargs)
+        return entries, f'?{urlencode({param: referral_workflow.encode_timeline_cursor(next_cursor)})}' if next_cursor else None
+
     def get_context_data(self, **kwargs):
         context = super(ReferralDetailView, self).get_context_data(**kwargs)
-        
+
         context['referral_type'] = None
         context['referral_workflow'] = None
         context['template'] = ''
@@ -494,54 +583,48 @@ class ReferralDetailView(UserCustomCanAccessTestMixin, DetailView):
         from .pluggable_app import PluggableApp
 
         for app in PluggableApp.get_apps():
-            referral_workflow = app._models.ReferralWorkflowState.objects.filter(referral=self.object).first()
+            accessor = app._models.ReferralWorkflowState._meta.get_field('referral').remote_field.get_accessor_name()
+            referral_workflow = getattr(self.object, accessor, None)
             if referral_workflow:
                 context['referral_workflow'] = referral_workflow
                 context['referral_type'] = app.name
                 context['professional_type'] = app.name.split("_")[1].capitalize()
                 context['template'] = app.name + '/referral_detail.html',
 
-                context['engagement_reports'] = referral_workflow.get_engagement_reports_for_professionals()
                 context['engagement_reported_hours'] = referral_workflow.count_total_reported_hours()
 
-                notification_logs = []
-                for log in self.object.referralnotifications_set.filter(template__recipient='PROFESSIONAL_EMAIL').order_by('-created_at'):
-                    notification_logs.append({'sent_for': log.template.description,
-                                            'sent_at': log.created_at})
-
-                context['notification_logs'] = notification_logs
+                if self.request.user.id == self.object.professional_id:
+                    context['engagement_reports'], context['engagement_reports_next_page'] = self._get_timeline_page(
+                        referral_workflow, 'reports_before', audience='professional', kinds=(referral_workflow.TIMELINE_STATUS_REPORT,))
+                    context['notification_logs'], context['notification_logs_next_page'] = self._get_timeline_page(
+                        referral_workflow, 'notifications_before', kinds=(referral_workflow.TIMELINE_NOTIFICATION,))
 
                 # additional logs if admin user
                 if self.request.user.is_staff:
-                    all_logs = []
-                    for log in referral_workflow.get_engagement_reports_for_staff():
-                        all_logs.append({
-                            'type': 'status_report',
-                            'report_status': log.history_object.get_current_task_pretty_name(),
-                            'hours_worked': log.hours_worked,
-                            'notes': log.notes,
-                            'timestamp': log.updated_at,
-                        })
-
-                    for log in self.object.referralnotifications_set.filter(template__recipient='PROFESSIONAL_EMAIL').order_by('-created_at'):
-                        all_logs.append({
-                            'type': 'notification',
-                            'email_type': log.template.description,
-                            'timestamp': log.created_at
-                        })
-
-                    context['all_admin_logs'] = sorted(all_logs, key=lambda x: x["timestamp"], reverse=True)
+                    context['all_admin_logs'], context['all_admin_logs_next_page'] = self._get_timeline_page(
+                        referral_workflow, 'logs_before', audience='staff')
                 break
 
         return context
 
 
-class UserMatterListView(UserByIdCanAccessTestMixin, ListView):
-    model = models.Referral
-    slug_field = 'id'
-    slug_url_kwarg = 'id'
-    ordering = ['-created_at']
+class UserMatterListView(UserByIdCanAccessTestMixin, TemplateView):
+    template_name = 'lowbono_app/referral_list.html'
     paginate_by = 10
+    matter_buckets = ('overdue', 'pending', 'closed')
+
+    def get_cursor(self, cursor_key):
+        """ workflow id cursor of a bucket, invalid values start from the first page """
+        try:
+            return int(self.request.GET[cursor_key])
+        except (KeyError, ValueError):
+            return None
+
+    def get_next_page_url(self, cursor_key, next_cursor):
+        # keep the cursors of the other buckets
+        query = self.request.GET.copy()
+        query[cursor_key] = next_cursor
+        return f'?{query.urlencode()}'
 
     def get_context_data(self, **kwargs):
         context = super(UserMatterListView, self).get_context_data(**kwargs)
@@ -553,29 +636,103 @@ class UserMatterListView(UserByIdCanAccessTestMixin, ListView):
 
         for app in PluggableApp.get_apps():
             _profile_exists = app._models.Professional.objects.filter(user=context['professional']).first()
-            name = app.name
-            overdue = []
-            pending = []
-            closed = []
-            for workflow in app._models.ReferralWorkflowState.objects.filter(referral__professional__id=self.kwargs['id']):
-                if workflow.is_referral_ongoing():
-                    if workflow.is_overdue:
-                        overdue.append(workflow)
-                    else:
-                        pending.append(workflow)
-                else:
-                    closed.append(workflow)
+            workflow_manager = app._models.ReferralWorkflowState.objects
+            counts = workflow_manager.get_matter_bucket_counts(self.kwargs['id'])
 
-            context['matters'].append({
+            app_matters = {
                 'name': app.name,
                 'professional_type': app.name.split("_")[1].capitalize(),
                 'profile_exists': _profile_exists,
                 'is_profile_complete': _profile_exists._is_profile_complete() if _profile_exists else False,
                 'profile_incomplete_template': 'lowbono_app/profile_incomplete.html',
                 'template': 'lowbono_app/referral_list_items.html',
-                'pending': pending,
-                'overdue': overdue,
-                'closed': closed,
-            })
+                'counts': counts,
+                'next_page': {},
+            }
+
+            for bucket in self.matter_buckets:
+                cursor_key = f'{app.name}_{bucket}_before'
+                if counts[bucket]:
+                    app_matters[bucket], next_cursor = workflow_manager.get_matter_bucket_page(
+                        self.kwargs['id'], bucket, before=self.get_cursor(cursor_key), limit=self.paginate_by)
+                else:
+                    app_matters[bucket], next_cursor = [], None
+                app_matters['next_page'][bucket] = self.get_next_page_url(cursor_key, next_cursor) if next_cursor else None
+
+            context['matters'].append(app_matters)
+
+        return context
+
 
+class ReportingView(UserCustomCanAccessTestMixin, TemplateView):
+    """
+        staff reports on the referral funnel and engagement hours, read from daily rollups only
+    """
+
+    template_name = 'lowbono_app/reporting.html'
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get_context_data(self, **kwargs):
+        context = super(ReportingView, self).get_context_data(**kwargs)
+
+        from .pluggable_app import PluggableApp
+        from . import reporting
+
+        start = parse_date(self.request.GET.get('start', '') or '')
+        end = parse_date(self.request.GET.get('end', '') or '')
+        group_by = [g for g in self.request.GET.getlist('group_by') if g in reporting.REPORT_GROUPINGS] or ['state']
+
+        workflow_type = None
+        app_name = self.request.GET.get('app')
+        if app_name in [app.name for app in PluggableApp.get_apps()]:
+            workflow_type = ContentType.objects.get_for_model(PluggableApp.get_app(app_name)._models.ReferralWorkflowState)
+
+        rows = reporting.rollup_report(start=start, end=end, workflow_type=workflow_type, group_by=group_by)
+
+        context['apps'] = [app.name for app in PluggableApp.get_apps()]
+        context['groupings'] = list(reporting.REPORT_GROUPINGS)
+        context['selected'] = {'start': start, 'end': end, 'app': app_name, 'group_by': group_by}
+        context['columns'] = group_by
+        context['rows'] = [([row[reporting.REPORT_GROUPINGS[g]] for g in group_by], row) for row in rows]
+        context['totals'] = {
+            'referrals_entered': sum(row['referrals_entered'] for cells, row in context['rows']),
+            'hours_reported': sum(row['hours_reported'] for cells, row in context['rows']),
+        }
+        return context
+
+
+class ProfilingView(UserCustomCanAccessTestMixin, TemplateView):
+    """
+        staff page listing query counts, duplicated queries and timings per URL name / celery task (lowbono.profiling)
+    """
+
+    template_name = 'lowbono_app/profiling.html'
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def post(self, request, *args, **kwargs):
+        profiling.reset_stats()
+        messages.success(request, 'Profiling data cleared')
+        return redirect('profiling')
+
+    def get_context_data(self, **kwargs):
+        context = super(ProfilingView, self).get_context_data(**kwargs)
+        context['enabled'] = settings.PROFILING_ENABLED
+        context['stats'] = [(entry, profiling.get_budget(entry['name'])) for entry in profiling.get_stats()]
         return context
+
+
+def profilingMetrics(request):
+    """
+        profiling aggregates as text metrics, for staff or a scraper sending `Authorization: Bearer <PROFILING_METRICS_TOKEN>`
+    """
+
+    token = settings.PROFILING_METRICS_TOKEN
+    authorized = request.user.is_staff or (token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'))
+    if not authorized:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+
+    return HttpResponse(profiling.format_metrics() + redis_client.format_metrics() + page_cache.format_metrics(), content_type='text/plain; version=0.0.4')
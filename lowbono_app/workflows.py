@@ -1,10 +1,12 @@
 import datetime
+from decimal import InvalidOperation
 
 from django.apps import apps
 from django.core.mail import send_mail
 from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.functional import lazy
 from django.utils.safestring import mark_safe
 from django.urls import reverse
@@ -13,7 +15,9 @@ from django.shortcuts import redirect
 from django.views.generic.edit import FormMixin, ModelFormMixin
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Q, F, Sum, Max, Subquery, OuterRef
+from django.core.exceptions import ValidationError
+from django.db.models import Q, F, Sum, Max, Subquery, OuterRef, Case, When, Value, Count, CharField, DecimalField, TextField
+from django.db.models.functions import Coalesce
 from django.db import models
 
 from django import forms
@@ -25,15 +29,27 @@ from joeflow.models import Workflow, Task
 from joeflow import tasks
 
 from simple_history.models import HistoricalRecords
+from simple_history.signals import post_create_historical_record
 
 from django.http import HttpResponseRedirect
 from django.db import transaction
 from django.db import models
 from lowbono_app.models import Referral, ReferralNotifications, EmailEventEnterState, EmailEventDeadline, EmailEventInactiveFor, CeleryETATasks
 from lowbono_app.constants import ATTORNEY_PROVIDED_RATES_BEAUTIFY
+from lowbono_app import reporting, transitions
 from lowbono_app.tasks import emailtemplates_delayed_send_email
 
 
+ENGAGED_NODES = ('waiting_for_post_engagement_update', 'engagement_completed')
+
+
+def is_missing_ineligible_reason(referral, next_node, is_income_eligible, ineligible_reason):
+    """ True when an engaged low or moderate income referral is reported as not income eligible without a reason """
+
+    return (referral.income_status in ['low', 'moderate'] and next_node in ENGAGED_NODES
+            and not is_income_eligible and not ineligible_reason)
+
+
 class ReferralUpdateViewBase(UserPassesTestMixin, tasks.UpdateView):
     """
         Custom update form that overrides joeflow's default form to help:
@@ -47,10 +63,24 @@ class ReferralUpdateViewBase(UserPassesTestMixin, tasks.UpdateView):
         messages.error(self.request, 'Oops! You do not have permission to access this page')
         return redirect('dashboard')
 
+    def get_task(self):
+        """
+            the view's scheduled human task, loaded once per request together with its workflow context
+            (referral, professional, current task, last human update and reported hours, see
+            ReferralWorkflowStateBaseManager.with_update_form_context), shared by test_func, get_form and form_valid
+        """
+
+        if not hasattr(self, '_task'):
+            task = super().get_task()
+            if task.pk:
+                task.workflow = self.model.objects.with_update_form_context().get(pk=task._workflow_id)
+            self._task = task
+        return self._task
+
     def test_func(self, *args, **kwargs):
         if self.request.user.is_staff: return True
         _obj = super(ReferralUpdateViewBase, self).get_object(*args, **kwargs)
-        return self.request.user.id == _obj.referral.professional.id
+        return self.request.user.id == _obj.referral.professional_id
 
     def get_form_kwargs(self):
         """
@@ -64,8 +94,7 @@ class ReferralUpdateViewBase(UserPassesTestMixin, tasks.UpdateView):
         return kwargs
 
     def next_task(self, user_node_choice):
-        task = self.get_task()
-        task.workflow = self.model._base_manager.get(pk=self.object.pk)
+        task = self.get_task()  # task.workflow is self.object, already loaded for this request
         task.finish(self.request.user)
         next_node = task.workflow.get_node(user_node_choice)
         task.start_next_tasks([next_node]) # start just one task
@@ -77,11 +106,9 @@ class ReferralUpdateViewBase(UserPassesTestMixin, tasks.UpdateView):
         reminder email.
         """
 
-        is_income_eligible = self.object.referral.income_status in ['low', 'moderate']
-        has_engaged = form.cleaned_data.get("user_node_choice") in ['waiting_for_post_engagement_update', 'engagement_completed']
-
         # validate if ineligbile reason is provided when required
-        if (is_income_eligible and has_engaged) and (not form.cleaned_data.get("is_income_eligible") and not form.cleaned_data.get("ineligible_reason")):
+        if is_missing_ineligible_reason(self.object.referral, form.cleaned_data.get("user_node_choice"),
+                                        form.cleaned_data.get("is_income_eligible"), form.cleaned_data.get("ineligible_reason")):
             form.add_error('ineligible_reason', 'Please provide a reason')
             return self.form_invalid(form)
 
@@ -95,7 +122,8 @@ class ReferralUpdateViewBase(UserPassesTestMixin, tasks.UpdateView):
     def get_form(self):
         form = super().get_form()
 
-        form.fields['user_node_choice'] = forms.ChoiceField(choices=self.object.dynamic_form_node_choices())
+        # the view's task is the workflow's current scheduled human task
+        form.fields['user_node_choice'] = forms.ChoiceField(choices=self.object.get_next_node_choices(self.get_task().name))
         form.fields['user_node_choice'].label = "Report Status"
 
         form.fields['hours_worked'].required = False
@@ -154,6 +182,7 @@ def post_save_joeflow_task(sender, instance, created, **kwargs):
 
         if instance.workflow.task_set.filter(name=instance.name).count() == 1:
             # transition: entered a new state 1st time
+            reporting.record_state_entered(instance.workflow, instance.name, instance.created)
 
             # EmailEventEnterState emails
             enterstate_events = EmailEventEnterState.objects.filter(template__workflow_type=ContentType.objects.get_for_model(instance.workflow.__class__), workflow_state=instance.name)
@@ -178,6 +207,8 @@ def post_save_joeflow_task(sender, instance, created, **kwargs):
                         CeleryETATasks.objects.create(func='emailtemplates_delayed_send_email', args={"workflow_id": instance.workflow.id, "template_id": event.template.id, "task_id": instance.id}, eta=eta) # to be trigger in future
 
         last_task = instance.workflow.task_set.exclude(id__in=[instance.id]).order_by("-id").first()
+        transitions.record_transition(instance, last_task)
+
         if last_task:
             if last_task.name != instance.name:
                 # transition: enters a new state comparing to old state
@@ -220,11 +251,44 @@ class ReferralWorkflowStateBaseManager(models.Manager):
 
         # filter through task_name, professional as well as value of human_last_update subquery
         overdue_workflows = self.filter(current_task__name=event_type.workflow_state, referral__professional=professional) \
+                                .select_related('referral') \
                                 .annotate(human_last_update=Subquery(human_last_update)) \
                                 .filter(Q(human_last_update__isnull=True) |
                                         Q(human_last_update__lt=timezone.now() - datetime.timedelta(days=event_type.days_inactive)))
         return overdue_workflows
 
+    def with_reported_hours(self):
+        """
+            Workflows annotated with the hours reported in their history (`total_reported_hours`) and in
+            their archived history (`archived_reported_hours`, None when nothing was archived)
+        """
+        from lowbono_app import archive
+        from lowbono_app.models import ArchivedRecord
+
+        total_reported_hours = self.model.history.field.model.objects.filter(id=OuterRef('pk')).order_by().values('id') \
+                                                                     .annotate(total=Sum('hours_worked')).values('total')
+        archived_reported_hours = ArchivedRecord.objects.filter(kind=archive.KIND_WORKFLOW_HISTORY, referral_id=OuterRef('referral_id'),
+                                                                workflow_type=ContentType.objects.get_for_model(self.model)) \
+                                                        .order_by().values('referral_id').annotate(total=Sum('hours_worked')).values('total')
+
+        return self.annotate(total_reported_hours=Subquery(total_reported_hours),
+                             archived_reported_hours=Subquery(archived_reported_hours))
+
+    def with_update_form_context(self):
+        """
+            Workflows with everything the status update form reads loaded in one query:
+            referral, professional and current task joined, plus the last human update and
+            total reported hours annotated from the history table and the archive.
+        """
+
+        history = self.model.history.field.model.objects
+        human_last_update = history.filter(id=OuterRef('pk'), is_human_activity=True) \
+                                   .order_by('-updated_at').values('updated_at')[:1]
+
+        return self.with_reported_hours() \
+                   .select_related('referral', 'referral__professional', 'current_task') \
+                   .annotate(human_last_update=Subquery(human_last_update))
+
     def get_overdue_referrals_for_professional(self, event_type, professional):
         """
             Get workflows for a professional that are waiting on a particular event_type
@@ -237,6 +301,184 @@ class ReferralWorkflowStateBaseManager(models.Manager):
 
         return overdue_referrals
 
+    def mark_notified(self, notifications):
+        """
+            Bulk equivalent of setting `workflow.notification`, `is_human_activity = False` and calling `workflow.save()`
+            for every workflow reminded by a machine notification.
+            `notifications` is a list of (workflow, ReferralNotifications) pairs.
+
+            Workflows are updated in a single UPDATE (the same field resets and `current_task` refresh as the model's save),
+            so a reminder batch issues a constant number of writes. No historical snapshot is written: the
+            ReferralNotifications rows (bulk created by the caller) are the compact history of reminders, and the
+            history table only grows with human status reports and transitions.
+            The given workflow instances are refreshed in place.
+        """
+
+        if not notifications:
+            return 0
+
+        now = timezone.now()
+        notification_ids = {workflow.pk: notification.pk for workflow, notification in notifications}
+        latest_task = Task.objects.filter(_workflow_id=OuterRef('pk'), content_type=ContentType.objects.get_for_model(self.model)) \
+                                  .order_by('-created', '-id').values('id')[:1]
+
+        updated = self.filter(pk__in=notification_ids).update(
+            notification=Case(*[When(pk=pk, then=Value(notification_id)) for pk, notification_id in notification_ids.items()]),
+            current_task=Coalesce(Subquery(latest_task), F('current_task')),
+            is_human_activity=False,
+            is_overdue=True,
+            hours_worked=0,
+            notes='',
+            updated_at=now,
+        )
+        refreshed = {workflow.pk: workflow for workflow in self.filter(pk__in=notification_ids).only(
+            'notification_id', 'current_task_id', 'is_human_activity', 'is_overdue', 'hours_worked', 'notes', 'updated_at')}
+
+        for workflow, _ in notifications:
+            fresh = refreshed[workflow.pk]
+            for field in ('notification_id', 'current_task_id', 'is_human_activity', 'is_overdue', 'hours_worked', 'notes', 'updated_at'):
+                setattr(workflow, field, getattr(fresh, field))
+
+        return updated
+
+    def _clean_hours_worked(self, hours_worked):
+        """ hours of a status report as the model field stores them, ValidationError when invalid or negative """
+
+        field = self.model._meta.get_field('hours_worked')
+        try:
+            hours_worked = field.clean(0 if hours_worked in (None, '') else hours_worked, None)
+            if hours_worked.is_finite() and hours_worked >= 0:
+                return hours_worked
+        except (ValidationError, InvalidOperation, TypeError):
+            pass
+        raise ValidationError(f'Hours worked must be a non-negative number below {10 ** (field.max_digits - field.decimal_places)}, '
+                              f'with at most {field.decimal_places} decimal places.')
+
+    def bulk_transition(self, updates, user):
+        """
+            Applies many status reports at once, all or nothing, in one transaction.
+            `updates` is a list of (workflow_id, next_node, hours_worked, notes[, is_income_eligible, ineligible_reason])
+            tuples; a missing income eligibility answer keeps the workflow's current one.
+
+            Every tuple is validated against the workflow graph (next_node must follow the workflow's scheduled
+            human task), the hours, the income eligibility rule of the status update form and the user's access
+            before anything is written; otherwise a ValidationError keyed by workflow id is raised.
+            Scheduled tasks are finished with one UPDATE and next tasks are started through joeflow (so task signals
+            still run); workflows are written with one bulk UPDATE and their history rows with one insert.
+            returns the updated workflows
+        """
+
+        edges = {(e0.name, e1.name) for e0, e1 in self.model.edges}
+        workflow_ids = [int(workflow_id) for workflow_id, *_ in updates]
+        workflows = self.select_related('referral').in_bulk(workflow_ids)
+        scheduled = {task._workflow_id: task for task in Task.objects.scheduled().filter(
+            content_type=ContentType.objects.get_for_model(self.model), _workflow_id__in=workflow_ids, type=tasks.HUMAN)}
+
+        errors, transitions = {}, []
+        for workflow_id, next_node, hours_worked, notes, *income in updates:
+            workflow_id = int(workflow_id)
+            workflow, task = workflows.get(workflow_id), scheduled.get(workflow_id)
+            is_income_eligible, ineligible_reason = (list(income) + [None, None])[:2]
+            if workflow is not None and is_income_eligible is None:
+                is_income_eligible = workflow.is_income_eligible
+            if workflow is not None and ineligible_reason is None:
+                ineligible_reason = workflow.ineligible_reason
+            try:
+                hours_worked, hours_error = self._clean_hours_worked(hours_worked), None
+            except ValidationError as e:
+                hours_worked, hours_error = None, e.messages[0]
+
+            if workflow is None or not (user.is_staff or workflow.referral.professional_id == user.id):
+                errors[str(workflow_id)] = 'Matter not found.'
+            elif workflow_id in errors or any(workflow_id == t[0].id for t in transitions):
+                errors[str(workflow_id)] = 'Matter listed more than once.'
+            elif task is None:
+                errors[str(workflow_id)] = 'Matter is not waiting on a status report.'
+            elif (task.name, next_node) not in edges:
+                errors[str(workflow_id)] = f'Cannot move from "{workflow.get_pretty_name_for_task(task.name)}" to "{next_node}".'
+            elif hours_error:
+                errors[str(workflow_id)] = hours_error
+            elif is_missing_ineligible_reason(workflow.referral, next_node, is_income_eligible, ineligible_reason):
+                errors[str(workflow_id)] = 'Please provide a reason why standard rates were provided.'
+            else:
+                transitions.append((workflow, task, next_node, hours_worked, notes or '', is_income_eligible, ineligible_reason))
+
+        if errors:
+            raise ValidationError(errors)
+
+        now = timezone.now()
+        with transaction.atomic():
+            Task.objects.filter(pk__in=[task.pk for _, task, *_ in transitions]) \
+                        .update(status=Task.SUCCEEDED, completed=now, completed_by_user=user, modified=now)
+
+            for workflow, task, next_node, hours_worked, notes, is_income_eligible, ineligible_reason in transitions:
+                task.workflow = workflow
+                task.status, task.completed, task.completed_by_user = Task.SUCCEEDED, now, user
+                workflow.current_task = task.start_next_tasks([workflow.get_node(next_node)])[0]
+                workflow.hours_worked = hours_worked
+                workflow.notes = notes
+                workflow.is_income_eligible = bool(is_income_eligible)
+                workflow.ineligible_reason = ineligible_reason
+                workflow.is_human_activity = True
+                workflow.notification = None
+                workflow.is_overdue = False
+                workflow.updated_at = now
+
+            updated = [workflow for workflow, *_ in transitions]
+            self.bulk_update(updated, ['current_task', 'hours_worked', 'notes', 'is_income_eligible', 'ineligible_reason',
+                                       'is_human_activity', 'notification', 'is_overdue', 'updated_at'])
+            self.model.logs.bulk_history_create(updated, update=True, default_user=user, default_date=now)
+
+            # bulk history inserts skip post_create_historical_record, keep the hours rollups in step
+            for workflow in updated:
+                reporting.record_hours_reported(workflow, workflow.current_task.name, workflow.hours_worked, now)
+
+        return updated
+
+    def _matter_bucket_filters(self):
+        """
+            Q objects classifying workflows the same way as `is_referral_ongoing()`:
+            a workflow is ongoing while its current task is a human (ReferralUpdateViewBase) node.
+        """
+
+        ongoing = Q(current_task__name__in=self.model.get_human_node_names())
+        return {
+            'overdue': ongoing & Q(is_overdue=True),
+            'pending': ongoing & Q(is_overdue=False),
+            'closed': ~ongoing,
+        }
+
+    def get_matter_bucket_counts(self, professional_id):
+        """
+            Number of overdue, pending and closed matters of a professional, in one query
+            returns a dictionary {'overdue': 2, 'pending': 5, 'closed': 40}
+        """
+
+        return self.filter(referral__professional_id=professional_id).aggregate(**{
+            bucket: Count('pk', filter=bucket_filter) for bucket, bucket_filter in self._matter_bucket_filters().items()
+        })
+
+    def get_matter_bucket_page(self, professional_id, bucket, before=None, limit=10):
+        """
+            One keyset page of a professional's matters in a bucket, newest first.
+            `before` is the cursor (workflow id) returned for the previous page.
+            returns (list of workflows, cursor of the next page or None)
+        """
+
+        human_last_update = self.model.history.field.model.objects.filter(id=OuterRef('pk'), is_human_activity=True) \
+                                                                  .order_by('-updated_at').values('updated_at')[:1]
+
+        workflows = self.filter(self._matter_bucket_filters()[bucket], referral__professional_id=professional_id) \
+                        .select_related('referral', 'current_task') \
+                        .annotate(human_last_update=Subquery(human_last_update)) \
+                        .order_by('-pk')
+        if before:
+            workflows = workflows.filter(pk__lt=before)
+
+        page = list(workflows[:limit + 1])
+        next_cursor = page[limit - 1].pk if len(page) > limit else None
+        return page[:limit], next_cursor
+
 
 class ReferralWorkflowStateBase(models.Model):
 
@@ -263,6 +505,22 @@ class ReferralWorkflowStateBase(models.Model):
     class Meta:
         abstract = True
 
+    @classmethod
+    def get_human_node_names(cls):
+        """
+            names of nodes waiting on a professional's update (ReferralUpdateViewBase nodes)
+        """
+
+        return sorted(name for name, node in cls.get_nodes() if isinstance(node, ReferralUpdateViewBase))
+
+    @classmethod
+    def get_next_node_choices(cls, node_name):
+        """
+            (name, pretty name) of the nodes a workflow waiting at `node_name` can move to
+        """
+
+        return [(e1.name, cls.pretty_nodes[e1.name]) for e0, e1 in cls.edges if e0.name == node_name]
+
     def get_current_human_node_name(self):
         """
             provides name of latest scheduled 'human' task
@@ -321,16 +579,64 @@ class ReferralWorkflowStateBase(models.Model):
             return self.task_set.scheduled().filter(type='human').first().get_absolute_url()
         return ''
 
+    def current_task_update_url(self):
+        """
+            update form URL of the current task, built from the already loaded current_task
+            returns '' once the current task is completed or is not a human task
+        """
+
+        if self.current_task and not self.current_task.completed and self.current_task.name in self.get_human_node_names():
+            return reverse(f"{self.get_url_namespace()}:{self.current_task.name}", kwargs={'pk': self.current_task.pk})
+        return ''
+
     def dynamic_form_node_choices(self):
         """
             dynamically provide status choices based on current human node
         """
 
-        next_nodes = [e1 for e0, e1 in self.get_edges_tuple() if e0 == self.get_current_human_node_name()]
-        return [(key, self.pretty_nodes[key]) for key in next_nodes]
+        return self.get_next_node_choices(self.get_current_human_node_name())
 
     def count_total_reported_hours(self):
-        return self.history.aggregate(Sum('hours_worked'))['hours_worked__sum']
+        if hasattr(self, 'total_reported_hours'):
+            # annotated by the manager's with_reported_hours
+            total, archived = self.total_reported_hours, self.archived_reported_hours
+        else:
+            total, archived = type(self).objects.with_reported_hours().filter(pk=self.pk) \
+                                                .values_list('total_reported_hours', 'archived_reported_hours').get()
+        return total if archived is None else (total or 0) + archived
+
+    def may_have_archived_rows(self):
+        """
+            only closed workflows get their history/notifications archived (see lowbono_app.archive),
+            ongoing ones skip the archive lookup entirely
+        """
+
+        return not (self.current_task_id and self.current_task.name in self.get_human_node_names())
+
+    def get_archived_history(self):
+        """
+            archived history rows of this workflow, newest first, as unsaved historical model instances
+        """
+
+        if not self.may_have_archived_rows():
+            return []
+
+        from lowbono_app import archive
+        rows = archive.archived_rows(archive.KIND_WORKFLOW_HISTORY, referral_id=self.referral_id,
+                                     workflow_type=ContentType.objects.get_for_model(self.__class__))
+        return [archive.restore(self.history.model, row) for row in rows]
+
+    def get_archived_notifications(self):
+        """
+            archived notifications of this workflow's referral, newest first, as unsaved ReferralNotifications
+        """
+
+        if not self.may_have_archived_rows():
+            return []
+
+        from lowbono_app import archive
+        rows = archive.archived_rows(archive.KIND_NOTIFICATION, referral_id=self.referral_id)
+        return [archive.restore(ReferralNotifications, row) for row in rows]
 
     def get_engagement_reports_for_professionals(self):
         """
@@ -344,10 +650,10 @@ class ReferralWorkflowStateBase(models.Model):
     def get_notifications_for_professionals(self):
         """
             to be shown to professionals on their referral page
-                - excludes human activity updates
+                - reminders are recorded as ReferralNotifications, not as workflow history
         """
 
-        return self.history.exclude(is_human_activity=True).order_by('-updated_at').all()
+        return ReferralNotifications.objects.filter(referral_id=self.referral_id).order_by('-created_at')
 
     def get_engagement_reports_for_staff(self):
         """
@@ -359,10 +665,142 @@ class ReferralWorkflowStateBase(models.Model):
     
     def get_all_engagement_reports(self):
         """
-            to be shown to admin/staff on referral page, includes everything
-        """
+            to be shown to admin/staff on referral page, includes everything (archived history included)
+            returns a list of historical model instances, newest first
+        """
+
+        return sorted([*self.history.all(), *self.get_archived_history()], key=lambda report: report.updated_at, reverse=True)
+
+    TIMELINE_STATUS_REPORT = 'status_report'
+    TIMELINE_NOTIFICATION = 'notification'
+
+    @staticmethod
+    def _timeline_key(row):
+        # entries written in one request share a timestamp, the type and id keep the order total
+        return row['entry_timestamp'], row['entry_type'], row['entry_id']
+
+    @classmethod
+    def _timeline_before(cls, part, entry_type, before):
+        """ rows of a one-type timeline part that sort after the (timestamp, type, id) cursor """
+
+        timestamp, cursor_type, cursor_id = before
+        if entry_type < cursor_type:
+            return part.filter(entry_timestamp__lte=timestamp)
+        if entry_type > cursor_type:
+            return part.filter(entry_timestamp__lt=timestamp)
+        return part.filter(Q(entry_timestamp__lt=timestamp) | Q(entry_timestamp=timestamp, entry_id__lt=cursor_id))
+
+    @staticmethod
+    def encode_timeline_cursor(cursor):
+        timestamp, entry_type, entry_id = cursor
+        return f'{timestamp.isoformat()}~{entry_type}~{entry_id}'
+
+    @classmethod
+    def decode_timeline_cursor(cls, cursor):
+        """ (timestamp, entry type, entry id) of a cursor from `encode_timeline_cursor`, ValueError when malformed """
+
+        timestamp, entry_type, entry_id = cursor.split('~')
+        timestamp = parse_datetime(timestamp)
+        if timestamp is None or entry_type not in (cls.TIMELINE_STATUS_REPORT, cls.TIMELINE_NOTIFICATION):
+            raise ValueError(f'Invalid timeline cursor {cursor!r}')
+        return timestamp, entry_type, int(entry_id)
+
+    def _timeline_status_reports(self, audience):
+        reports = self.history.exclude(is_human_activity=False)
+        if audience == 'professional':
+            reports = reports.exclude(Q(hours_worked=0) & Q(notes=None))
+        else:
+            reports = reports.exclude(current_task__isnull=True)
+
+        return reports.values(
+            entry_type=Value(self.TIMELINE_STATUS_REPORT, output_field=CharField()),
+            entry_id=F('history_id'),
+            entry_timestamp=F('updated_at'),
+            entry_task_name=F('current_task__name'),
+            entry_hours_worked=F('hours_worked'),
+            entry_notes=F('notes'),
+            entry_email_type=Value(None, output_field=TextField()),
+        )
+
+    def _timeline_notifications(self):
+        return ReferralNotifications.objects.filter(referral_id=self.referral_id, template__recipient='PROFESSIONAL_EMAIL').values(
+            entry_type=Value(self.TIMELINE_NOTIFICATION, output_field=CharField()),
+            entry_id=F('id'),
+            entry_timestamp=F('created_at'),
+            entry_task_name=Value(None, output_field=CharField()),
+            entry_hours_worked=Value(None, output_field=DecimalField(max_digits=6, decimal_places=2)),
+            entry_notes=Value(None, output_field=TextField()),
+            entry_email_type=F('template__description'),
+        )
 
-        return self.history.order_by('-updated_at').all()
+    def _timeline_archived_entries(self, audience, kinds, before):
+        """
+            timeline rows (same shape as the UNION query's) read back from the archive, applying the same filters
+        """
+
+        rows = []
+        if self.TIMELINE_STATUS_REPORT in kinds:
+            for report in self.get_archived_history():
+                if not report.is_human_activity:
+                    continue
+                if audience == 'professional' and report.hours_worked == 0 and report.notes is None:
+                    continue
+                if audience != 'professional' and report.current_task_id is None:
+                    continue
+                rows.append({'entry_type': self.TIMELINE_STATUS_REPORT, 'entry_id': report.history_id, 'entry_timestamp': report.updated_at,
+                             'entry_task_name': report.archive_task_name, 'entry_hours_worked': report.hours_worked,
+                             'entry_notes': report.notes, 'entry_email_type': None})
+
+        if self.TIMELINE_NOTIFICATION in kinds:
+            for notification in self.get_archived_notifications():
+                if notification.archive_template_recipient != 'PROFESSIONAL_EMAIL':
+                    continue
+                rows.append({'entry_type': self.TIMELINE_NOTIFICATION, 'entry_id': notification.id, 'entry_timestamp': notification.created_at,
+                             'entry_task_name': None, 'entry_hours_worked': None,
+                             'entry_notes': None, 'entry_email_type': notification.archive_template_description})
+
+        return [row for row in rows if before is None or self._timeline_key(row) < tuple(before)]
+
+    def get_timeline(self, audience='staff', kinds=(TIMELINE_STATUS_REPORT, TIMELINE_NOTIFICATION), before=None, limit=50):
+        """
+            merged activity stream of status reports (history) and professional notifications, newest first
+                - audience: 'professional' hides empty reports, 'staff' shows every human status update
+                - before: (timestamp, type, id) cursor returned for the previous page
+            runs a single (UNION) query, merged with archived rows for closed workflows
+            returns (list of entries, cursor of the next page or None)
+        """
+
+        parts = []
+        if self.TIMELINE_STATUS_REPORT in kinds:
+            parts.append((self.TIMELINE_STATUS_REPORT, self._timeline_status_reports(audience)))
+        if self.TIMELINE_NOTIFICATION in kinds:
+            parts.append((self.TIMELINE_NOTIFICATION, self._timeline_notifications()))
+        if not parts:
+            return [], None
+
+        if before:
+            parts = [(entry_type, self._timeline_before(part, entry_type, before)) for entry_type, part in parts]
+        parts = [part.order_by() for _, part in parts]  # compound statements reject per-part ordering
+
+        timeline = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+        rows = list(timeline.order_by('-entry_timestamp', '-entry_type', '-entry_id')[:limit + 1])
+
+        archived = self._timeline_archived_entries(audience, kinds, before)
+        if archived:
+            rows = sorted(rows + archived, key=self._timeline_key, reverse=True)[:limit + 1]
+
+        entries = [{
+            'type': row['entry_type'],
+            'id': row['entry_id'],
+            'timestamp': row['entry_timestamp'],
+            'report_status': self.get_pretty_name_for_task(row['entry_task_name']) if row['entry_task_name'] else None,
+            'hours_worked': row['entry_hours_worked'],
+            'notes': row['entry_notes'],
+            'email_type': row['entry_email_type'],
+        } for row in rows[:limit]]
+
+        next_cursor = self._timeline_key(rows[limit - 1]) if len(rows) > limit else None
+        return entries, next_cursor
 
     def human_last_updated_at(self):
         """
@@ -370,6 +808,9 @@ class ReferralWorkflowStateBase(models.Model):
             returns None if no human updates received
         """
 
+        if hasattr(self, 'human_last_update'):
+            return self.human_last_update # annotated by the manager's overdue and matter queries
+
         human_activities = self.history.exclude(is_human_activity=False)
         if human_activities:
             return human_activities.latest().updated_at
@@ -390,6 +831,25 @@ class ReferralWorkflowStateBase(models.Model):
             return date_obj.strftime("%b %d, %Y")
         return "Recently Updated" if time_diff.days < 3 else f"{time_diff.days} days ago"
 
+    def get_state_as_of(self, when):
+        """
+            name of the state this workflow was in at `when`, from the transition log (None if not started yet)
+        """
+
+        from lowbono_app.models import WorkflowTransition
+
+        transition = WorkflowTransition.objects.for_workflow(self).filter(timestamp__lte=when).order_by('-timestamp', '-id').first()
+        return transition.to_state if transition else None
+
+    def get_time_in_states(self, until=None):
+        """
+            {state: timedelta} spent by this workflow in each state, the current one counting until `until` (default now)
+        """
+
+        from lowbono_app.models import WorkflowTransition
+
+        return WorkflowTransition.objects.for_workflow(self).time_in_state(until=until)
+
     def get_edges_tuple(self):
         """
             retrieve list of edges with names instead of generator functions
@@ -403,3 +863,11 @@ class ReferralWorkflowStateBase(models.Model):
         """
 
         return isinstance(getattr(self, self.get_current_node_name()), ReferralUpdateViewBase)
+
+
+@receiver(post_create_historical_record)
+def post_create_workflow_history(sender, instance, history_instance, **kwargs):
+    if isinstance(instance, ReferralWorkflowStateBase) and history_instance.hours_worked:
+        # engagement hours reported at the workflow's current state
+        state = instance.current_task.name if instance.current_task_id else ''
+        reporting.record_hours_reported(instance, state, history_instance.hours_worked, history_instance.updated_at)
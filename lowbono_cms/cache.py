@@ -0,0 +1,147 @@
+"""
+    Render cache for lowbono_cms plugins.
+
+    The rendered HTML of a plugin (including its children) is cached per plugin instance,
+    language and content version. The content version changes whenever a plugin is saved or
+    deleted, a placeholder or page is edited/published, or a NewsArticles or ImageRendition row changes, which
+    invalidates every cached plugin at once, the same way the directory cache is versioned.
+
+    The same version keys the anonymous full-page cache (lowbono.page_cache).
+
+    Staff and the edit/structure modes always render live, as does any plugin class setting
+    `render_cache = False` (for output depending on the request or the current user) or
+    django CMS's own `cache = False`.
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.template.loader import get_template
+from django.utils import translation
+
+from classytags.utils import flatten_context
+from cms.plugin_base import CMSPluginBase
+from cms.utils.conf import get_cms_setting
+
+
+CMS_CONTENT_VERSION_CACHE_KEY = 'lowbono:cms:version'
+CMS_PLUGIN_CACHE_KEY = 'lowbono:cms:plugin:{}:{}:{}:{}'
+CMS_PLUGIN_CACHE_TIMEOUT = getattr(settings, 'CMS_PLUGIN_CACHE_TIMEOUT', 60 * 60 * 24)
+CACHED_RENDER_TEMPLATE = 'lowbono_cms/plugins/cached_render.html'
+
+
+def get_content_version():
+    version = cache.get(CMS_CONTENT_VERSION_CACHE_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(CMS_CONTENT_VERSION_CACHE_KEY, version, None)
+        version = cache.get(CMS_CONTENT_VERSION_CACHE_KEY, version)
+    return version
+
+
+def bump_content_version(*args, **kwargs):
+    """
+        Invalidates every cached plugin.
+        Has a signal receiver signature so it can be connected directly.
+    """
+    from cms.cache import invalidate_cms_page_cache
+
+    cache.set(CMS_CONTENT_VERSION_CACHE_KEY, time.time_ns(), None)
+    # django CMS's own page cache doesn't know about NewsArticles
+    invalidate_cms_page_cache()
+
+
+def _bump_content_version_for_plugin(sender, instance, **kwargs):
+    from cms.models import CMSPlugin
+
+    if isinstance(instance, CMSPlugin):
+        bump_content_version()
+
+
+def get_plugin_cache_key(instance, variant=''):
+    return CMS_PLUGIN_CACHE_KEY.format(instance.pk, translation.get_language(), get_content_version(),
+                                       hashlib.sha1(variant.encode()).hexdigest() if variant else '')
+
+
+def render_cache_enabled(plugin, context):
+    if not (plugin.render_cache and plugin.cache is not False and get_cms_setting('PLUGIN_CACHE')):
+        return False
+
+    request = context.get('request')
+    if request is None:
+        return False
+    if getattr(request, 'user', None) and request.user.is_staff:
+        return False
+    toolbar = getattr(request, 'toolbar', None)
+    return not (toolbar and (toolbar.edit_mode_active or toolbar.structure_mode_active))
+
+
+def cached_render(render):
+    """
+        wraps a plugin's `render()`: on a miss it runs as usual and the plugin's template is
+        rendered here, so the cached HTML includes child plugins; on a hit `render()` is skipped
+    """
+
+    @functools.wraps(render)
+    def wrapper(self, context, instance, placeholder):
+        if not render_cache_enabled(self, context):
+            return render(self, context, instance, placeholder)
+
+        key = get_plugin_cache_key(instance, self.get_render_cache_variant(context, instance))
+        content = cache.get(key)
+        if content is None:
+            context = render(self, context, instance, placeholder)
+            template = get_template(CMSPluginBase._get_render_template(self, context, instance, placeholder))
+            content = template.render(flatten_context(context))
+            cache.set(key, content, CMS_PLUGIN_CACHE_TIMEOUT)
+
+        instance._cached_render_content = content
+        context['cached_render_content'] = content
+        return context
+    return wrapper
+
+
+class CachedPluginBase(CMSPluginBase):
+    """
+        CMSPluginBase whose rendered output is served from the render cache,
+        set `render_cache = False` on a subclass to always render it live
+    """
+
+    render_cache = True
+
+    def get_render_cache_variant(self, context, instance):
+        """ for output depending on the request (e.g. a page number): a string telling the variants apart """
+        return ''
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'render' in cls.__dict__:
+            cls.render = cached_render(cls.__dict__['render'])
+
+    def _get_render_template(self, context, instance, placeholder):
+        if getattr(instance, '_cached_render_content', None) is not None:
+            return CACHED_RENDER_TEMPLATE
+        return super()._get_render_template(context, instance, placeholder)
+
+
+def connect_cache_signals():
+    """
+        Bumps the content version whenever data rendered by plugins changes.
+    """
+    from cms.models import PageContent, Placeholder
+    from cms.signals import post_obj_operation, post_placeholder_operation
+    from lowbono_app.models import ImageRendition, NewsArticles
+
+    post_save.connect(_bump_content_version_for_plugin, dispatch_uid='cms_cache_plugin_save')
+    post_delete.connect(_bump_content_version_for_plugin, dispatch_uid='cms_cache_plugin_delete')
+    post_placeholder_operation.connect(bump_content_version, dispatch_uid='cms_cache_placeholder_operation')
+    post_obj_operation.connect(bump_content_version, dispatch_uid='cms_cache_obj_operation')
+
+    # renditions are generated after the upload was saved, cached plugins would keep the fallback <img>
+    for sender in (PageContent, Placeholder, NewsArticles, ImageRendition):
+        uid = f'cms_cache_{sender._meta.label_lower}'
+        post_save.connect(bump_content_version, sender=sender, dispatch_uid=f'{uid}_save')
+        post_delete.connect(bump_content_version, sender=sender, dispatch_uid=f'{uid}_delete')
@@ -1,13 +1,13 @@
-from cms.plugin_base import CMSPluginBase
 from cms.plugin_pool import plugin_pool
 from .models import CMSPlainText, CMSRichText, CMSHTMLContent, CMSRichTextResourceCard, CMSRichTextMemberCard, CMSSidebarImgDescBtnCard, CMSAccordionBaseCard, CMSAccordionItem, DivElement, \
                     CMSThemeTwoImgsCard, CMSThemeIconBlockCard, CMSThemeBackgroundColorImageBtnCard, CMSThemeQuoteCard, CMSThemeCTACard, CMSThemeSupporterBoxBaseCard, CMSThemeSupporterBoxItem, \
                     CMSThemeStatsCard
 from django.utils.translation import gettext as _
+from .cache import CachedPluginBase
 
 
 @plugin_pool.register_plugin
-class CMSPlainTextPlugin(CMSPluginBase):
+class CMSPlainTextPlugin(CachedPluginBase):
     model = CMSPlainText
     name = _("Plain Text")
     render_template = "lowbono_cms/plugins/plain_text.html"
@@ -18,7 +18,7 @@ class CMSPlainTextPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSRichTextPlugin(CMSPluginBase):
+class CMSRichTextPlugin(CachedPluginBase):
     model = CMSRichText
     name = _("Rich Text")
     render_template = "lowbono_cms/plugins/rich_text.html"
@@ -29,7 +29,7 @@ class CMSRichTextPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSHTMLContentPlugin(CMSPluginBase):
+class CMSHTMLContentPlugin(CachedPluginBase):
     model = CMSHTMLContent
     name = _("HTML Code")
     render_template = "lowbono_cms/plugins/html_content.html"
@@ -40,7 +40,7 @@ class CMSHTMLContentPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSRichTextResourceCardPlugin(CMSPluginBase):
+class CMSRichTextResourceCardPlugin(CachedPluginBase):
     model = CMSRichTextResourceCard
     name = _("Resource Card")
     render_template = "lowbono_cms/plugins/resource_card.html"
@@ -51,7 +51,7 @@ class CMSRichTextResourceCardPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSRichTextMemberCardPlugin(CMSPluginBase):
+class CMSRichTextMemberCardPlugin(CachedPluginBase):
     model = CMSRichTextMemberCard
     name = _("Member Card")
     render_template = "lowbono_cms/plugins/member_card.html"
@@ -62,7 +62,7 @@ class CMSRichTextMemberCardPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSSidebarImgDescBtnCardPlugin(CMSPluginBase):
+class CMSSidebarImgDescBtnCardPlugin(CachedPluginBase):
     model = CMSSidebarImgDescBtnCard
     name = _("Sidebar Card: Image Description Button")
     render_template = "lowbono_cms/plugins/sidebar_img_desc_btn_card.html"
@@ -73,7 +73,7 @@ class CMSSidebarImgDescBtnCardPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSAccordionBasePlugin(CMSPluginBase):
+class CMSAccordionBasePlugin(CachedPluginBase):
     model = CMSAccordionBaseCard
     render_template = "lowbono_cms/plugins/accordion_base.html"
     name = _("Accordion Base")
@@ -86,7 +86,7 @@ class CMSAccordionBasePlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSAccordionItemPlugin(CMSPluginBase):
+class CMSAccordionItemPlugin(CachedPluginBase):
     model = CMSAccordionItem
     render_template = "lowbono_cms/plugins/accordion_item.html"
     name = _("Accordion Item")
@@ -99,7 +99,7 @@ class CMSAccordionItemPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class DivElementPlugin(CMSPluginBase):
+class DivElementPlugin(CachedPluginBase):
     model = DivElement
     render_template = "lowbono_cms/plugins/div_element.html"
     name = _("Div Element")
@@ -111,19 +111,29 @@ class DivElementPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSNewsArticlesPlugin(CMSPluginBase):
+class CMSNewsArticlesPlugin(CachedPluginBase):
     render_template = "lowbono_cms/plugins/all_news_articles.html"
     name = _("All News Articles Component")
 
+    page_size = 9
+
+    def get_render_cache_variant(self, context, instance):
+        return context['request'].GET.get('before', '')
+
     def render(self, context, instance, placeholder):
         from lowbono_app.models import NewsArticles
-        news_articles = NewsArticles.objects.filter(status='published')
-        context.update({'news_articles': news_articles})
+        cursor = context['request'].GET.get('before') if 'request' in context else None
+        try:
+            news_articles, next_cursor = NewsArticles.objects.published().keyset_page(cursor, self.page_size)
+        except ValueError:
+            news_articles, next_cursor = NewsArticles.objects.published().keyset_page(None, self.page_size)
+            cursor = None
+        context.update({'news_articles': news_articles, 'next_cursor': next_cursor, 'is_first_page': not cursor})
         return context
 
 
 @plugin_pool.register_plugin
-class CMSThemeTwoImgsCardPlugin(CMSPluginBase):
+class CMSThemeTwoImgsCardPlugin(CachedPluginBase):
     model = CMSThemeTwoImgsCard
     name = _("Theme: Two Images Card")
     render_template = "lowbono_cms/plugins/theme_two_images.html"
@@ -134,7 +144,7 @@ class CMSThemeTwoImgsCardPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSThemeIconBlockCardPlugin(CMSPluginBase):
+class CMSThemeIconBlockCardPlugin(CachedPluginBase):
     model = CMSThemeIconBlockCard
     name = _("Theme: Icon Block Card")
     render_template = "lowbono_cms/plugins/icon_block_card.html"
@@ -145,7 +155,7 @@ class CMSThemeIconBlockCardPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSThemeBackgroundColorImageBtnCardPlugin(CMSPluginBase):
+class CMSThemeBackgroundColorImageBtnCardPlugin(CachedPluginBase):
     model = CMSThemeBackgroundColorImageBtnCard
     name = _("Theme: Card with Background Color, Image & Button")
     render_template = "lowbono_cms/plugins/background_color_image_btn_card.html"
@@ -156,7 +166,7 @@ class CMSThemeBackgroundColorImageBtnCardPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSThemeQuote1CardPlugin(CMSPluginBase):
+class CMSThemeQuote1CardPlugin(CachedPluginBase):
     model = CMSThemeQuoteCard
     name = _("Theme: Quote Type 1 Card")
     render_template = "lowbono_cms/plugins/quote_type_1_card.html"
@@ -166,7 +176,7 @@ class CMSThemeQuote1CardPlugin(CMSPluginBase):
         return context
 
 @plugin_pool.register_plugin
-class CMSThemeQuote2CardPlugin(CMSPluginBase):
+class CMSThemeQuote2CardPlugin(CachedPluginBase):
     model = CMSThemeQuoteCard
     name = _("Theme: Quote Type 2 Card")
     render_template = "lowbono_cms/plugins/quote_type_2_card.html"
@@ -177,7 +187,7 @@ class CMSThemeQuote2CardPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSThemeQuote3CardPlugin(CMSPluginBase):
+class CMSThemeQuote3CardPlugin(CachedPluginBase):
     model = CMSThemeQuoteCard
     name = _("Theme: Quote Type 3 Card")
     render_template = "lowbono_cms/plugins/quote_type_3_card.html"
@@ -188,7 +198,7 @@ class CMSThemeQuote3CardPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSThemeQuote4CardPlugin(CMSPluginBase):
+class CMSThemeQuote4CardPlugin(CachedPluginBase):
     model = CMSThemeQuoteCard
     name = _("Theme: Quote Type 4 Card")
     render_template = "lowbono_cms/plugins/quote_type_4_card.html"
@@ -198,7 +208,7 @@ class CMSThemeQuote4CardPlugin(CMSPluginBase):
         return context
 
 @plugin_pool.register_plugin
-class CMSThemeCTACardPlugin(CMSPluginBase):
+class CMSThemeCTACardPlugin(CachedPluginBase):
     model = CMSThemeCTACard
     name = _("Theme: Call to Action Card")
     render_template = "lowbono_cms/plugins/cta_card.html"
@@ -209,7 +219,7 @@ class CMSThemeCTACardPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSThemeSupporterBoxBasePlugin(CMSPluginBase):
+class CMSThemeSupporterBoxBasePlugin(CachedPluginBase):
     model = CMSThemeSupporterBoxBaseCard
     render_template = "lowbono_cms/plugins/supporter_box_base.html"
     name = _("Theme: Supporter Box Base")
@@ -222,7 +232,7 @@ class CMSThemeSupporterBoxBasePlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSThemeSupporterBoxItemPlugin(CMSPluginBase):
+class CMSThemeSupporterBoxItemPlugin(CachedPluginBase):
     model = CMSThemeSupporterBoxItem
     render_template = "lowbono_cms/plugins/supporter_box_item.html"
     name = _("Theme: Supporter Box Item")
@@ -235,7 +245,7 @@ class CMSThemeSupporterBoxItemPlugin(CMSPluginBase):
 
 
 @plugin_pool.register_plugin
-class CMSThemeStatsCardPlugin(CMSPluginBase):
+class CMSThemeStatsCardPlugin(CachedPluginBase):
     model = CMSThemeStatsCard
     name = _("Theme: Stats Card")
     render_template = "lowbono_cms/plugins/stats_card.html"
@@ -0,0 +1,63 @@
+from django.contrib.syndication.views import Feed
+from django.db.models import Count, Max
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+
+NEWS_FEED_SIZE = 20
+
+
+def _news_state(request):
+    """ (article count, latest update) of all articles, drafts included so unpublishing changes it too; once per request """
+
+    if not hasattr(request, '_news_feed_state'):
+        from lowbono_app.models import NewsArticles
+        state = NewsArticles.objects.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+        request._news_feed_state = (state['count'], state['updated_at'])
+    return request._news_feed_state
+
+
+def news_feed_etag(request, *args, **kwargs):
+    count, updated_at = _news_state(request)
+    return f'news-{count}-{updated_at.timestamp() if updated_at else 0}'
+
+
+def news_feed_last_modified(request, *args, **kwargs):
+    return _news_state(request)[1]
+
+
+class NewsRssFeed(Feed):
+    title = 'LowBono News'
+    description = 'Latest news from LowBono'
+
+    def link(self):
+        return '/news'
+
+    def items(self):
+        from lowbono_app.models import NewsArticles
+        return NewsArticles.objects.published().order_by('-created_at', '-id')[:NEWS_FEED_SIZE]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return Truncator(strip_tags(item.content)).words(60)
+
+    def item_author_name(self, item):
+        return item.author
+
+    def item_pubdate(self, item):
+        return item.created_at
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+
+class NewsAtomFeed(NewsRssFeed):
+    feed_type = Atom1Feed
+    subtitle = NewsRssFeed.description
+
+    def feed_url(self):
+        return reverse('news_feed_atom')
@@ -1,3 +1,118 @@
-from django.test import TestCase
+import io
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template import Context
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from cms.api import add_plugin
+from cms.models import Placeholder
+from cms.plugin_rendering import ContentRenderer
+
+from PIL import Image
+
+from lowbono_app import renditions
+from lowbono_app.models import NewsArticles, User
+from lowbono_cms.models import CMSPlainText
+
+
+class PluginRenderCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.placeholder = Placeholder.objects.create(slot='content')
+
+    def render(self, plugin, user=None):
+        request = RequestFactory().get('/')
+        request.user = user or AnonymousUser()
+        request.session = {}
+        request.current_page = None
+        return ContentRenderer(request).render_plugin(plugin, Context({'request': request}), self.placeholder)
+
+    def test_render_plugin_WHERE_plugin_changed_without_signal_EXPECT_cached_html_until_saved(self):
+        plugin = add_plugin(self.placeholder, 'CMSPlainTextPlugin', 'en', text='Welcome')
+        self.assertIn('Welcome', self.render(plugin))
+
+        CMSPlainText.objects.filter(pk=plugin.pk).update(text='Changed')
+        self.assertIn('Welcome', self.render(CMSPlainText.objects.get(pk=plugin.pk)))
+
+        plugin.text = 'Saved'
+        plugin.save()
+        self.assertIn('Saved', self.render(CMSPlainText.objects.get(pk=plugin.pk)))
+
+    def test_render_plugin_WHERE_news_article_published_EXPECT_news_plugin_invalidated(self):
+        plugin = add_plugin(self.placeholder, 'CMSNewsArticlesPlugin', 'en')
+        self.assertNotIn('Court hours extended', self.render(plugin))
+
+        with self.assertNumQueries(0):
+            self.render(plugin)
+
+        NewsArticles.objects.create(title='Court hours extended', content='<p>News</p>', status='published')
+        self.assertIn('Court hours extended', self.render(plugin))
+
+    def test_render_plugin_WHERE_renditions_generated_after_render_EXPECT_cached_card_updated(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=root.name))
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 400)).save(buffer, 'PNG')
+        source = default_storage.save('headshots/jane.png', ContentFile(buffer.getvalue()))
+        plugin = add_plugin(self.placeholder, 'CMSRichTextMemberCardPlugin', 'en', photo=source, name='Jane', description='Attorney')
+        self.assertNotIn('<picture>', self.render(plugin))
+
+        renditions.generate_renditions(source)
+
+        self.assertIn('<picture>', self.render(plugin))
+
+    def test_render_plugin_WHERE_staff_user_EXPECT_rendered_live(self):
+        staff = User.objects.create_superuser(email='c1@lowbono.org', password='testpassword')
+        plugin = add_plugin(self.placeholder, 'CMSPlainTextPlugin', 'en', text='Welcome')
+        self.render(plugin)
+
+        CMSPlainText.objects.filter(pk=plugin.pk).update(text='Changed')
+        self.assertIn('Changed', self.render(CMSPlainText.objects.get(pk=plugin.pk), user=staff))
+
+
+class NewsFeedTestCase(TestCase):
+
+    def setUp(self):
+        self.news = NewsArticles.objects.create(title='Court hours extended', content='<p>News</p>', status='published')
+
+    def test_news_feed_WHEN_unchanged_EXPECT_304_and_WHEN_saved_EXPECT_new_etag(self):
+        url = reverse('news_feed_atom')
+        response = self.client.get(url)
+        self.assertContains(response, 'Court hours extended')
+        self.assertEqual('application/atom+xml; charset=utf-8', response['Content-Type'])
+
+        self.assertEqual(304, self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code)
+
+        self.news.status = 'draft'
+        self.news.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(200, response.status_code)
+        self.assertNotContains(response, 'Court hours extended')
+
+
+class NewsArticlePageTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.news = NewsArticles.objects.create(title='Court hours extended', content='<p>News</p>', status='published')
+        self.url = reverse('news_article_page', args=[self.news.slug])
+
+    def test_news_article_page_WHEN_logged_in_after_anonymous_visit_EXPECT_200_with_logged_in_page(self):
+        anonymous = self.client.get(self.url)
+        self.assertEqual(304, self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=anonymous['Last-Modified']).status_code)
+
+        self.client.force_login(User.objects.create_superuser(email='c1@lowbono.org', password='testpassword'))
+        cut = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=anonymous['Last-Modified'])
+
+        self.assertContains(cut, 'My Dashboard')
+        self.assertContains(cut, 'Edit Blog')
+        self.assertNotContains(anonymous, 'My Dashboard')
+        self.assertIn('private', cut['Cache-Control'])
+        self.assertIn('Cookie', cut['Vary'])
@@ -1,9 +1,15 @@
 from django.urls import path
+from django.views.decorators.http import condition
 from django.views.generic.base import RedirectView
+from .feeds import NewsAtomFeed, NewsRssFeed, news_feed_etag, news_feed_last_modified
 from .views import robots_txt, favicon_ico, news_article_page
 
+news_feed_condition = condition(etag_func=news_feed_etag, last_modified_func=news_feed_last_modified)
+
 urlpatterns = [
     path('robots.txt/', robots_txt, name='robots_txt'),
     path('favicon.ico/', favicon_ico, name='favicon_ico'),
+    path('news/feed', news_feed_condition(NewsAtomFeed()), name='news_feed_atom'),
+    path('news/rss', news_feed_condition(NewsRssFeed()), name='news_feed_rss'),
     path('news/<str:slug>', news_article_page, name="news_article_page"),
 ]
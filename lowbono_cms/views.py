@@ -1,16 +1,36 @@
+import datetime
 import os
 from django.conf import settings
 from django.contrib import messages
 from django.http import HttpResponse
 from django.shortcuts import render, redirect
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
 from django.views.static import serve
 
+from .cache import get_content_version
 
+
+def news_article_last_modified(request, slug):
+    """
+        the CMS content version changes with any article or page edit (deletes included), checking it costs no query.
+        Anonymous visitors only, like lowbono.page_cache: logged-in users get their own navbar and staff the edit link
+    """
+    if request.user.is_authenticated:
+        return None
+    return datetime.datetime.fromtimestamp(get_content_version() / 1e9, tz=datetime.timezone.utc)
+
+
+@condition(last_modified_func=news_article_last_modified)
 def news_article_page(request, slug):
     from lowbono_app.models import NewsArticles
     news = NewsArticles.objects.filter(slug=slug).first()
     if news:
-        return render(request, 'lowbono_cms/news_article.html', {'news': news})
+        response = render(request, 'lowbono_cms/news_article.html', {'news': news})
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie',))
+        return response
     messages.info(request, "Sorry, Page you requested doesn't exist!")
     return redirect('/news')
 
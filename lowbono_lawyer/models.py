@@ -1,8 +1,8 @@
 from django.db import models
+from django.db.models import Exists, OuterRef
 from django.utils.translation import gettext_lazy as _
-from django.db.models.signals import m2m_changed
 
-from lowbono_app.models import Referral, Professional, User, BarAdmission, LLMLogs, _update_is_profile_complete
+from lowbono_app.models import Referral, Professional, User, BarAdmission, LLMLogs
 
 
 class LawyerReferral(models.Model):
@@ -30,6 +30,10 @@ class Lawyer(Professional):
     def _is_profile_complete(self):
         return bool(super()._is_profile_complete() and bool(self.user.bar_admissions.count()))
 
+    @classmethod
+    def profile_complete_expression(cls):
+        return super().profile_complete_expression() & Exists(BarAdmission.objects.filter(user=OuterRef('user_id')))
+
     def __str__(self):
         return f'{self.__class__.__name__} info for {self.user}'
 
@@ -49,9 +53,6 @@ class LawyerPracticeAreas(models.Model):
         return f'<{self.__str__}>'
 
 
-m2m_changed.connect(_update_is_profile_complete, sender=Lawyer.practice_areas.through)
-
-
 class LawyerLLMLogs(LLMLogs):
     """ stores Lawyer LLM logs """
 
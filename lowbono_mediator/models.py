@@ -1,9 +1,8 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
-from django.db.models.signals import m2m_changed
 from phonenumber_field.modelfields import PhoneNumberField
 
-from lowbono_app.models import Referral, Professional, User, BarAdmission, _update_is_profile_complete
+from lowbono_app.models import Referral, Professional, User, BarAdmission
 
 
 class MediatorReferral(models.Model):
@@ -54,8 +53,6 @@ class MediatorPracticeAreas(models.Model):
     def __repr__(self):
         return f'<{self.__str__}>'
 
-m2m_changed.connect(_update_is_profile_complete, sender=Mediator.practice_areas.through)
-
 
 class MediationType(models.Model):
     name = models.CharField(max_length=64, default='None', choices=[('facilitative', 'Facilitative'), ('evaluative', 'Evaluative'), ('facilitative_and_evaluative', 'Combined (Facilitative & Evaluative)')])
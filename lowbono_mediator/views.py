@@ -32,6 +32,8 @@ def overdueMattersEmail(request, professional_id, workflow_state):
     context = {}
     context['current_node_pretty_name'] = ReferralLawyerWorkflowState.get_pretty_name_for_node(workflow_state)
     context['overdue_matters'] = ReferralLawyerWorkflowState.objects.get_overdue_referrals_for_professional(event_type, professional)
+    context['app_name'] = 'lowbono_mediator'
+    context['next_node_choices'] = ReferralMediatorWorkflowState.get_next_node_choices(workflow_state)
     return render(request, 'lowbono_mediator/pending_referrals_list.html', context)
 
 